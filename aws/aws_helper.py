@@ -4,7 +4,6 @@ import logging
 import os
 import socket
 import tempfile
-import time
 from datetime import datetime
 from pathlib import Path
 from urllib.parse import urlencode
@@ -47,27 +46,18 @@ def start_instances(ec2_instance_list):
     ec2.start_instances(InstanceIds=instance_id_list)
 
 
+# wait until every instance is running, which is when it gets its public IP address; the instances
+# accept SSH connections a little later, which deployment waits for one instance at a time
 def wait_until_instances_are_running(ec2_instance_list):
     instance_id_list = []
-    counter = 0
     for ec2_instance in ec2_instance_list:
         instance_id_list.append(ec2_instance.instance_id)
     ec2 = boto3.client(EC2)
-    time.sleep(30)  # initial wait for instances to come up
-    not_ready = True
-    while not_ready:
-        not_ready = False
-        statuses = ec2.describe_instance_status(InstanceIds=instance_id_list)
-        logging.info("============================================{}".format(counter))
-        for instance_status in statuses[INSTANCE_STATUSES]:
-            # logging.debug("Checking readiness of EC2 Instance: {}".format(instance_status))
-            if (instance_status[INSTANCE_STATUS][STATUS] != OK) or (instance_status[SYSTEM_STATUS][STATUS] != OK):
-                logging.info("EC2 Instance {} is NOT READY".format(instance_status[INSTANCE_ID]))
-                not_ready = True
-            else:
-                logging.info("EC2 Instance {} is Ready".format(instance_status[INSTANCE_ID]))
-        counter = counter + 1
-        time.sleep(5)  # still not ready, wait a bit longer
+    ec2.get_waiter(INSTANCE_RUNNING).wait(InstanceIds=instance_id_list)
+    for ec2_instance in ec2_instance_list:
+        ec2_instance.reload()
+        logging.info("EC2 Instance {} is running at {}"
+                     .format(ec2_instance.instance_id, ec2_instance.get_public_ip_address()))
 
 
 def stop_instances(ec2_instance_list):
@@ -109,6 +99,12 @@ def generate_log_post_url(bucket, key):
     return urlencode(result)
 
 
+# one client signs every URL; signing is local, so the cost of one URL is mostly creating its client
+def generate_log_post_urls(bucket, keys):
+    s3 = boto3.client(S3)
+    return {name: urlencode(s3.generate_presigned_post(bucket, key)) for name, key in keys.items()}
+
+
 def generate_config_url(bucket, key):
     s3 = boto3.client(S3)
     return s3.generate_presigned_url(ClientMethod=GET_OBJECT, Params={BUCKET: bucket, KEY: key})
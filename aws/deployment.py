@@ -0,0 +1,80 @@
+# concurrent deployment of LFSDS onto EC2 instances:  the per-instance steps run on a bounded pool of
+# worker threads, and each step waits for the condition it needs (an instance accepting SSH connections)
+# instead of sleeping for a fixed time.  Instances are only used through ssh_connect, ssh_close, and
+# run_command_for_exit_status, so the pipeline also runs against stand-ins for Ec2Instance.
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from shared.constants import *
+
+
+# call function on every item with at most max_workers calls at a time; returns a map of item => result.
+# Once every call has finished, raises the error of the first failing item in items' order, which is not
+# necessarily the first error to happen.  On Ctrl-C, the calls that have not started yet are cancelled
+def run_in_parallel(function, items, max_workers):
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {item: executor.submit(function, item) for item in items}
+        try:
+            wait(futures.values())
+        except KeyboardInterrupt:
+            for future in futures.values():
+                future.cancel()
+            raise
+    return {item: future.result() for item, future in futures.items()}
+
+
+def wait_until_ssh_ready(ec2_instance, timeout=SECONDS_WITHOUT_SSH, retry_interval=SECONDS_PER_SSH_RETRY):
+    deadline = time.perf_counter() + timeout
+    while not ec2_instance.ssh_connect():
+        if time.perf_counter() > deadline:
+            raise RuntimeError("{} did not accept SSH connections within {} seconds!"
+                               .format(ec2_instance.instance_id, timeout))
+        time.sleep(retry_interval)
+
+
+# the per-instance deployment steps; returns the seconds the instance took
+def deploy_to_instance(ec2_instance):
+    start = time.perf_counter()
+    wait_until_ssh_ready(ec2_instance)
+    exit_status = ec2_instance.run_command_for_exit_status(GIT_CLONE_COMMAND)
+    if exit_status != 0:
+        raise RuntimeError("git clone failed on {} with exit status {}!".format(ec2_instance.instance_id, exit_status))
+    elapsed = time.perf_counter() - start
+    logging.info("Deployed to EC2 Instance {} in {:.1f} seconds".format(ec2_instance.instance_id, elapsed))
+    return elapsed
+
+
+def deploy_to_instances(ec2_instances, max_workers):
+    start = time.perf_counter()
+    elapsed_times = run_in_parallel(deploy_to_instance, ec2_instances, max_workers)
+    logging.info("Deployed to {} EC2 Instances in {:.1f} seconds (slowest instance {:.1f} seconds)"
+                 .format(len(ec2_instances), time.perf_counter() - start, max(elapsed_times.values())))
+
+
+# a command running on an EC2 instance over SSH, with the part of the subprocess.Popen interface that
+# Run uses to launch and watch simulation nodes
+class RemoteProcess:
+
+    def __init__(self, ec2_instance, command_line):
+        self.ec2_instance = ec2_instance
+        self.returncode = None
+        self.thread = threading.Thread(target=self.run, args=(command_line,), daemon=True)
+        self.thread.start()
+
+    def run(self, command_line):
+        exit_status = self.ec2_instance.run_command_for_exit_status(command_line)
+        # a lost SSH connection counts as a failure
+        self.returncode = exit_status if exit_status is not None else -1
+
+    def poll(self):
+        return self.returncode
+
+    def wait(self):
+        self.thread.join()
+        return self.returncode
+
+    # closing the connection ends the wait for the command; the instance itself is terminated afterwards
+    def terminate(self):
+        self.ec2_instance.ssh_close()
@@ -9,12 +9,15 @@ from shared.constants import *
 
 class Ec2Instance:
 
-    ec2 = boto3.resource(EC2)
-    ec2Client = boto3.client(EC2)
-    key = paramiko.RSAKey.from_private_key_file(str(Path.home() / DOT_AWS / LFSDS_KEY_FILENAME))
+    # created on first use, so that importing this module needs neither AWS credentials nor the key file
+    # (and local stand-ins for EC2 can be set up before the first AWS client is created)
+    ec2 = None
+    key = None
 
     def __init__(self, instance_id):
         self.instance_id = instance_id
+        if Ec2Instance.ec2 is None:
+            Ec2Instance.ec2 = boto3.resource(EC2)
         self.instance = Ec2Instance.ec2.Instance(instance_id)
         self.ssh_client = paramiko.SSHClient()
         self.ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy)
@@ -36,6 +39,17 @@ class Ec2Instance:
     def get_public_dns_name(self):
         return self.instance.public_dns_name
 
+    @staticmethod
+    def get_key():
+        if Ec2Instance.key is None:
+            Ec2Instance.key = paramiko.RSAKey.from_private_key_file(str(Path.home() / DOT_AWS / LFSDS_KEY_FILENAME))
+        return Ec2Instance.key
+
+    # refresh the cached instance attributes, e.g. the public IP address that is assigned once it is running
+    def reload(self):
+        self.instance.reload()
+
+    # returns True once connected; an instance that is still booting refuses or times out the connection
     def ssh_connect(self):
         try:
             if not self.ssh_connected:
@@ -44,11 +58,14 @@ class Ec2Instance:
                                         timeout=SSH_TIMEOUT,
                                         auth_timeout=SSH_TIMEOUT,
                                         banner_timeout=SSH_TIMEOUT,
-                                        pkey=Ec2Instance.key)
+                                        pkey=Ec2Instance.get_key())
                 self.ssh_connected = True
 
         except paramiko.AuthenticationException:
             print("AuthenticationException while connecting to {}".format(self.instance))
+        except (paramiko.SSHException, OSError) as error:
+            logging.debug("Cannot connect to {} yet: {}".format(self.instance_id, error))
+        return self.ssh_connected
 
     def run_command(self, command):
         try:
@@ -64,6 +81,20 @@ class Ec2Instance:
         except paramiko.AuthenticationException:
             print("AuthenticationException while connecting to {}".format(self.instance))
 
+    # run command to completion, returning its exit status, or None if the SSH connection failed
+    def run_command_for_exit_status(self, command):
+        try:
+            if not self.ssh_connected:
+                self.ssh_connect()
+            stdin, stdout, stderr = self.ssh_client.exec_command(command, timeout=None)
+            logging.debug("stdout: {}".format(stdout.read()))
+            logging.debug("stderr: {}".format(stderr.read()))
+            return stdout.channel.recv_exit_status()
+
+        except (paramiko.SSHException, OSError) as error:
+            logging.error("Lost the SSH connection to {}: {}".format(self.instance_id, error))
+            return None
+
     def ssh_close(self):
         self.ssh_client.close()
         self.ssh_connected = False
@@ -0,0 +1,68 @@
+# placement of simulation nodes onto EC2 instances
+#
+# each node needs some resource units: by default the weight of its role (an electronic_medical_record
+# mostly waits between notifications, a health_district_system handles every notification of its
+# district), or the "resource_units" declared in its role_parameters.  Every electronic_medical_record is
+# placed with the health_district_system it connects to, so that their notifications stay on one host;
+# these groups are packed onto as few instances of instance_capacity units as possible (first-fit
+# decreasing).  A group that needs more than instance_capacity units gets an instance of its own.
+import logging
+
+from shared.constants import *
+
+ROLE_RESOURCE_UNITS = {
+    ELECTRONIC_MEDICAL_RECORD: 1,
+    DISEASE_OUTBREAK_ANALYZER: 2,
+    HEALTH_DISTRICT_SYSTEM: 4,
+}
+
+
+def get_resource_units(node_config):
+    role = node_config[ROLE]
+    if role not in ROLE_RESOURCE_UNITS:
+        raise TypeError("Unknown role {}! Cannot determine resources needed!".format(role))
+    resource_units = node_config[ROLE_PARAMETERS].get(RESOURCE_UNITS, ROLE_RESOURCE_UNITS[role])
+    if resource_units <= 0:
+        raise ValueError("{} must declare a positive number of {}!".format(node_config[NODE_ID], RESOURCE_UNITS))
+    return resource_units
+
+
+# the lists of node_ids that must share an instance:  each health_district_system followed by the
+# electronic_medical_records that connect to it, and every other node on its own
+def group_nodes(node_configs):
+    groups = {}
+    for node_id, node_config in node_configs.items():
+        if node_config[ROLE] != ELECTRONIC_MEDICAL_RECORD:
+            groups[node_id] = [node_id]
+    for node_id, node_config in node_configs.items():
+        if node_config[ROLE] == ELECTRONIC_MEDICAL_RECORD:
+            health_district_system = node_config[CONNECTIONS][0]
+            if health_district_system not in groups:
+                raise KeyError("{} connects to {}, which is not a node of the simulation!"
+                               .format(node_id, health_district_system))
+            groups[health_district_system].append(node_id)
+    return list(groups.values())
+
+
+# returns the launch plan:  one list of node_ids per EC2 instance
+def plan_placement(node_configs, instance_capacity):
+    groups = [(sum(get_resource_units(node_configs[node_id]) for node_id in group), group)
+              for group in group_nodes(node_configs)]
+    # largest groups first; sorting is stable, so equal groups keep the configuration file's order
+    groups.sort(key=lambda weighted_group: weighted_group[0], reverse=True)
+    instance_node_ids = []
+    instance_free_units = []
+    for resource_units, group in groups:
+        if resource_units > instance_capacity:
+            logging.warning("{} need {} resource units, more than the {} of one EC2 instance; "
+                            "placing them on an instance of their own".format(group, resource_units,
+                                                                               instance_capacity))
+        for index, free_units in enumerate(instance_free_units):
+            if resource_units <= free_units:
+                instance_node_ids[index].extend(group)
+                instance_free_units[index] = free_units - resource_units
+                break
+        else:
+            instance_node_ids.append(list(group))
+            instance_free_units.append(instance_capacity - resource_units)
+    return instance_node_ids
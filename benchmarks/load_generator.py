@@ -0,0 +1,548 @@
+# end-to-end load generator:  start one real health_district_system or disease_outbreak_analyzer
+# from a simulation configuration file, stand in for the overseer and for every peer of that
+# node on loopback endpoints, and ramp the offered load until the node saturates.  Run from the
+# repository root with
+#     python -m benchmarks.load_generator config_file node_id [--clients N] [--start_rate R] ...
+#
+# a health_district_system receives disease notifications from --clients impersonated
+# electronic_medical_records, each a DEALER socket that pipelines one-occurrence notification
+# batches; every reply is matched to its request, and the step that sent it, by sequence_number.
+#
+# a disease_outbreak_analyzer receives daily disease counts from --clients impersonated
+# health_district_system publishers.  Published counts are never answered, so the target is run
+# with a fixed outbreak threshold of 0 and a simulated day of PROBE_INTERVAL seconds:  it publishes
+# an outbreak alert after the first count of every day, and the vector_timestamp carried by that
+# alert tells how many counts from each publisher it has handled so far.  Each alert is a probe:  the
+# achieved rate is the counts handled by the step's last probe over the seconds up to it, and the
+# step is saturated if that is less than SATURATION_RATIO of the counts sent by then.  Each probe
+# gives one latency, from the send of the newest count it reflects to the alert's arrival, so the
+# disease_outbreak_analyzer's latencies are a sample of PROBE_INTERVAL-spaced counts, not of every count.
+#
+# each step offers a fixed rate for --step_duration seconds, then waits up to --drain_time
+# seconds for outstanding messages.  A step is saturated once the node handles less than
+# SATURATION_RATIO of the messages that were sent, or leaves more than UNANSWERED_RATIO of them
+# unhandled after the drain; the ramp stops at the first saturated step.
+import json
+import logging
+import math
+import os
+import pickle
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import zmq
+
+from config.command_line_parser import parse_load_generator_cmd_line
+from overseer import Overseer
+from shared.constants import *
+from shared.node import Node
+from shared.vector_timestamp import NodeIndex, VectorTimestamp
+from shared.vector_timestamp_delta import VectorTimestampDeltaDecoder
+from shared.wire_codec import WireCodec
+
+LOOPBACK = '127.0.0.1'
+SATURATION_RATIO = 0.9
+UNANSWERED_RATIO = 0.01
+# real seconds per simulated day for disease_outbreak_analyzer targets, i.e. the alert probe period
+PROBE_INTERVAL = 0.1
+# seconds to wait for the target node to register, and for it to exit after stop_simulation
+TARGET_TIMEOUT = 30
+# seconds for the target's subscriptions to its impersonated peers to reach them before the simulation starts
+SUBSCRIPTION_DELAY = 1
+
+# result key => latency percentile
+LATENCY_PERCENTILES = {
+    LATENCY_P50_MS: 50,
+    LATENCY_P90_MS: 90,
+    LATENCY_P99_MS: 99,
+    LATENCY_MAX_MS: 100,
+}
+
+SCRIPT_NAMES = {
+    HEALTH_DISTRICT_SYSTEM: HEALTH_DISTRICT_SYSTEM_SCRIPT_NAME,
+    DISEASE_OUTBREAK_ANALYZER: DISEASE_OUTBREAK_ANALYZER_SCRIPT_NAME,
+}
+
+
+def get_free_port():
+    temp_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    temp_socket.bind((LOOPBACK, 0))
+    port = temp_socket.getsockname()[1]
+    temp_socket.close()
+    return port
+
+
+def get_percentile(sorted_values, percentile):
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(percentile / 100 * len(sorted_values)) - 1)]
+
+
+class LoadGenerator:
+
+    def __init__(self, json_config, node_id, args):
+        self.json_config = json_config
+        self.node_id = node_id
+        self.role = json_config[NODES][node_id][ROLE]
+        self.clients = args.clients
+        self.start_rate = args.start_rate
+        self.ramp_factor = args.ramp_factor
+        self.max_rate = args.max_rate
+        self.step_duration = args.step_duration
+        self.drain_time = args.drain_time
+        self.diseases = json_config[DISEASES]
+        self.wire_protocol = json_config.get(WIRE_PROTOCOL, PICKLE)
+        self.wire_codec = WireCodec(self.diseases)
+        self.work_folder = tempfile.mkdtemp(prefix='load_generator-')
+        self.context = zmq.Context()
+        self.poller = zmq.Poller()
+        self.overseer = None
+        self.target_process = None
+        self.target_address_map = None
+        # address maps of the impersonated peers, keyed by node_id
+        self.peer_address_maps = {}
+        # with indexed vector_timestamps, the node list of the clocks in the target's messages
+        self.node_index = None
+        self.steps = []
+
+    def encode_message(self, message):
+        if self.wire_protocol == BINARY:
+            return self.wire_codec.encode(message)
+        return pickle.dumps(message)
+
+    def decode_message(self, data):
+        if self.wire_protocol == BINARY:
+            return self.wire_codec.decode(data)
+        return pickle.loads(data)
+
+    # the target node's configuration as the target will read it:  the overseer is this process
+    def prepare_config(self):
+        self.json_config[OVERSEER] = {HOST: LOOPBACK, REPLY_PORT: get_free_port(), PUBLISH_PORT: get_free_port()}
+        config_file = os.path.join(self.work_folder, 'load_generator_config.json')
+        with open(config_file, 'w') as file:
+            json.dump(self.json_config, file, indent=2)
+        return config_file
+
+    def start_overseer(self):
+        overseer_config = self.json_config[OVERSEER]
+        self.overseer = Overseer({OVERSEER_REPLY_PORT: overseer_config[REPLY_PORT],
+                                  OVERSEER_PUBLISH_PORT: overseer_config[PUBLISH_PORT],
+                                  NODES: [self.node_id]})
+        self.poller.register(self.overseer.reply_socket, zmq.POLLIN)
+
+    def start_target(self, config_file):
+        script = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), SCRIPT_NAMES[self.role])
+        command = [sys.executable, script, self.node_id, config_file, PUBLIC_IP_ADDRESS_ARG, LOOPBACK]
+        logging.info("Starting target: {}".format(" ".join(command)))
+        self.target_process = subprocess.Popen(command, cwd=self.work_folder)
+
+    # wait for the target's next overseer request, failing if the target exits first;
+    # publishes a subscription_check while waiting if publish_subscription_checks is set
+    def await_overseer_request(self, publish_subscription_checks=False):
+        deadline = time.perf_counter() + TARGET_TIMEOUT
+        while not self.overseer.reply_socket.poll(100, zmq.POLLIN):
+            if publish_subscription_checks:
+                self.overseer.publish_subscription_check()
+            if self.target_process.poll() is not None:
+                raise RuntimeError("{} exited with code {}!  See the logs in {}"
+                                   .format(self.node_id, self.target_process.returncode, self.work_folder))
+            if time.perf_counter() > deadline:
+                raise RuntimeError("No request from {} within {} seconds!".format(self.node_id, TARGET_TIMEOUT))
+
+    # the overseer's startup handshake, with the impersonated peers' addresses added to node_addresses
+    def start_simulation(self):
+        self.await_overseer_request()
+        self.overseer.handle_startup_request()
+        self.target_address_map = self.overseer.node_addresses[self.node_id]
+        self.create_peers()
+        while not self.overseer.all_subscriptions_confirmed():
+            self.await_overseer_request(publish_subscription_checks=True)
+            self.overseer.handle_startup_request()
+        self.overseer.node_addresses.update(self.peer_address_maps)
+        if self.json_config.get(VECTOR_TIMESTAMP_IMPLEMENTATION) == INDEXED:
+            self.node_index = NodeIndex.get_shared(sorted(self.overseer.node_addresses))
+        self.overseer.publish_node_addresses()
+        for peer_id in self.peer_address_maps:
+            del self.overseer.node_addresses[peer_id]
+        while not self.overseer.all_nodes_ready():
+            self.await_overseer_request()
+            self.overseer.handle_startup_request()
+        self.connect_to_target()
+        time.sleep(SUBSCRIPTION_DELAY)
+        self.overseer.publish_start_simulation()
+
+    def stop_simulation(self):
+        self.overseer.publish_stop_simulation()
+        while not self.overseer.all_deregistrations_completed():
+            self.await_overseer_request()
+            self.overseer.handle_node_deregistration_request()
+        self.target_process.wait(TARGET_TIMEOUT)
+        self.close_sockets()
+        self.context.term()
+        self.overseer.shutdown_zmq()
+
+    # handle every readable socket within timeout seconds; heartbeats go to the overseer stand-in
+    def poll(self, timeout):
+        for readable_socket, _ in self.poller.poll(max(0, timeout) * 1000):
+            if readable_socket == self.overseer.reply_socket:
+                self.overseer.handle_supervision_request()
+            else:
+                self.handle_readable(readable_socket)
+
+    # offer rate messages per second for step_duration seconds, then drain
+    def run_step(self, rate):
+        self.begin_step()
+        interval = 1 / rate
+        start = time.perf_counter()
+        end = start + self.step_duration
+        next_send = start
+        sent = 0
+        refused = 0
+        while True:
+            now = time.perf_counter()
+            if now >= end:
+                break
+            while next_send <= now and next_send < end:
+                if self.send_next():
+                    sent = sent + 1
+                else:
+                    refused = refused + 1
+                next_send = next_send + interval
+            self.poll(min(next_send, end) - time.perf_counter())
+        measurement = self.get_measurement(sent)
+        drain_end = time.perf_counter() + self.drain_time
+        while self.get_outstanding() > 0 and time.perf_counter() < drain_end:
+            self.drain()
+        return self.end_step(rate, sent, refused, measurement)
+
+    # measurement is (messages completed, messages sent, seconds), all over the span of the step in which the
+    # completions could be observed
+    def get_step_result(self, rate, sent, refused, measurement, unanswered, latencies):
+        completed, measured_sent, measured_seconds = measurement
+        latencies = sorted(latencies)
+        result = {OFFERED_RATE: rate,
+                  SENT_RATE: sent / self.step_duration,
+                  ACHIEVED_RATE: completed / measured_seconds,
+                  REFUSED: refused,
+                  UNANSWERED: unanswered}
+        for key, percentile in LATENCY_PERCENTILES.items():
+            latency = get_percentile(latencies, percentile)
+            result[key] = latency * 1000 if latency is not None else None
+        result[SATURATED] = refused > 0 or completed < SATURATION_RATIO * measured_sent \
+            or unanswered > UNANSWERED_RATIO * sent
+        return result
+
+    def ramp(self):
+        rate = self.start_rate
+        while rate <= self.max_rate:
+            result = self.run_step(rate)
+            self.steps.append(result)
+            print("offered {:>10.0f}/s  sent {:>10.0f}/s  achieved {:>10.0f}/s  p50 {:>9} ms  p99 {:>9} ms{}"
+                  .format(rate, result[SENT_RATE], result[ACHIEVED_RATE], format_latency(result[LATENCY_P50_MS]),
+                          format_latency(result[LATENCY_P99_MS]), "  saturated" if result[SATURATED] else ""),
+                  file=sys.stderr)
+            if result[SATURATED]:
+                break
+            if result[SENT_RATE] < SATURATION_RATIO * rate:
+                logging.warning("The load generator could only send {:.0f} of {} messages per second"
+                                .format(result[SENT_RATE], rate))
+                print("the load generator itself cannot offer more load; stopping", file=sys.stderr)
+                break
+            rate = rate * self.ramp_factor
+
+    def get_results(self):
+        sustained = [step[ACHIEVED_RATE] for step in self.steps if not step[SATURATED]]
+        saturated = [step[OFFERED_RATE] for step in self.steps if step[SATURATED]]
+        return {NODE_ID: self.node_id,
+                ROLE: self.role,
+                CLIENTS: self.clients,
+                STEP_DURATION: self.step_duration,
+                STEPS: self.steps,
+                MAX_SUSTAINED_RATE: max(sustained) if sustained else None,
+                SATURATION_RATE: saturated[0] if saturated else None}
+
+    def run(self):
+        config_file = self.prepare_config()
+        self.start_overseer()
+        self.start_target(config_file)
+        try:
+            self.start_simulation()
+            self.ramp()
+            self.stop_simulation()
+        finally:
+            if self.target_process.poll() is None:
+                self.target_process.kill()
+        return self.get_results()
+
+
+def format_latency(latency):
+    return "{:.3f}".format(latency) if latency is not None else "-"
+
+
+# impersonates electronic_medical_records sending disease notifications to a health_district_system
+class ElectronicMedicalRecordLoad(LoadGenerator):
+
+    def __init__(self, json_config, node_id, args):
+        super(ElectronicMedicalRecordLoad, self).__init__(json_config, node_id, args)
+        self.client_ids = ['load_electronic_medical_record_{}'.format(index) for index in range(self.clients)]
+        self.client_sockets = []
+        self.vector_timestamps = {client_id: VectorTimestamp() for client_id in self.client_ids}
+        self.next_client = 0
+        self.next_sequence_number = 0
+        # sequence_number => (step index, send time) of every unanswered notification
+        self.send_times = {}
+        self.alert_sockets = []
+        self.completed = 0
+        self.latencies = []
+
+    # the health_district_system subscribes to outbreak alerts from its disease_outbreak_analyzers
+    def create_peers(self):
+        for connection_node_id in self.json_config[NODES][self.node_id][CONNECTIONS]:
+            alert_socket = self.context.socket(zmq.PUB)
+            port = alert_socket.bind_to_random_port(TCP_PREFIX + LOOPBACK)
+            self.alert_sockets.append(alert_socket)
+            self.peer_address_maps[connection_node_id] = {
+                ROLE: DISEASE_OUTBREAK_ANALYZER,
+                HEALTH_DISTRICT_SYSTEM_ADDRESS: "{}{}:{}".format(TCP_PREFIX, LOOPBACK, port)}
+        for client_id in self.client_ids:
+            self.peer_address_maps[client_id] = {ROLE: ELECTRONIC_MEDICAL_RECORD}
+
+    def connect_to_target(self):
+        for _ in self.client_ids:
+            client_socket = self.context.socket(zmq.DEALER)
+            client_socket.connect(self.target_address_map[ELECTRONIC_MEDICAL_RECORD_ADDRESS])
+            self.poller.register(client_socket, zmq.POLLIN)
+            self.client_sockets.append(client_socket)
+
+    def close_sockets(self):
+        for open_socket in self.client_sockets + self.alert_sockets:
+            open_socket.close(linger=0)
+
+    def begin_step(self):
+        self.completed = 0
+        self.latencies = []
+
+    # one single-occurrence notification batch from the next client, round robin
+    def send_next(self):
+        client_id = self.client_ids[self.next_client]
+        client_socket = self.client_sockets[self.next_client]
+        self.next_client = (self.next_client + 1) % len(self.client_ids)
+        vector_timestamp = self.vector_timestamps[client_id]
+        vector_timestamp.increment_count(client_id)
+        sequence_number = self.next_sequence_number
+        self.next_sequence_number = self.next_sequence_number + 1
+        message = {MESSAGE_TYPE: DISEASE_NOTIFICATION_BATCH,
+                   ELECTRONIC_MEDICAL_RECORD_ID: client_id,
+                   SEQUENCE_NUMBER: sequence_number,
+                   DISEASE_COUNTS: {self.diseases[sequence_number % len(self.diseases)]: 1},
+                   LOCAL_TIMESTAMP: datetime.now(),
+                   VECTOR_TIMESTAMP: vector_timestamp}
+        try:
+            client_socket.send_multipart([b'', self.encode_message(message)], zmq.NOBLOCK)
+        except zmq.Again:
+            return False
+        self.send_times[sequence_number] = (len(self.steps), time.perf_counter())
+        return True
+
+    def handle_readable(self, client_socket):
+        while client_socket.poll(0, zmq.POLLIN):
+            [_, data] = client_socket.recv_multipart()
+            now = time.perf_counter()
+            sent = self.send_times.pop(self.decode_message(data).get(SEQUENCE_NUMBER), None)
+            # a late reply to an earlier step's notification completes nothing in this step
+            if sent is None or sent[0] != len(self.steps):
+                continue
+            self.completed = self.completed + 1
+            self.latencies.append(now - sent[1])
+
+    # every reply is observed as it arrives, so the whole step is measured
+    def get_measurement(self, sent):
+        return self.completed, sent, self.step_duration
+
+    def get_outstanding(self):
+        return len(self.send_times)
+
+    def drain(self):
+        self.poll(0.05)
+
+    def end_step(self, rate, sent, refused, measurement):
+        unanswered = len(self.send_times)
+        # replies that arrive after the drain are no longer matched to a request
+        self.send_times = {}
+        return self.get_step_result(rate, sent, refused, measurement, unanswered, self.latencies)
+
+
+# impersonates health_district_systems publishing daily disease counts to a disease_outbreak_analyzer
+class HealthDistrictSystemLoad(LoadGenerator):
+
+    def __init__(self, json_config, node_id, args):
+        super(HealthDistrictSystemLoad, self).__init__(json_config, node_id, args)
+        self.client_ids = ['load_health_district_system_{}'.format(index) for index in range(self.clients)]
+        node = json_config[NODES][node_id]
+        node[CONNECTIONS] = list(self.client_ids)
+        # every day's first count must publish an alert, whatever detector the configuration chose
+        node[ROLE_PARAMETERS][DAILY_OUTBREAK_THRESHOLD] = 0
+        node[ROLE_PARAMETERS][OUTBREAK_DETECTION] = THRESHOLD
+        self.disease = node[ROLE_PARAMETERS][DISEASE]
+        # with disease_topics publishing, the target only subscribes to its own disease's topic
+        self.disease_topic = None
+        if json_config.get(DISEASE_COUNT_PUBLISHING, COMBINED) == DISEASE_TOPICS:
+            self.disease_topic = Node.get_disease_topic(self.disease)
+        json_config[TIME_SCALING_FACTOR] = SECONDS_PER_DAY / PROBE_INTERVAL
+        self.client_sockets = []
+        self.vector_timestamps = {client_id: VectorTimestamp() for client_id in self.client_ids}
+        self.next_client = 0
+        # per publisher:  send time of each count, and the number of counts the target has handled
+        self.send_times = {client_id: [] for client_id in self.client_ids}
+        self.handled = {client_id: 0 for client_id in self.client_ids}
+        # per publisher:  the counts sent by the end of the step's load; later counts are drain probes
+        self.step_sent = {client_id: 0 for client_id in self.client_ids}
+        self.alert_socket = None
+        self.alert_vector_timestamp = VectorTimestamp()
+        self.alert_decoder = VectorTimestampDeltaDecoder(node_id)
+        self.sent = 0
+        # (perf_counter time, counts handled, counts sent) at the start of the step and at its latest probe
+        self.step_start = None
+        self.last_probe = None
+        self.latencies = []
+
+    def create_peers(self):
+        for client_id in self.client_ids:
+            client_socket = self.context.socket(zmq.PUB)
+            port = client_socket.bind_to_random_port(TCP_PREFIX + LOOPBACK)
+            self.client_sockets.append(client_socket)
+            self.peer_address_maps[client_id] = {
+                ROLE: HEALTH_DISTRICT_SYSTEM,
+                DISEASE_OUTBREAK_ANALYZER_ADDRESS: "{}{}:{}".format(TCP_PREFIX, LOOPBACK, port)}
+
+    def connect_to_target(self):
+        self.alert_socket = self.context.socket(zmq.SUB)
+        self.alert_socket.connect(self.target_address_map[HEALTH_DISTRICT_SYSTEM_ADDRESS])
+        self.alert_socket.setsockopt_string(zmq.SUBSCRIBE, '')
+        self.poller.register(self.alert_socket, zmq.POLLIN)
+
+    def close_sockets(self):
+        for open_socket in self.client_sockets + [self.alert_socket]:
+            open_socket.close(linger=0)
+
+    def get_total_handled(self):
+        return sum(self.handled.values())
+
+    def begin_step(self):
+        self.step_start = (time.perf_counter(), self.get_total_handled(), self.sent)
+        self.last_probe = None
+        self.latencies = []
+
+    # one daily disease count from the next publisher, round robin; the vector_timestamp entry
+    # of each publisher is the number of counts it has sent
+    def send_next(self):
+        client_id = self.client_ids[self.next_client]
+        client_socket = self.client_sockets[self.next_client]
+        self.next_client = (self.next_client + 1) % len(self.client_ids)
+        send_times = self.send_times[client_id]
+        vector_timestamp = self.vector_timestamps[client_id]
+        vector_timestamp.increment_count(client_id)
+        message = {MESSAGE_TYPE: DAILY_DISEASE_COUNT,
+                   HEALTH_DISTRICT_SYSTEM_ID: client_id,
+                   VECTOR_TIMESTAMP: vector_timestamp}
+        if self.disease_topic is not None:
+            message[DISEASE] = self.disease
+            message[self.disease] = len(send_times) + 1
+            frames = [self.disease_topic, self.encode_message(message)]
+        else:
+            for disease in self.diseases:
+                message[disease] = len(send_times) + 1
+            frames = [self.encode_message(message)]
+        try:
+            client_socket.send_multipart(frames, zmq.NOBLOCK)
+        except zmq.Again:
+            return False
+        send_times.append(time.perf_counter())
+        self.sent = self.sent + 1
+        return True
+
+    # an outbreak alert:  its vector_timestamp shows how many counts of each publisher were handled
+    def handle_readable(self, alert_socket):
+        while alert_socket.poll(0, zmq.POLLIN):
+            message = self.decode_message(alert_socket.recv())
+            now = time.perf_counter()
+            if VECTOR_TIMESTAMP_DELTA in message:
+                self.alert_decoder.apply(message[VECTOR_TIMESTAMP_DELTA], self.alert_vector_timestamp)
+            else:
+                self.alert_vector_timestamp.update_from_other(message[VECTOR_TIMESTAMP])
+            handled = dict(self.alert_vector_timestamp.items())
+            newest_send_time = None
+            for client_id in self.client_ids:
+                count = handled.get(client_id, 0)
+                if count > self.handled[client_id]:
+                    self.handled[client_id] = count
+                    send_time = self.send_times[client_id][count - 1]
+                    if newest_send_time is None or send_time > newest_send_time:
+                        newest_send_time = send_time
+            # the newest count is the one whose handling published the alert; the other publishers'
+            # newest counts were handled earlier, and waited for the probe rather than for the target
+            if newest_send_time is not None and newest_send_time >= self.step_start[0]:
+                self.latencies.append(now - newest_send_time)
+            self.last_probe = (now, self.get_total_handled(), self.sent)
+
+    # the counts handled by the step's last probe; counts sent after it are not known to be handled yet.
+    # Called once the step's load has been sent
+    def get_measurement(self, sent):
+        self.step_sent = {client_id: len(self.send_times[client_id]) for client_id in self.client_ids}
+        if self.last_probe is None:
+            return 0, sent, self.step_duration
+        start_time, start_handled, start_sent = self.step_start
+        probe_time, probe_handled, probe_sent = self.last_probe
+        return probe_handled - start_handled, probe_sent - start_sent, probe_time - start_time
+
+    # the step's counts that are not known to be handled; drain probes are not waited for
+    def get_outstanding(self):
+        return sum(max(0, self.step_sent[client_id] - self.handled[client_id]) for client_id in self.client_ids)
+
+    # alerts are only published after a count arrives, so probe once per simulated day until the
+    # alert that follows the step's counts arrives
+    def drain(self):
+        self.send_next()
+        self.poll(PROBE_INTERVAL)
+
+    def end_step(self, rate, sent, refused, measurement):
+        return self.get_step_result(rate, sent, refused, measurement, self.get_outstanding(), self.latencies)
+
+
+LOAD_GENERATORS = {
+    HEALTH_DISTRICT_SYSTEM: ElectronicMedicalRecordLoad,
+    DISEASE_OUTBREAK_ANALYZER: HealthDistrictSystemLoad,
+}
+
+
+def main():
+    args = parse_load_generator_cmd_line()
+    with open(args.config_file) as config_file:
+        json_config = json.load(config_file)
+    if args.node_id not in json_config[NODES]:
+        raise KeyError("node_id: " + args.node_id + " was not found in the configuration file!")
+    role = json_config[NODES][args.node_id][ROLE]
+    if role not in LOAD_GENERATORS:
+        raise SyntaxError(args.node_id + " has role: " + role + " in the configuration file.  "
+                          "Only health_district_system and disease_outbreak_analyzer nodes can be load tested.")
+
+    load_generator = LOAD_GENERATORS[role](json_config, args.node_id, args)
+    logging.basicConfig(format='%(message)s',
+                        filename=os.path.join(load_generator.work_folder, LOAD_GENERATOR_LOG),
+                        level=logging.INFO)
+    print("Load testing {} ({}); logs are in {}".format(args.node_id, role, load_generator.work_folder),
+          file=sys.stderr)
+    results = load_generator.run()
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
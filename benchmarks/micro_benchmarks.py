@@ -0,0 +1,257 @@
+# micro-benchmarks for the code that runs once per message:  vector_timestamp merges, message
+# encoding and decoding, and the per-message handlers of the health_district_system, the
+# disease_outbreak_analyzer, and the overseer.  Run from the repository root with
+#     python -m benchmarks.micro_benchmarks [--repeat N] [--filter name] [--output file] [--baseline file]
+# Results are printed (or written to --output) as JSON; given a --baseline results file from an
+# earlier run, each benchmark's change against the baseline is reported on stderr.
+import json
+import pickle
+import platform
+import statistics
+import sys
+import timeit
+from datetime import datetime
+
+import zmq
+
+from config.command_line_parser import parse_benchmark_cmd_line
+from disease_outbreak_analyzer import DiseaseOutbreakAnalyzer
+from health_district_system import HealthDistrictSystem
+from overseer import Overseer
+from shared.constants import *
+from shared.vector_timestamp import IndexedVectorTimestamp, NodeIndex, VectorTimestamp
+from shared.wire_codec import WireCodec
+
+# number of node_ids in a vector_timestamp
+CLUSTER_SIZES = [10, 100, 1000]
+# cluster size of the vector_timestamps carried by the sample messages
+MESSAGE_CLUSTER_SIZE = 100
+SAMPLE_DISEASES = ['influenza', 'chicken_pox', 'measles', 'mumps', 'rubella']
+LOCAL_TIMESTAMP_VALUE = datetime(2018, 3, 1, 12, 30)
+
+
+def get_node_ids(cluster_size):
+    return ['node_{}'.format(index) for index in range(cluster_size)]
+
+
+def new_vector_timestamp(implementation, node_ids, offset=0):
+    if implementation == INDEXED:
+        vector_timestamp = IndexedVectorTimestamp(NodeIndex.get_shared(node_ids))
+    else:
+        vector_timestamp = VectorTimestamp()
+    for index, node_id in enumerate(node_ids):
+        for _ in range((index + offset) % 3 + 1):
+            vector_timestamp.increment_count(node_id)
+    return vector_timestamp
+
+
+# one sample of every message type exchanged by the simulation nodes
+def get_sample_messages():
+    vector_timestamp = new_vector_timestamp(DICT, get_node_ids(MESSAGE_CLUSTER_SIZE))
+    daily_disease_count = {MESSAGE_TYPE: DAILY_DISEASE_COUNT,
+                           HEALTH_DISTRICT_SYSTEM_ID: 'node_1',
+                           START_TIMESTAMP: LOCAL_TIMESTAMP_VALUE,
+                           VECTOR_TIMESTAMP: vector_timestamp}
+    for index, disease in enumerate(SAMPLE_DISEASES):
+        daily_disease_count[disease] = index * 7
+    return {
+        DISEASE_NOTIFICATION: {MESSAGE_TYPE: DISEASE_NOTIFICATION,
+                               ELECTRONIC_MEDICAL_RECORD_ID: 'node_0',
+                               DISEASE: SAMPLE_DISEASES[0],
+                               LOCAL_TIMESTAMP: LOCAL_TIMESTAMP_VALUE,
+                               VECTOR_TIMESTAMP: vector_timestamp},
+        DISEASE_NOTIFICATION_BATCH: {MESSAGE_TYPE: DISEASE_NOTIFICATION_BATCH,
+                                     ELECTRONIC_MEDICAL_RECORD_ID: 'node_0',
+                                     SEQUENCE_NUMBER: 12345,
+                                     DISEASE_COUNTS: {SAMPLE_DISEASES[0]: 2, SAMPLE_DISEASES[2]: 1},
+                                     LOCAL_TIMESTAMP: LOCAL_TIMESTAMP_VALUE,
+                                     VECTOR_TIMESTAMP: vector_timestamp},
+        DISEASE_NOTIFICATION_REPLY: {MESSAGE_TYPE: DISEASE_NOTIFICATION_REPLY,
+                                     STATUS: RECEIVED,
+                                     VECTOR_TIMESTAMP: vector_timestamp},
+        OUTBREAK_QUERY: {MESSAGE_TYPE: OUTBREAK_QUERY,
+                         ELECTRONIC_MEDICAL_RECORD_ID: 'node_0',
+                         VECTOR_TIMESTAMP: vector_timestamp},
+        OUTBREAK_QUERY_REPLY: {MESSAGE_TYPE: OUTBREAK_QUERY_REPLY,
+                               OUTBREAKS: {SAMPLE_DISEASES[0]},
+                               VECTOR_TIMESTAMP: vector_timestamp},
+        DAILY_DISEASE_COUNT: daily_disease_count,
+        DISEASE_OUTBREAK_ALERT: {MESSAGE_TYPE: DISEASE_OUTBREAK_ALERT,
+                                 DISEASE: SAMPLE_DISEASES[0],
+                                 VECTOR_TIMESTAMP: vector_timestamp},
+        DAILY_DISEASE_COUNT_DELTA: {MESSAGE_TYPE: DAILY_DISEASE_COUNT_DELTA,
+                                    HEALTH_DISTRICT_SYSTEM_ID: 'node_1',
+                                    SEQUENCE_NUMBER: 12345,
+                                    FULL_SNAPSHOT: False,
+                                    DISEASE_COUNTS: {SAMPLE_DISEASES[1]: 7},
+                                    START_TIMESTAMP: LOCAL_TIMESTAMP_VALUE,
+                                    VECTOR_TIMESTAMP: vector_timestamp},
+    }
+
+
+def get_node_config(node_id, role, role_parameters):
+    # inproc endpoints on a shared context, so no ports are bound and no overseer needs to run
+    return {NODE_ID: node_id,
+            ROLE: role,
+            ROLE_PARAMETERS: role_parameters,
+            CONNECTIONS: [],
+            TIME_SCALING_FACTOR: 1800,
+            DISEASES: SAMPLE_DISEASES,
+            TRANSPORT: INPROC}
+
+
+class MicroBenchmarks:
+
+    def __init__(self, repeat, name_filter=None):
+        self.repeat = repeat
+        self.name_filter = name_filter
+        self.context = zmq.Context()
+        self.nodes = []
+        self.results = []
+
+    # time function with timeit:  autorange picks the call count for one run, and the best
+    # and median of repeat runs are recorded per call
+    def run(self, benchmark, parameters, function):
+        if self.name_filter is not None and self.name_filter not in benchmark:
+            return
+        timer = timeit.Timer(function)
+        number, _ = timer.autorange()
+        seconds_per_call = [seconds / number for seconds in timer.repeat(self.repeat, number)]
+        result = {BENCHMARK: benchmark,
+                  PARAMETERS: parameters,
+                  CALLS_PER_RUN: number,
+                  BEST_SECONDS: min(seconds_per_call),
+                  MEDIAN_SECONDS: statistics.median(seconds_per_call)}
+        self.results.append(result)
+        print("{:<96} {:>12.3f} us".format(get_result_key(result), result[BEST_SECONDS] * 1e6), file=sys.stderr)
+
+    def benchmark_vector_timestamp_update_from_other(self):
+        for implementation in (DICT, INDEXED):
+            for cluster_size in CLUSTER_SIZES:
+                node_ids = get_node_ids(cluster_size)
+                vector_timestamp = new_vector_timestamp(implementation, node_ids)
+                other_vector_timestamp = new_vector_timestamp(implementation, node_ids, offset=1)
+                self.run('vector_timestamp.update_from_other',
+                         {VECTOR_TIMESTAMP_IMPLEMENTATION: implementation, CLUSTER_SIZE: cluster_size},
+                         lambda: vector_timestamp.update_from_other(other_vector_timestamp))
+
+    # what a receiver does with every message's clock:  decode it and merge it into its own
+    def benchmark_vector_timestamp_receive(self):
+        wire_codec = WireCodec(SAMPLE_DISEASES)
+        codecs = {PICKLE: (pickle.dumps, pickle.loads),
+                  BINARY: (wire_codec.encode, wire_codec.decode)}
+        for implementation in (DICT, INDEXED):
+            for cluster_size in CLUSTER_SIZES:
+                node_ids = get_node_ids(cluster_size)
+                vector_timestamp = new_vector_timestamp(implementation, node_ids)
+                message = {MESSAGE_TYPE: DISEASE_OUTBREAK_ALERT,
+                           DISEASE: SAMPLE_DISEASES[0],
+                           VECTOR_TIMESTAMP: new_vector_timestamp(implementation, node_ids, offset=1)}
+                for wire_protocol, (encode, decode) in codecs.items():
+                    data = encode(message)
+                    self.run('vector_timestamp.receive',
+                             {VECTOR_TIMESTAMP_IMPLEMENTATION: implementation, CLUSTER_SIZE: cluster_size,
+                              WIRE_PROTOCOL: wire_protocol, ENCODED_BYTES: len(data)},
+                             lambda: vector_timestamp.update_from_other(decode(data)[VECTOR_TIMESTAMP]))
+
+    def benchmark_message_encoding(self):
+        wire_codec = WireCodec(SAMPLE_DISEASES)
+        codecs = {PICKLE: (pickle.dumps, pickle.loads),
+                  BINARY: (wire_codec.encode, wire_codec.decode)}
+        for message_type, message in get_sample_messages().items():
+            for wire_protocol, (encode, decode) in codecs.items():
+                data = encode(message)
+                parameters = {MESSAGE_TYPE: message_type, WIRE_PROTOCOL: wire_protocol, ENCODED_BYTES: len(data)}
+                self.run('message.encode', parameters, lambda: encode(message))
+                self.run('message.decode', parameters, lambda: decode(data))
+
+    def benchmark_health_district_system(self):
+        health_district_system = HealthDistrictSystem(
+            get_node_config('node_1', HEALTH_DISTRICT_SYSTEM, {DAILY_COUNT_SEND_FREQUENCY: 2}), self.context)
+        health_district_system.record_start_time()
+        self.nodes.append(health_district_system)
+        messages = get_sample_messages()
+        self.run('health_district_system.handle_disease_notification', {},
+                 lambda: health_district_system.handle_disease_notification(messages[DISEASE_NOTIFICATION]))
+        # the whole request path:  counting, vector_timestamp merge, and building the reply
+        for message_type in (DISEASE_NOTIFICATION, DISEASE_NOTIFICATION_BATCH, OUTBREAK_QUERY):
+            message = messages[message_type]
+            self.run('health_district_system.process_electronic_medical_record_message',
+                     {MESSAGE_TYPE: message_type, CLUSTER_SIZE: MESSAGE_CLUSTER_SIZE},
+                     lambda: health_district_system.process_electronic_medical_record_message(message))
+
+    def benchmark_disease_outbreak_analyzer(self):
+        # a threshold that is never reached, so no alert is published
+        disease_outbreak_analyzer = DiseaseOutbreakAnalyzer(
+            get_node_config('node_2', DISEASE_OUTBREAK_ANALYZER,
+                            {DISEASE: SAMPLE_DISEASES[0], DAILY_OUTBREAK_THRESHOLD: sys.maxsize}), self.context)
+        disease_outbreak_analyzer.record_start_time()
+        self.nodes.append(disease_outbreak_analyzer)
+        message = get_sample_messages()[DAILY_DISEASE_COUNT]
+        self.run('disease_outbreak_analyzer.handle_daily_disease_count_message',
+                 {CLUSTER_SIZE: MESSAGE_CLUSTER_SIZE},
+                 lambda: disease_outbreak_analyzer.handle_daily_disease_count_message(message))
+
+    def benchmark_overseer_heartbeats(self):
+        overseer = Overseer({TRANSPORT: INPROC}, self.context)
+        for cluster_size in CLUSTER_SIZES:
+            overseer.track_node_heartbeats(get_node_ids(cluster_size))
+
+            # one heartbeat as handled by handle_supervision_request, without the socket round trip
+            def handle_heartbeat():
+                overseer.record_heartbeat('node_0')
+                overseer.check_node_heartbeats()
+
+            self.run('overseer.handle_heartbeat', {CLUSTER_SIZE: cluster_size}, handle_heartbeat)
+        overseer.shutdown_zmq()
+
+    def run_all(self):
+        self.benchmark_vector_timestamp_update_from_other()
+        self.benchmark_vector_timestamp_receive()
+        self.benchmark_message_encoding()
+        self.benchmark_health_district_system()
+        self.benchmark_disease_outbreak_analyzer()
+        self.benchmark_overseer_heartbeats()
+        for node in self.nodes:
+            node.shutdown_zmq()
+        self.context.term()
+        return {PYTHON_VERSION: platform.python_version(),
+                RESULTS: self.results}
+
+
+# benchmark name plus its parameters, e.g. "message.encode[message_type=outbreak_query,wire_protocol=pickle]";
+# results are matched against a baseline by this key
+def get_result_key(result):
+    parameters = ",".join("{}={}".format(key, value) for key, value in sorted(result[PARAMETERS].items())
+                          if key != ENCODED_BYTES)
+    return "{}[{}]".format(result[BENCHMARK], parameters) if parameters else result[BENCHMARK]
+
+
+def compare_with_baseline(results, baseline_results):
+    baseline = {get_result_key(result): result for result in baseline_results[RESULTS]}
+    print("\n{:<96} {:>12} {:>12} {:>8}".format("benchmark", "baseline us", "current us", "change"), file=sys.stderr)
+    for result in results[RESULTS]:
+        key = get_result_key(result)
+        if key not in baseline:
+            continue
+        baseline_seconds = baseline[key][BEST_SECONDS]
+        change = (result[BEST_SECONDS] - baseline_seconds) / baseline_seconds
+        print("{:<96} {:>12.3f} {:>12.3f} {:>+7.1%}".format(key, baseline_seconds * 1e6,
+                                                            result[BEST_SECONDS] * 1e6, change), file=sys.stderr)
+
+
+def main():
+    args = parse_benchmark_cmd_line()
+    results = MicroBenchmarks(args.repeat, args.filter).run_all()
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            compare_with_baseline(results, json.load(baseline_file))
+
+
+if __name__ == "__main__":
+    main()
@@ -23,8 +23,86 @@ def parse_node_cmd_line():
     return args
 
 
-def parse_runner_cmd_line():
+def parse_electronic_medical_record_host_cmd_line():
     parser = argparse.ArgumentParser()
     parser.add_argument(CONFIG_FILE, help="the simulation configuration file in JSON format")
+    parser.add_argument(NODE_IDS, nargs='+', help="the node_ids of the electronic_medical_records to host, "
+                                                  "as found in the config_file")
+    parser.add_argument(LOG_POST_URL_ARG, help="log POST URL")
+    args = parser.parse_args()
+    return args
+
+
+def parse_discrete_event_cmd_line():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(CONFIG_FILE, help="the simulation configuration file in JSON format")
+    parser.add_argument(DAYS_ARG, type=float, default=DEFAULT_SIMULATION_DAYS,
+                        help="the number of simulated days to run")
+    parser.add_argument(SEED_ARG, type=int, default=0,
+                        help="the seed for all pseudorandom number generators; equal seeds give equal runs")
+    parser.add_argument(TICK_INTERVAL_ARG, type=float, default=DEFAULT_TICK_INTERVAL,
+                        help="real-time seconds between each node's periodic tasks")
+    parser.add_argument(NETWORK_LATENCY_ARG, type=float, default=DEFAULT_NETWORK_LATENCY,
+                        help="real-time seconds for asynchronous messages to reach their peers")
+    args = parser.parse_args()
+    return args
+
+
+def parse_runner_cmd_line(role):
+    parser = argparse.ArgumentParser()
+    parser.add_argument(CONFIG_FILE, help="the simulation configuration file in JSON format")
+    parser.add_argument(MAX_STARTING_NODES_ARG, type=int, default=DEFAULT_MAX_STARTING_NODES,
+                        help="the most simulation nodes that may be starting up (launched but not yet "
+                             "registered with the overseer) at once")
+    if role == RUN_AWS:
+        parser.add_argument(MAX_DEPLOYMENT_WORKERS_ARG, type=int, default=DEFAULT_MAX_DEPLOYMENT_WORKERS,
+                            help="the most EC2 instances to deploy to at once")
+        parser.add_argument(INSTANCE_CAPACITY_ARG, type=int, default=DEFAULT_INSTANCE_CAPACITY,
+                            help="the resource units of simulation nodes to place on each EC2 instance")
+    args = parser.parse_args()
+    return args
+
+
+def parse_single_process_cmd_line():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(CONFIG_FILE, help="the simulation configuration file in JSON format")
+    parser.add_argument(DURATION_ARG, type=float, default=None,
+                        help="stop the simulation after this many seconds instead of waiting for Ctrl-C")
+    parser.add_argument(ASYNCIO_ARG, action='store_true',
+                        help="run every node as a coroutine of one asyncio event loop")
+    args = parser.parse_args()
+    return args
+
+
+def parse_benchmark_cmd_line():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(REPEAT_ARG, type=int, default=DEFAULT_BENCHMARK_REPEAT,
+                        help="the number of timing runs per benchmark; the best and median runs are reported")
+    parser.add_argument(FILTER_ARG, default=None, help="only run benchmarks whose name contains this string")
+    parser.add_argument(OUTPUT_ARG, default=None, help="write the JSON results to this file instead of stdout")
+    parser.add_argument(BASELINE_ARG, default=None,
+                        help="a JSON results file from an earlier run to compare against")
+    args = parser.parse_args()
+    return args
+
+
+def parse_load_generator_cmd_line():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(CONFIG_FILE, help="the simulation configuration file in JSON format")
+    parser.add_argument(NODE_ID, help="the node_id of the health_district_system or disease_outbreak_analyzer "
+                                      "to load test, as found in the config_file")
+    parser.add_argument(CLIENTS_ARG, type=int, default=DEFAULT_LOAD_CLIENTS,
+                        help="the number of electronic_medical_records or health_district_systems to impersonate")
+    parser.add_argument(START_RATE_ARG, type=float, default=DEFAULT_START_RATE,
+                        help="the offered load of the first step, in messages per second")
+    parser.add_argument(RAMP_FACTOR_ARG, type=float, default=DEFAULT_RAMP_FACTOR,
+                        help="the offered load of each step is this many times the previous step's")
+    parser.add_argument(MAX_RATE_ARG, type=float, default=DEFAULT_MAX_RATE,
+                        help="stop ramping after the step that offers at most this many messages per second")
+    parser.add_argument(STEP_DURATION_ARG, type=float, default=DEFAULT_STEP_DURATION,
+                        help="seconds of load per step")
+    parser.add_argument(DRAIN_TIME_ARG, type=float, default=DEFAULT_DRAIN_TIME,
+                        help="seconds to wait for outstanding messages after each step")
+    parser.add_argument(OUTPUT_ARG, default=None, help="write the JSON results to this file instead of stdout")
     args = parser.parse_args()
     return args
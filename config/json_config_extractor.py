@@ -16,6 +16,67 @@ def extract_diseases(config, json_config):
     config[DISEASES] = json_config[DISEASES]
 
 
+def extract_wire_protocol(config, json_config):
+    wire_protocol = json_config.get(WIRE_PROTOCOL, PICKLE)
+    if wire_protocol not in (PICKLE, BINARY):
+        raise ValueError("Unknown wire_protocol: " + wire_protocol + " in the configuration file!")
+    config[WIRE_PROTOCOL] = wire_protocol
+
+
+def extract_vector_timestamp_implementation(config, json_config):
+    vector_timestamp_implementation = json_config.get(VECTOR_TIMESTAMP_IMPLEMENTATION, DICT)
+    if vector_timestamp_implementation not in (DICT, INDEXED):
+        raise ValueError("Unknown vector_timestamp_implementation: " + vector_timestamp_implementation +
+                         " in the configuration file!")
+    config[VECTOR_TIMESTAMP_IMPLEMENTATION] = vector_timestamp_implementation
+
+
+def extract_vector_timestamp_encoding(config, json_config):
+    vector_timestamp_encoding = json_config.get(VECTOR_TIMESTAMP_ENCODING, FULL)
+    if vector_timestamp_encoding not in (FULL, DELTA):
+        raise ValueError("Unknown vector_timestamp_encoding: " + vector_timestamp_encoding +
+                         " in the configuration file!")
+    config[VECTOR_TIMESTAMP_ENCODING] = vector_timestamp_encoding
+    config[FULL_SNAPSHOT_INTERVAL] = json_config.get(FULL_SNAPSHOT_INTERVAL, DEFAULT_FULL_SNAPSHOT_INTERVAL)
+
+
+def extract_disease_count_publishing(config, json_config):
+    disease_count_publishing = json_config.get(DISEASE_COUNT_PUBLISHING, COMBINED)
+    if disease_count_publishing not in (COMBINED, DISEASE_TOPICS):
+        raise ValueError("Unknown disease_count_publishing: " + disease_count_publishing +
+                         " in the configuration file!")
+    config[DISEASE_COUNT_PUBLISHING] = disease_count_publishing
+
+
+def extract_disease_count_encoding(config, json_config):
+    disease_count_encoding = json_config.get(DISEASE_COUNT_ENCODING, FULL)
+    if disease_count_encoding not in (FULL, DELTA):
+        raise ValueError("Unknown disease_count_encoding: " + disease_count_encoding +
+                         " in the configuration file!")
+    config[DISEASE_COUNT_ENCODING] = disease_count_encoding
+    config[DISEASE_COUNT_SNAPSHOT_INTERVAL] = json_config.get(DISEASE_COUNT_SNAPSHOT_INTERVAL,
+                                                              DEFAULT_DISEASE_COUNT_SNAPSHOT_INTERVAL)
+
+
+# sample_rates:  {event: fraction of occurrences to log}, rate_limits:  {event: most occurrences logged per second}
+def extract_same_host_transport(config, json_config):
+    same_host_transport = json_config.get(SAME_HOST_TRANSPORT, IPC)
+    if same_host_transport not in (IPC, TCP):
+        raise ValueError("Unknown same_host_transport: " + same_host_transport + " in the configuration file!")
+    config[SAME_HOST_TRANSPORT] = same_host_transport
+
+
+def extract_event_logging(config, json_config):
+    event_logging = json_config.get(EVENT_LOGGING, {})
+    for event, sample_rate in event_logging.get(SAMPLE_RATES, {}).items():
+        if not 0 < sample_rate <= 1:
+            raise ValueError("sample_rate of event: " + event + " must be greater than 0 and at most 1!")
+    for event, rate_limit in event_logging.get(RATE_LIMITS, {}).items():
+        if rate_limit <= 0:
+            raise ValueError("rate_limit of event: " + event + " must be greater than 0!")
+    config[EVENT_LOGGING] = event_logging
+
+
 def extract_node_names(config, json_config):
     config[NODES] = list(json_config[NODES].keys())
 
@@ -42,6 +103,13 @@ def extract_node_config(config, json_config, node_id):
     extract_overseer(config, json_config)
     extract_time_scaling_factor(config, json_config)
     extract_diseases(config, json_config)
+    extract_wire_protocol(config, json_config)
+    extract_vector_timestamp_implementation(config, json_config)
+    extract_vector_timestamp_encoding(config, json_config)
+    extract_disease_count_publishing(config, json_config)
+    extract_disease_count_encoding(config, json_config)
+    extract_same_host_transport(config, json_config)
+    extract_event_logging(config, json_config)
     extract_node(config, json_config, node_id)
     return config
 
@@ -58,3 +126,23 @@ def extract_runner_config(config, json_config):
     extract_overseer(config, json_config)
     extract_node_roles(config, json_config)
     return config
+
+
+def extract_electronic_medical_record_host_config(config, json_config, node_ids):
+    extract_overseer(config, json_config)
+    extract_event_logging(config, json_config)
+    config[NODE_CONFIGS] = {}
+    for node_id in node_ids:
+        config[NODE_CONFIGS][node_id] = extract_node_config({}, json_config, node_id)
+    return config
+
+
+# the overseer's and every node's config, for runners that host the whole simulation in one process
+def extract_in_process_config(config, json_config):
+    extract_runner_config(config, json_config)
+    extract_event_logging(config, json_config)
+    config[OVERSEER_CONFIG] = extract_overseer_config({ROLE: OVERSEER}, json_config)
+    config[NODE_CONFIGS] = {}
+    for node_id in json_config[NODES]:
+        config[NODE_CONFIGS][node_id] = extract_node_config({}, json_config, node_id)
+    return config
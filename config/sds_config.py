@@ -4,8 +4,11 @@ import os
 
 import requests
 
-from config.command_line_parser import parse_node_cmd_line, parse_overseer_cmd_line, parse_runner_cmd_line
-from config.json_config_extractor import extract_node_config, extract_overseer_config, extract_runner_config
+from config.command_line_parser import parse_discrete_event_cmd_line, \
+    parse_electronic_medical_record_host_cmd_line, parse_node_cmd_line, parse_overseer_cmd_line, \
+    parse_runner_cmd_line, parse_single_process_cmd_line
+from config.json_config_extractor import extract_electronic_medical_record_host_config, extract_in_process_config, \
+    extract_node, extract_node_config, extract_overseer_config, extract_runner_config
 from shared.constants import *
 
 
@@ -24,6 +27,21 @@ def get_node_config(role):
     return config
 
 
+def get_electronic_medical_record_host_config():
+    config = {}
+    args = parse_electronic_medical_record_host_cmd_line()
+    if args.log_post_url:
+        config[LOG_POST_URL] = args.log_post_url
+    json_config = get_json_config(config, args.config_file)
+    extract_electronic_medical_record_host_config(config, json_config, args.node_ids)
+    for node_id, node_config in config[NODE_CONFIGS].items():
+        if node_config[ROLE] != ELECTRONIC_MEDICAL_RECORD:
+            raise SyntaxError(node_id + " has role: " + node_config[ROLE] + " in the configuration file.  "
+                              "Only electronic_medical_record nodes can be hosted together.")
+    config[ROLE] = ELECTRONIC_MEDICAL_RECORD_HOST
+    return config
+
+
 def get_overseer_config():
     config = {}
     args = parse_overseer_cmd_line()
@@ -37,10 +55,53 @@ def get_overseer_config():
 
 def get_runner_config(role):
     config = {}
-    args = parse_runner_cmd_line()
+    args = parse_runner_cmd_line(role)
     json_config = get_json_config(config, args.config_file)
     extract_runner_config(config, json_config)
     config[ROLE] = role
+    config[MAX_STARTING_NODES] = args.max_starting_nodes
+    if config[MAX_STARTING_NODES] < 1:
+        raise ValueError("max_starting_nodes must be at least 1!")
+    if role == RUN_AWS:
+        config[MAX_DEPLOYMENT_WORKERS] = args.max_deployment_workers
+        if config[MAX_DEPLOYMENT_WORKERS] < 1:
+            raise ValueError("max_deployment_workers must be at least 1!")
+        config[INSTANCE_CAPACITY] = args.instance_capacity
+        if config[INSTANCE_CAPACITY] < 1:
+            raise ValueError("instance_capacity must be at least 1!")
+        # the placement of nodes onto EC2 instances depends on their roles, connections, and role_parameters
+        config[NODE_CONFIGS] = {}
+        for node_id in json_config[NODES]:
+            config[NODE_CONFIGS][node_id] = {}
+            extract_node(config[NODE_CONFIGS][node_id], json_config, node_id)
+    return config
+
+
+def get_discrete_event_config():
+    config = {}
+    args = parse_discrete_event_cmd_line()
+    json_config = get_json_config(config, args.config_file)
+    extract_in_process_config(config, json_config)
+    config[ROLE] = RUN_DISCRETE_EVENT
+    config[DAYS] = args.days
+    config[SEED] = args.seed
+    config[TICK_INTERVAL] = args.tick_interval
+    config[NETWORK_LATENCY] = args.network_latency
+    return config
+
+
+def get_single_process_config():
+    config = {}
+    args = parse_single_process_cmd_line()
+    json_config = get_json_config(config, args.config_file)
+    extract_in_process_config(config, json_config)
+    config[ROLE] = RUN_SINGLE_PROCESS
+    config[DURATION] = args.duration
+    config[ASYNCIO] = args.asyncio
+    # every node and the overseer talk over inproc endpoints of one shared context
+    config[OVERSEER_CONFIG][TRANSPORT] = INPROC
+    for node_config in config[NODE_CONFIGS].values():
+        node_config[TRANSPORT] = INPROC
     return config
 
 
@@ -3,33 +3,45 @@ import logging
 import zmq
 
 from config.sds_config import get_node_config
+from shared.async_node import AsyncNode
 from shared.constants import *
+from shared.disease_count_delta import DiseaseCountDeltaDecoder
+from shared.event_log import start_logging, stop_logging
+from shared.health_district_counts import HealthDistrictCounts
+from shared.metrics import timed
 from shared.node import Node
+from shared.outbreak_detectors import create_outbreak_detector
 
 
 class DiseaseOutbreakAnalyzer(Node):
 
-    def __init__(self, config):
-        super(DiseaseOutbreakAnalyzer, self).__init__(config)
+    def __init__(self, config, context=None):
+        super(DiseaseOutbreakAnalyzer, self).__init__(config, context)
         self.disease = self.role_parameters[DISEASE]
         self.daily_outbreak_threshold = self.role_parameters[DAILY_OUTBREAK_THRESHOLD]
         self.disease_outbreak_alert_publisher_socket = None
         self.disease_count_subscription_sockets = set()
+        # health_district_system_id => index into each day's HealthDistrictCounts
+        self.health_district_slots = {}
+        # per-health_district_system sequence tracking of delta-encoded daily counts
+        self.disease_count_decoders = {}
         self.current_daily_disease_counts = self.new_daily_disease_counts()
-        self.previous_daily_disease_counts = []
+        self.daily_count_history = self.new_daily_count_history()
+        # scores each day's running total against the archived days; see shared/outbreak_detectors.py
+        self.outbreak_detector = create_outbreak_detector(self.role_parameters.get(OUTBREAK_DETECTION, THRESHOLD),
+                                                          self.role_parameters.get(OUTBREAK_DETECTION_PARAMETERS, {}),
+                                                          self.daily_outbreak_threshold)
+        self.outbreak_detector.check_history(self.daily_count_history)
 
     # disease_outbreak_analyzer nodes use PUB listeners to publish
     # disease outbreak alerts to health_district_systems
     def setup_listeners(self):
-        # create listener zmq sockets and save IP address and ports in config
-        my_ip_address = self.get_ip_address()
+        # create listener zmq sockets and save their addresses in config
         self.disease_outbreak_alert_publisher_socket = self.context.socket(zmq.PUB)
-        disease_outbreak_alert_publisher_port = \
-            self.disease_outbreak_alert_publisher_socket.bind_to_random_port(TCP_RANDOM_PORT)
         self.config[ADDRESS_MAP] = {
             ROLE: self.role,
             HEALTH_DISTRICT_SYSTEM_ADDRESS:
-                "tcp://{}:{}".format(my_ip_address, str(disease_outbreak_alert_publisher_port))
+                self.bind_listener(self.disease_outbreak_alert_publisher_socket, HEALTH_DISTRICT_SYSTEM_ADDRESS)
         }
 
     # shutdown listeners that were created in setup_listeners
@@ -43,11 +55,14 @@ class DiseaseOutbreakAnalyzer(Node):
         logging.debug("Connecting to node_id's: {}".format(connection_node_ids))
         for connection_node_id in connection_node_ids:
             # get the connection addresses
-            connection_node_address = self.node_addresses[connection_node_id][DISEASE_OUTBREAK_ANALYZER_ADDRESS]
+            connection_node_address = self.get_peer_address(connection_node_id, DISEASE_OUTBREAK_ANALYZER_ADDRESS)
             disease_count_subscription_socket = self.context.socket(zmq.SUB)
             disease_count_subscription_socket.connect(connection_node_address)
-            # empty string filter => receive all messages
-            disease_count_subscription_socket.setsockopt_string(zmq.SUBSCRIBE, '')
+            if self.disease_count_publishing == DISEASE_TOPICS:
+                disease_count_subscription_socket.setsockopt(zmq.SUBSCRIBE, self.get_disease_topic(self.disease))
+            else:
+                # empty string filter => receive all messages
+                disease_count_subscription_socket.setsockopt_string(zmq.SUBSCRIBE, '')
             self.disease_count_subscription_sockets.add(disease_count_subscription_socket)
 
     # close connections to peer nodes
@@ -65,102 +80,133 @@ class DiseaseOutbreakAnalyzer(Node):
     def new_daily_disease_counts(self):
         return {DISEASE_OUTBREAK_ANALYZER_ID: self.node_id,
                 DISEASE: self.disease,
-                HEALTH_DISTRICT_COUNTS: {},
+                HEALTH_DISTRICT_COUNTS: HealthDistrictCounts(self.health_district_slots),
                 TOTAL: 0,
                 DAILY_OUTBREAK_THRESHOLD: self.daily_outbreak_threshold,
                 NOTIFICATION_SENT: False}
 
-    def update_daily_disease_counts(self, health_district_system_id, disease_count):
-        self.current_daily_disease_counts[HEALTH_DISTRICT_COUNTS][health_district_system_id] = disease_count
-        total = 0
-        for health_district_system in self.current_daily_disease_counts[HEALTH_DISTRICT_COUNTS]:
-            total = total + self.current_daily_disease_counts[HEALTH_DISTRICT_COUNTS][health_district_system]
-        self.current_daily_disease_counts[TOTAL] = total
+    # the day's count of each health_district_system and their total
+    def extract_disease_count_map(self):
+        disease_count_map = dict(self.current_daily_disease_counts[HEALTH_DISTRICT_COUNTS].items())
+        disease_count_map[TOTAL] = self.current_daily_disease_counts[TOTAL]
+        return disease_count_map
 
+    def update_daily_disease_counts(self, health_district_system_id, disease_count):
+        health_district_counts = self.current_daily_disease_counts[HEALTH_DISTRICT_COUNTS]
+        self.current_daily_disease_counts[TOTAL] = health_district_counts.update(health_district_system_id,
+                                                                                 disease_count)
+
+    # the count of this analyzer's disease in a daily count message, or None if a delta leaves it unchanged
+    def get_disease_count(self, message, health_district_system_id):
+        if message[MESSAGE_TYPE] != DAILY_DISEASE_COUNT_DELTA:
+            return message[self.disease]
+        decoder = self.disease_count_decoders.get(health_district_system_id)
+        if decoder is None:
+            decoder = DiseaseCountDeltaDecoder(health_district_system_id)
+            self.disease_count_decoders[health_district_system_id] = decoder
+        if decoder.apply(message[SEQUENCE_NUMBER], message[FULL_SNAPSHOT]):
+            self.metrics.increment(DISEASE_COUNT_GAPS)
+        return message[DISEASE_COUNTS].get(self.disease)
+
+    @timed(HANDLE_DAILY_DISEASE_COUNT_MESSAGE)
     def handle_daily_disease_count_message(self, message):
         self.vector_timestamp.increment_count(self.node_id)
-        other_vector_timestamp = message[VECTOR_TIMESTAMP]
-        self.vector_timestamp.update_from_other(other_vector_timestamp)
         health_district_system_id = message[HEALTH_DISTRICT_SYSTEM_ID]
+        self.merge_vector_timestamp(message, health_district_system_id)
         # filter for the disease of interest
-        disease_count = message[self.disease]
+        disease_count = self.get_disease_count(message, health_district_system_id)
+        if disease_count is None:
+            # a delta in which only other diseases' counts changed
+            return
         self.update_daily_disease_counts(health_district_system_id, disease_count)
-        logging.info("[{}] {} daily total is now {}.  vector_timestamp: {}"
-                     .format(self.get_simulation_time(), self.disease,
-                             self.current_daily_disease_counts[TOTAL], self.vector_timestamp))
-        if self.current_daily_disease_counts[TOTAL] >= self.daily_outbreak_threshold \
+        self.event_log.log(DAILY_TOTAL_UPDATED, self.get_simulation_time(), self.vector_timestamp,
+                           disease=self.disease, total=self.current_daily_disease_counts[TOTAL])
+        if self.outbreak_detector.is_outbreak(self.current_daily_disease_counts[TOTAL]) \
                 and not self.current_daily_disease_counts[NOTIFICATION_SENT]:
-            logging.info("[{}] *** ALERT *** {} outbreak detected!  vector_timestamp: {}"
-                         .format(self.get_simulation_time(), self.vector_timestamp, self.disease))
+            self.event_log.log(OUTBREAK_DETECTED, self.get_simulation_time(), self.vector_timestamp,
+                               disease=self.disease)
             alert_message = {MESSAGE_TYPE: DISEASE_OUTBREAK_ALERT,
-                             DISEASE: self.disease,
-                             VECTOR_TIMESTAMP: self.vector_timestamp}
+                             DISEASE: self.disease}
+            self.attach_vector_timestamp(alert_message, self.disease_outbreak_alert_publisher_socket)
             logging.debug("Sending alert: {}".format(alert_message))
-            self.disease_outbreak_alert_publisher_socket.send_pyobj(alert_message)
+            self.send_message(self.disease_outbreak_alert_publisher_socket, alert_message)
             self.current_daily_disease_counts[NOTIFICATION_SENT] = True
 
-    def shutdown(self):
-        logging.info("Shutting down . . .")
-        self.disconnect_from_peers()
-        self.shutdown_listeners()
-        self.deregister()
-        self.shutdown_zmq()
-
-    def run_simulation(self):
-        logging.info("Starting simulation main loop")
-        run_simulation = True
+    def prepare_simulation(self):
         self.record_start_time()
-        start_time = self.get_start_time()
-        self.current_daily_disease_counts[START_TIMESTAMP] = start_time
-        while run_simulation:
-            try:
-                sockets = dict(self.poller.poll(700))  # poll timeout in milliseconds
-            except KeyboardInterrupt:
-                break
-
-            for socket in sockets:
-                if socket == self.overseer_subscribe_socket:
-                    if self.is_stop_simulation():
-                        logging.info("[{}] Received stop_simulation".format(self.get_simulation_time()))
-                        run_simulation = False
-                        break
-
-                if socket in self.disease_count_subscription_sockets:
-                    message = socket.recv_pyobj()
-                    logging.debug("Received message: {}".format(message))
-                    self.handle_daily_disease_count_message(message)
-
-            # update simulation time
-            sim_time = self.get_simulation_time()
-            elapsed_days = self.get_elapsed_days(self.previous_daily_disease_counts)
-
-            # if the day is over, archive the disease count
-            if self.get_elapsed_time().days > elapsed_days:
-                self.current_daily_disease_counts[END_TIMESTAMP] = sim_time
-                self.vector_timestamp.increment_count(self.node_id)
-                self.archive_current_day(self.current_daily_disease_counts, self.previous_daily_disease_counts)
-                # reset current_daily_disease_counts
-                self.current_daily_disease_counts = self.new_daily_disease_counts()
-                self.current_daily_disease_counts[START_TIMESTAMP] = sim_time
-
-            # if enough time has passed, send a heartbeat to the overseer
-            self.send_heartbeat_if_time()
-
-        # shutdown procedures
-        self.shutdown()
+        self.current_daily_disease_counts[START_TIMESTAMP] = self.get_start_time()
+
+    def handle_socket_events(self, sockets):
+        for socket in sockets:
+            if socket == self.overseer_subscribe_socket:
+                if self.is_stop_simulation():
+                    logging.info("[{}] Received stop_simulation".format(self.get_simulation_time()))
+                    return False
+
+            if socket in self.disease_count_subscription_sockets:
+                # the payload is the last frame, after the topic frame when publishing disease_topics
+                message = self.decode_message(socket.recv_multipart()[-1])
+                logging.debug("Received message: {}".format(message))
+                self.handle_daily_disease_count_message(message)
+        return True
+
+    def run_periodic_tasks(self):
+        # if the day is over, archive the disease count
+        self.archive_current_day_if_over()
+
+        # if enough time has passed, send a heartbeat to the overseer
+        self.send_heartbeat_if_time()
+
+    def archive_current_day_if_over(self):
+        # update simulation time
+        sim_time = self.get_simulation_time()
+        elapsed_days = self.get_elapsed_days()
+        if self.get_elapsed_time().days > elapsed_days:
+            self.current_daily_disease_counts[END_TIMESTAMP] = sim_time
+            self.vector_timestamp.increment_count(self.node_id)
+            self.archive_current_day(self.extract_disease_count_map(), self.current_daily_disease_counts)
+            self.outbreak_detector.start_day(self.daily_count_history)
+            logging.debug("{} outbreak threshold for day {} is {}".format(self.disease, self.get_elapsed_days(),
+                                                                        self.outbreak_detector.get_threshold()))
+            # reset current_daily_disease_counts
+            self.current_daily_disease_counts = self.new_daily_disease_counts()
+            self.current_daily_disease_counts[START_TIMESTAMP] = sim_time
+
+
+# asyncio variant:  each daily count subscription and the end-of-day archiving run as separate coroutines
+class AsyncDiseaseOutbreakAnalyzer(AsyncNode, DiseaseOutbreakAnalyzer):
+
+    async def receive_daily_disease_counts(self, socket):
+        while True:
+            message = self.decode_message((await socket.recv_multipart())[-1])
+            logging.debug("Received message: {}".format(message))
+            self.handle_daily_disease_count_message(message)
+
+    async def archive_days(self):
+        next_day = self.get_elapsed_days() + 1
+        while not await self.stopped_within(self.get_seconds_until_day(next_day)):
+            self.archive_current_day_if_over()
+            next_day = self.get_elapsed_days() + 1
+
+    def periodic_coroutines(self):
+        return super(AsyncDiseaseOutbreakAnalyzer, self).periodic_coroutines() + [self.archive_days()]
+
+    def receive_coroutines(self):
+        return [self.receive_daily_disease_counts(socket) for socket in self.disease_count_subscription_sockets]
 
 
 def main():
     # get configuration and setup overseer connection
     config = get_node_config(DISEASE_OUTBREAK_ANALYZER)
     log_file = "{}-{}.log".format(config[ROLE], config[NODE_ID])
-    logging.basicConfig(format='%(message)s',
-                        filename=log_file,
-                        level=logging.INFO)
+    start_logging(log_file, config[EVENT_LOGGING])
     logging.debug(config)
 
     disease_outbreak_analyzer = DiseaseOutbreakAnalyzer(config)
 
+    # log metrics whenever SIGUSR1 is received
+    disease_outbreak_analyzer.log_metrics_on_signal()
+
     # setup listening sockets
     disease_outbreak_analyzer.setup_listeners()
 
@@ -185,7 +231,8 @@ def main():
     # run the simulation
     disease_outbreak_analyzer.run_simulation()
 
-    # post log to S3 URL if given
+    # write out the queued log records, then post log to S3 URL if given
+    stop_logging()
     disease_outbreak_analyzer.post_log_to_s3(log_file)
 
 
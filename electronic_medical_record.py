@@ -1,22 +1,45 @@
+import asyncio
 import logging
-from datetime import datetime
 from math import sin, pi
-from random import random
+from random import Random
+from time import perf_counter_ns
 
 import zmq
 
 from config.sds_config import get_node_config
+from shared.async_node import AsyncNode
 from shared.constants import *
+from shared.disease_generator import VectorizedDiseaseGenerator
+from shared.event_log import start_logging, stop_logging
+from shared.metrics import timed
 from shared.node import Node
 
 
 class ElectronicMedicalRecord(Node):
 
-    def __init__(self, config):
-        super(ElectronicMedicalRecord, self).__init__(config)
+    def __init__(self, config, context=None):
+        super(ElectronicMedicalRecord, self).__init__(config, context)
         self.outbreak_daily_query_frequency = self.role_parameters[OUTBREAK_DAILY_QUERY_FREQUENCY]
+        # seeded from role_parameters when given, so disease generation can be reproduced
+        self.random_generator = Random(self.role_parameters.get(RANDOM_SEED))
+        self.notification_mode = self.role_parameters.get(NOTIFICATION_MODE, SYNCHRONOUS)
+        # 'scalar' draws one random number per disease per loop iteration; 'vectorized' draws
+        # every disease at once with NumPy and reports the occurrences as one batch
+        self.disease_generator = self.role_parameters.get(DISEASE_GENERATOR, SCALAR)
+        self.vectorized_disease_generator = None
+        self.max_notifications_in_flight = self.role_parameters.get(MAX_NOTIFICATIONS_IN_FLIGHT,
+                                                                    DEFAULT_MAX_NOTIFICATIONS_IN_FLIGHT)
+        self.health_district_system_id = None
         self.health_district_system_socket = None
         self.outbreaks = set()
+        # pipelined notification state:  disease occurrences waiting to be batched,
+        # the next sequence number, and a map of sequence_number => message_type for
+        # requests that have been sent but not yet acknowledged
+        self.pending_disease_counts = {}
+        self.next_sequence_number = 0
+        self.requests_in_flight = {}
+        self.elapsed_days = 0
+        self.last_outbreak_query_time = None
 
     # electronic_medical_record nodes connect to health_district_system nodes
     # using REQ sockets; they have no listeners and do not provide a listener address
@@ -33,12 +56,16 @@ class ElectronicMedicalRecord(Node):
     def connect_to_peers(self):
         # get node_id for the connection that needs to be made from config
         connection_node_id = self.config[CONNECTIONS][0]
+        self.health_district_system_id = connection_node_id
         logging.debug("Connecting to node_id: {}".format(connection_node_id))
         # get the connection address from node_addresses
-        connection_node_address = self.node_addresses[connection_node_id][ELECTRONIC_MEDICAL_RECORD_ADDRESS]
+        connection_node_address = self.get_peer_address(connection_node_id, ELECTRONIC_MEDICAL_RECORD_ADDRESS)
         logging.debug("Found node_id {} address as: {}".format(connection_node_id, connection_node_address))
-        # create the REQ socket and connect
-        self.health_district_system_socket = self.context.socket(zmq.REQ)
+        # create the REQ socket (or DEALER socket when notifications are pipelined) and connect
+        if self.is_pipelined():
+            self.health_district_system_socket = self.context.socket(zmq.DEALER)
+        else:
+            self.health_district_system_socket = self.context.socket(zmq.REQ)
         self.health_district_system_socket.connect(connection_node_address)
 
     # close connections to peer nodes
@@ -51,18 +78,101 @@ class ElectronicMedicalRecord(Node):
         self.poller.register(self.overseer_subscribe_socket, zmq.POLLIN)
         self.poller.register(self.health_district_system_socket, zmq.POLLIN)
 
-    def send_disease_notification(self, disease, local_timestamp):
+    def is_pipelined(self):
+        return self.notification_mode == PIPELINED
+
+    # synchronous notifications and outbreak queries wait in recv for the health_district_system
+    def blocks_on_peer_replies(self):
+        return not self.is_pipelined()
+
+    # DEALER sockets must supply the empty delimiter frame that a REQ socket would add
+    def send_to_health_district_system(self, message):
+        frames = [self.encode_message(message)]
+        if self.is_pipelined():
+            frames.insert(0, b'')
+        self.send_frames(self.health_district_system_socket, frames)
+
+    def receive_from_health_district_system(self):
+        if self.is_pipelined():
+            self.health_district_system_socket.recv()
+        return self.receive_message(self.health_district_system_socket)
+
+    def get_next_sequence_number(self):
+        sequence_number = self.next_sequence_number
+        self.next_sequence_number = self.next_sequence_number + 1
+        return sequence_number
+
+    def new_disease_notification(self, disease, local_timestamp):
         message = {MESSAGE_TYPE: DISEASE_NOTIFICATION,
                    ELECTRONIC_MEDICAL_RECORD_ID: self.node_id,
                    DISEASE: disease,
-                   LOCAL_TIMESTAMP: local_timestamp,
-                   VECTOR_TIMESTAMP: self.vector_timestamp}
+                   LOCAL_TIMESTAMP: local_timestamp}
+        return self.attach_vector_timestamp(message, self.health_district_system_id)
+
+    @timed(DISEASE_NOTIFICATION_ROUND_TRIP)
+    def send_disease_notification(self, disease, local_timestamp):
+        message = self.new_disease_notification(disease, local_timestamp)
         logging.debug("Sending disease notification: {}".format(message))
-        self.health_district_system_socket.send_pyobj(message)
-        reply = self.health_district_system_socket.recv_pyobj()
+        self.send_to_health_district_system(message)
+        reply = self.receive_from_health_district_system()
+        self.merge_health_district_system_reply(reply)
+
+    def merge_health_district_system_reply(self, reply):
         logging.debug("Received reply: {}".format(reply))
-        reply_vector_timestamp = reply[VECTOR_TIMESTAMP]
-        self.vector_timestamp.update_from_other(reply_vector_timestamp)
+        self.merge_vector_timestamp(reply, self.health_district_system_id)
+
+    # pipelined mode:  remember a disease occurrence so it is sent in the next batch
+    def add_pending_disease_occurrence(self, disease):
+        self.pending_disease_counts[disease] = self.pending_disease_counts.get(disease, 0) + 1
+
+    def new_disease_notification_batch(self, disease_counts, local_timestamp):
+        message = {MESSAGE_TYPE: DISEASE_NOTIFICATION_BATCH,
+                   ELECTRONIC_MEDICAL_RECORD_ID: self.node_id,
+                   SEQUENCE_NUMBER: self.get_next_sequence_number(),
+                   DISEASE_COUNTS: disease_counts,
+                   LOCAL_TIMESTAMP: local_timestamp}
+        return self.attach_vector_timestamp(message, self.health_district_system_id)
+
+    # pipelined mode:  send all pending disease occurrences as one batch without waiting
+    # for the reply; if too many batches are unacknowledged, the occurrences stay pending
+    # and are folded into a later batch
+    def send_disease_notification_batch(self, local_timestamp):
+        if len(self.pending_disease_counts) == 0:
+            return
+        if len(self.requests_in_flight) >= self.max_notifications_in_flight:
+            logging.debug("{} requests in flight; holding back {} pending disease occurrences"
+                          .format(len(self.requests_in_flight), self.pending_disease_counts))
+            return
+        message = self.new_disease_notification_batch(self.pending_disease_counts, local_timestamp)
+        logging.debug("Sending disease notification batch: {}".format(message))
+        self.send_to_health_district_system(message)
+        self.requests_in_flight[message[SEQUENCE_NUMBER]] = DISEASE_NOTIFICATION_BATCH
+        self.pending_disease_counts = {}
+
+    # synchronous mode with vectorized generation:  one request carries every occurrence of a tick
+    @timed(DISEASE_NOTIFICATION_BATCH_ROUND_TRIP)
+    def send_disease_counts(self, disease_counts, local_timestamp):
+        message = self.new_disease_notification_batch(disease_counts, local_timestamp)
+        logging.debug("Sending disease notification batch: {}".format(message))
+        self.send_to_health_district_system(message)
+        reply = self.receive_from_health_district_system()
+        self.merge_health_district_system_reply(reply)
+
+    # pipelined mode:  apply every reply that has arrived from the health_district_system
+    def handle_health_district_system_replies(self):
+        while self.health_district_system_socket.poll(0, zmq.POLLIN):
+            self.handle_pipelined_reply(self.receive_from_health_district_system())
+
+    @timed(HANDLE_PIPELINED_REPLY)
+    def handle_pipelined_reply(self, reply):
+        self.merge_health_district_system_reply(reply)
+        sequence_number = reply.get(SEQUENCE_NUMBER)
+        if sequence_number in self.requests_in_flight:
+            del self.requests_in_flight[sequence_number]
+        else:
+            logging.warning("Received reply with unexpected sequence_number: {}".format(sequence_number))
+        if reply[MESSAGE_TYPE] == OUTBREAK_QUERY_REPLY:
+            self.handle_outbreak_query_reply(reply)
 
     # generate disease occurrences using the pseudorandom number generator:
     # probability threshold parameter is 0.0 <= x <= 1.0 where 0.0 means a disease occurrence
@@ -71,12 +181,12 @@ class ElectronicMedicalRecord(Node):
         if (probability_threshold < 0.0) or (probability_threshold > 1.0):
             raise TypeError("probability_threshold out of range 0.0 <= x <= 1.0")
         # roll the PRNG to get a pseudorandom number
-        random_number = random()
+        random_number = self.random_generator.random()
         return random_number < probability_threshold
 
     def generate_disease_sine(self, min_probability, max_probability):
         difference = max_probability - min_probability
-        sine_probability = abs(sin((datetime.now().second / 60) * 2 * pi)) * difference + min_probability
+        sine_probability = abs(sin((self.clock.now().second / 60) * 2 * pi)) * difference + min_probability
         if sine_probability < min_probability:
             sine_probability = min_probability
         elif sine_probability > max_probability:
@@ -95,88 +205,213 @@ class ElectronicMedicalRecord(Node):
             max_probability = disease_generation_parameters[MAX_PROBABILITY]
             return self.generate_disease_sine(min_probability, max_probability)
 
-    def send_outbreak_query(self):
+    def new_outbreak_query(self):
         message = {MESSAGE_TYPE: OUTBREAK_QUERY,
-                   ELECTRONIC_MEDICAL_RECORD_ID: self.node_id,
-                   VECTOR_TIMESTAMP: self.vector_timestamp}
+                   ELECTRONIC_MEDICAL_RECORD_ID: self.node_id}
+        return self.attach_vector_timestamp(message, self.health_district_system_id)
+
+    def is_vectorized(self):
+        return self.disease_generator == VECTORIZED
+
+    # vectorized generation:  {disease: count} of every disease that occurred this tick
+    def generate_disease_counts(self):
+        return self.vectorized_disease_generator.generate([self.clock.now()])
+
+    # count the occurrences in the vector_timestamp and, in pipelined mode, queue them for the next batch
+    def record_disease_counts(self, disease_counts):
+        self.vector_timestamp.increment_count(self.node_id, sum(disease_counts.values()))
+        if self.is_pipelined():
+            for disease, count in disease_counts.items():
+                self.pending_disease_counts[disease] = self.pending_disease_counts.get(disease, 0) + count
+
+    @timed(SEND_OUTBREAK_QUERY)
+    def send_outbreak_query(self):
+        # a query shares the notification window, so a stalled health_district_system does not collect
+        # one more unanswered request per query interval; the next interval asks again
+        if self.is_pipelined() and len(self.requests_in_flight) >= self.max_notifications_in_flight:
+            logging.debug("{} requests in flight; skipping outbreak query".format(len(self.requests_in_flight)))
+            return
+        message = self.new_outbreak_query()
+        if self.is_pipelined():
+            # the reply is handled by handle_health_district_system_replies when it arrives
+            sequence_number = self.get_next_sequence_number()
+            message[SEQUENCE_NUMBER] = sequence_number
+            logging.debug("Sending outbreak query: {}".format(message))
+            self.send_to_health_district_system(message)
+            self.requests_in_flight[sequence_number] = OUTBREAK_QUERY
+            return
         logging.debug("Sending outbreak query: {}".format(message))
-        self.health_district_system_socket.send_pyobj(message)
-        reply = self.health_district_system_socket.recv_pyobj()
-        logging.debug("Received reply: {}".format(reply))
-        reply_vector_timestamp = reply[VECTOR_TIMESTAMP]
-        self.vector_timestamp.update_from_other(reply_vector_timestamp)
+        self.send_to_health_district_system(message)
+        reply = self.receive_from_health_district_system()
+        self.merge_health_district_system_reply(reply)
+        self.handle_outbreak_query_reply(reply)
+
+    def handle_outbreak_query_reply(self, reply):
         outbreaks = reply[OUTBREAKS]
         for disease in outbreaks:
             if disease not in self.outbreaks:
                 self.outbreaks.add(disease)
-                logging.info("[{}] *** ALERT *** {} outbreak reported!  vector_timestamp: {}"
-                             .format(self.get_simulation_time(), disease, self.vector_timestamp))
-
-    def shutdown(self):
-        logging.info("Shutting down . . .")
-        self.disconnect_from_peers()
-        self.shutdown_listeners()
-        self.deregister()
-        self.shutdown_zmq()
-
-    def run_simulation(self):
-        logging.info("Starting simulation main loop")
-        self.record_start_time()
-        start_time = self.get_start_time()
-        elapsed_days = 0
-        last_outbreak_query_time = start_time
-        while True:
-            # poll sockets and handle incoming messages
-            try:
-                sockets = dict(self.poller.poll(700))  # poll timeout in milliseconds
-            except KeyboardInterrupt:
-                break
-
-            if self.overseer_subscribe_socket in sockets:
-                if self.is_stop_simulation():
-                    logging.info("[{}] Received stop_simulation".format(self.get_simulation_time()))
-                    break
-
-            # update simulation time
-            sim_time = self.get_simulation_time()
+                self.event_log.log(OUTBREAK_REPORTED, self.get_simulation_time(), self.vector_timestamp,
+                                   disease=disease)
 
-            # run disease generation to see if any diseases occurred
+    def reset_outbreaks_if_day_over(self):
+        if self.get_elapsed_time().days > self.elapsed_days:
+            self.outbreaks = set()
+            self.elapsed_days = self.elapsed_days + 1
+
+    def prepare_simulation(self):
+        self.record_start_time()
+        self.elapsed_days = 0
+        self.last_outbreak_query_time = self.get_start_time()
+        if self.is_vectorized():
+            # seeded from random_generator so that seeded runs stay reproducible
+            self.vectorized_disease_generator = VectorizedDiseaseGenerator(
+                self.diseases, self.role_parameters[DISEASE_GENERATION],
+                self.role_parameters[DISEASE_GENERATION_PARAMETERS], self.random_generator.getrandbits(64))
+
+    def handle_socket_events(self, sockets):
+        if self.overseer_subscribe_socket in sockets:
+            if self.is_stop_simulation():
+                logging.info("[{}] Received stop_simulation".format(self.get_simulation_time()))
+                return False
+
+        if self.is_pipelined() and self.health_district_system_socket in sockets:
+            self.handle_health_district_system_replies()
+        return True
+
+    def run_periodic_tasks(self):
+        # update simulation time
+        sim_time = self.get_simulation_time()
+
+        # run disease generation to see if any diseases occurred
+        if self.is_vectorized():
+            disease_counts = self.generate_disease_counts()
+            if disease_counts:
+                self.record_disease_counts(disease_counts)
+                if not self.is_pipelined():
+                    self.send_disease_counts(disease_counts, sim_time)
+                self.event_log.log(DISEASES_OCCURRED, sim_time, self.vector_timestamp, disease_counts=disease_counts)
+        else:
             for disease in self.diseases:
                 if self.generate_disease():
                     self.vector_timestamp.increment_count(self.node_id)
-                    self.send_disease_notification(disease, sim_time)
-                    logging.info("[{}] Disease occurred: {}  vector_timestamp: {}"
-                                 .format(sim_time, disease, self.vector_timestamp))
-
-            # if outbreak daily query frequency interval is passed, send outbreak query
-            duration_since_last_query = sim_time - last_outbreak_query_time
-            if (duration_since_last_query.seconds / SECONDS_PER_HOUR) > self.outbreak_daily_query_frequency:
+                    if self.is_pipelined():
+                        self.add_pending_disease_occurrence(disease)
+                    else:
+                        self.send_disease_notification(disease, sim_time)
+                    self.event_log.log(DISEASE_OCCURRED, sim_time, self.vector_timestamp, disease=disease)
+
+        # in pipelined mode, all occurrences from this loop iteration go out in one batch
+        if self.is_pipelined():
+            self.send_disease_notification_batch(sim_time)
+
+        # if outbreak daily query frequency interval is passed, send outbreak query
+        duration_since_last_query = sim_time - self.last_outbreak_query_time
+        if (duration_since_last_query.seconds / SECONDS_PER_HOUR) > self.outbreak_daily_query_frequency:
+            self.send_outbreak_query()
+            self.last_outbreak_query_time = sim_time
+
+        # if a simulation day passed, reset outbreak notification
+        self.reset_outbreaks_if_day_over()
+
+        # if enough time has passed, send a heartbeat to the overseer
+        self.send_heartbeat_if_time()
+
+
+# asyncio variant:  disease generation, outbreak queries, and the daily outbreak reset run as
+# separate coroutines, so a slow health_district_system reply only delays the coroutine waiting for it
+class AsyncElectronicMedicalRecord(AsyncNode, ElectronicMedicalRecord):
+
+    def __init__(self, config, context=None):
+        super(AsyncElectronicMedicalRecord, self).__init__(config, context)
+        self.health_district_system_lock = None
+
+    async def start(self):
+        self.health_district_system_lock = asyncio.Lock()
+        await super(AsyncElectronicMedicalRecord, self).start()
+
+    # synchronous mode:  one request at a time on the REQ socket; returns None if
+    # stop_simulation arrives before the reply
+    async def request_health_district_system(self, message):
+        async with self.health_district_system_lock:
+            start = perf_counter_ns()
+            await self.health_district_system_socket.send(self.encode_message(message))
+            data = await self.receive_unless_stopped(self.health_district_system_socket)
+        if data is None:
+            return None
+        self.metrics.record(HEALTH_DISTRICT_SYSTEM_ROUND_TRIP, perf_counter_ns() - start)
+        reply = self.decode_message(data)
+        self.merge_health_district_system_reply(reply)
+        return reply
+
+    async def generate_diseases(self):
+        while not await self.stopped_within(DEFAULT_TICK_INTERVAL):
+            sim_time = self.get_simulation_time()
+            if self.is_vectorized():
+                disease_counts = self.generate_disease_counts()
+                if disease_counts:
+                    self.record_disease_counts(disease_counts)
+                    if not self.is_pipelined():
+                        message = self.new_disease_notification_batch(disease_counts, sim_time)
+                        if await self.request_health_district_system(message) is None:
+                            return
+                    self.event_log.log(DISEASES_OCCURRED, sim_time, self.vector_timestamp,
+                                       disease_counts=disease_counts)
+            else:
+                for disease in self.diseases:
+                    if self.generate_disease():
+                        self.vector_timestamp.increment_count(self.node_id)
+                        if self.is_pipelined():
+                            self.add_pending_disease_occurrence(disease)
+                        else:
+                            message = self.new_disease_notification(disease, sim_time)
+                            if await self.request_health_district_system(message) is None:
+                                return
+                        self.event_log.log(DISEASE_OCCURRED, sim_time, self.vector_timestamp, disease=disease)
+            if self.is_pipelined():
+                self.send_disease_notification_batch(sim_time)
+
+    async def query_outbreaks(self):
+        while not await self.stopped_within(self.get_seconds_for_hours(self.outbreak_daily_query_frequency)):
+            if self.is_pipelined():
                 self.send_outbreak_query()
-                last_outbreak_query_time = sim_time
+                continue
+            reply = await self.request_health_district_system(self.new_outbreak_query())
+            if reply is None:
+                return
+            self.handle_outbreak_query_reply(reply)
 
-            # if a simulation day passed, reset outbreak notification
-            if self.get_elapsed_time().days > elapsed_days:
-                self.outbreaks = set()
-                elapsed_days = elapsed_days + 1
+    async def reset_outbreaks_daily(self):
+        while not await self.stopped_within(self.get_seconds_until_day(self.elapsed_days + 1)):
+            self.reset_outbreaks_if_day_over()
 
-            # if enough time has passed, send a heartbeat to the overseer
-            self.send_heartbeat_if_time()
+    async def receive_pipelined_replies(self):
+        while True:
+            await self.health_district_system_socket.recv()
+            self.handle_pipelined_reply(self.decode_message(await self.health_district_system_socket.recv()))
+
+    def periodic_coroutines(self):
+        return super(AsyncElectronicMedicalRecord, self).periodic_coroutines() + \
+            [self.generate_diseases(), self.query_outbreaks(), self.reset_outbreaks_daily()]
 
-        # shutdown procedures
-        self.shutdown()
+    def receive_coroutines(self):
+        if self.is_pipelined():
+            return [self.receive_pipelined_replies()]
+        return []
 
 
 def main():
     # get configuration and setup overseer connection
     config = get_node_config(ELECTRONIC_MEDICAL_RECORD)
     log_file = "{}-{}.log".format(config[ROLE], config[NODE_ID])
-    logging.basicConfig(format='%(message)s',
-                        filename=log_file,
-                        level=logging.INFO)
+    start_logging(log_file, config[EVENT_LOGGING])
     logging.debug(config)
 
     electronic_medical_record = ElectronicMedicalRecord(config)
 
+    # log metrics whenever SIGUSR1 is received
+    electronic_medical_record.log_metrics_on_signal()
+
     # setup listening sockets
     electronic_medical_record.setup_listeners()
 
@@ -201,7 +436,8 @@ def main():
     # run the simulation
     electronic_medical_record.run_simulation()
 
-    # post log to S3 URL if given
+    # write out the queued log records, then post log to S3 URL if given
+    stop_logging()
     electronic_medical_record.post_log_to_s3(log_file)
 
 
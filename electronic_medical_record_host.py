@@ -0,0 +1,294 @@
+# host a large cohort of electronic_medical_records inside one process:  the hosted records share
+# one DEALER socket per health_district_system and one pair of overseer sockets, and their
+# registrations, ready messages, heartbeats, and deregistrations are multiplexed over that pair.
+# The overseer and the configuration file still see each electronic_medical_record as its own node_id.
+#
+# hosted records always pipeline their notifications, since one blocking request would stall the
+# whole cohort; replies are routed back to the record that sent the request by sequence_number,
+# which the host hands out so that it is unique across the cohort.
+import json
+import logging
+
+import zmq
+
+from config.sds_config import get_electronic_medical_record_host_config
+from electronic_medical_record import ElectronicMedicalRecord
+from shared.clock import WallClock
+from shared.constants import *
+from shared.event_log import start_logging, stop_logging
+from shared.node import Node
+
+
+class HostedElectronicMedicalRecord(ElectronicMedicalRecord):
+
+    def __init__(self, config, host):
+        self.host = host
+        super(HostedElectronicMedicalRecord, self).__init__(config, host.context)
+        self.notification_mode = PIPELINED
+
+    # the host talks to the overseer on behalf of every hosted record
+    def connect_to_overseer(self):
+        pass
+
+    def connect_to_peers(self):
+        self.health_district_system_id = self.config[CONNECTIONS][0]
+        connection_node_address = self.get_peer_address(self.health_district_system_id,
+                                                        ELECTRONIC_MEDICAL_RECORD_ADDRESS)
+        self.health_district_system_socket = self.host.get_health_district_system_socket(
+            self.health_district_system_id, connection_node_address)
+
+    # the shared sockets are closed by the host
+    def disconnect_from_peers(self):
+        pass
+
+    def get_next_sequence_number(self):
+        return self.host.get_next_sequence_number(self)
+
+    def send_heartbeat_if_time(self):
+        pass
+
+
+class ElectronicMedicalRecordHost:
+
+    def __init__(self, config):
+        self.config = config
+        self.clock = WallClock()
+        self.context = zmq.Context()
+        # a DEALER lets the host send one request per hosted record without waiting for each reply
+        self.overseer_request_socket = self.context.socket(zmq.DEALER)
+        self.overseer_subscribe_socket = self.context.socket(zmq.SUB)
+        if config.get(TRANSPORT, TCP) == INPROC:
+            self.overseer_request_socket.connect(INPROC_OVERSEER_REPLY_ADDRESS)
+            self.overseer_subscribe_socket.connect(INPROC_OVERSEER_PUBLISH_ADDRESS)
+        else:
+            overseer_host = config[OVERSEER_HOST]
+            self.overseer_request_socket.connect("tcp://{}:{}".format(overseer_host, config[OVERSEER_REPLY_PORT]))
+            self.overseer_subscribe_socket.connect("tcp://{}:{}".format(overseer_host, config[OVERSEER_PUBLISH_PORT]))
+        # empty string filter => receive all messages
+        self.overseer_subscribe_socket.setsockopt_string(zmq.SUBSCRIBE, '')
+        # map of health_district_system node_id => DEALER socket shared by every record connected to it
+        self.health_district_system_sockets = {}
+        # map of sequence_number => hosted record for requests that have not been answered yet
+        self.sequence_number_owners = {}
+        self.next_sequence_number = 0
+        self.last_heartbeat_sent = None
+        self.poller = None
+        # set by SIGUSR1 and logged by the main loop, as for a node
+        self.metrics_requested = False
+        self.electronic_medical_records = {}
+        for node_id in sorted(config[NODE_CONFIGS]):
+            self.electronic_medical_records[node_id] = HostedElectronicMedicalRecord(config[NODE_CONFIGS][node_id],
+                                                                                     self)
+
+    def get_health_district_system_socket(self, health_district_system_id, address):
+        if health_district_system_id not in self.health_district_system_sockets:
+            logging.debug("Connecting to node_id: {} at: {}".format(health_district_system_id, address))
+            socket = self.context.socket(zmq.DEALER)
+            socket.connect(address)
+            self.health_district_system_sockets[health_district_system_id] = socket
+        return self.health_district_system_sockets[health_district_system_id]
+
+    def get_next_sequence_number(self, electronic_medical_record):
+        sequence_number = self.next_sequence_number
+        self.next_sequence_number = self.next_sequence_number + 1
+        self.sequence_number_owners[sequence_number] = electronic_medical_record
+        return sequence_number
+
+    # send one message per hosted record to the overseer, then collect one reply per record;
+    # messages is a map of node_id => message, and the replies are returned the same way
+    def request_overseer_for_all(self, messages):
+        for node_id, message in messages.items():
+            logging.debug("Sending message: \'{}\' from: {}".format(message, node_id))
+            self.overseer_request_socket.send_multipart([b'', node_id.encode(), message.encode()])
+        replies = {}
+        while len(replies) < len(messages):
+            [_, encoded_node_id, encoded_reply] = self.overseer_request_socket.recv_multipart()
+            replies[encoded_node_id.decode()] = encoded_reply.decode()
+        logging.debug(replies)
+        return replies
+
+    def register(self):
+        messages = {}
+        for node_id, electronic_medical_record in self.electronic_medical_records.items():
+            electronic_medical_record.setup_listeners()
+            address_map = electronic_medical_record.config[ADDRESS_MAP]
+            address_map[TYPE] = ADDRESS_MAP
+            messages[node_id] = json.dumps(address_map)
+        logging.info("Registering {} electronic_medical_records with overseer".format(len(messages)))
+        self.request_overseer_for_all(messages)
+        self.confirm_subscription()
+
+    # one subscribe socket serves every hosted record, so one subscription_check confirms them all
+    def confirm_subscription(self):
+        while self.overseer_subscribe_socket.recv_string() != SUBSCRIPTION_CHECK:
+            pass
+        self.request_overseer_for_all({node_id: SUBSCRIBED for node_id in self.electronic_medical_records})
+
+    def deregister(self):
+        logging.info("Deregistering {} electronic_medical_records with overseer"
+                     .format(len(self.electronic_medical_records)))
+        self.request_overseer_for_all({node_id: DEREGISTER for node_id in self.electronic_medical_records})
+
+    # the overseer publishes node_addresses once; every hosted record gets the same map
+    def receive_node_addresses(self):
+        first_node_id = next(iter(self.electronic_medical_records))
+        while True:
+            if self.overseer_subscribe_socket.poll(SECONDS_WITHOUT_NODE_ADDRESSES * 1000, zmq.POLLIN):
+                json_node_addresses = self.overseer_subscribe_socket.recv_string()
+                if json_node_addresses == SUBSCRIPTION_CHECK:
+                    continue
+            else:
+                json_node_addresses = self.request_overseer_for_all({first_node_id: GET_NODE_ADDRESSES})[first_node_id]
+                if json_node_addresses == NODE_ADDRESSES_NOT_PUBLISHED:
+                    continue
+            break
+        node_addresses = json.loads(json_node_addresses)
+        for electronic_medical_record in self.electronic_medical_records.values():
+            electronic_medical_record.set_node_addresses(node_addresses)
+
+    def connect_to_peers(self):
+        for electronic_medical_record in self.electronic_medical_records.values():
+            electronic_medical_record.connect_to_peers()
+
+    def configure_poller(self):
+        logging.debug("Configuring main loop poller")
+        self.poller = zmq.Poller()
+        self.poller.register(self.overseer_subscribe_socket, zmq.POLLIN)
+        for socket in self.health_district_system_sockets.values():
+            self.poller.register(socket, zmq.POLLIN)
+
+    def send_ready_to_start(self):
+        self.request_overseer_for_all({node_id: READY_TO_START for node_id in self.electronic_medical_records})
+
+    def await_start_simulation(self):
+        while True:
+            message = self.overseer_subscribe_socket.recv_string()
+            if message == START_SIMULATION:
+                return
+            if message != SUBSCRIPTION_CHECK:
+                logging.warning("received message: '" + message + "' while awaiting for simulation_start")
+
+    def is_stop_simulation(self):
+        message = self.overseer_subscribe_socket.recv_string()
+        if message == STOP_SIMULATION:
+            return True
+        logging.warning("received message: '" + message + "' but there is no logic defined to handle it")
+        return False
+
+    # hand a health_district_system reply to the hosted record that sent the request
+    def dispatch_reply(self, reply):
+        electronic_medical_record = self.sequence_number_owners.pop(reply.get(SEQUENCE_NUMBER), None)
+        if electronic_medical_record is None:
+            logging.warning("Received reply with unexpected sequence_number: {}".format(reply.get(SEQUENCE_NUMBER)))
+            return
+        electronic_medical_record.handle_pipelined_reply(reply)
+
+    def handle_health_district_system_replies(self, socket):
+        # every hosted record uses the same wire_protocol, so any of them can decode a reply
+        decoder = next(iter(self.electronic_medical_records.values()))
+        while socket.poll(0, zmq.POLLIN):
+            [_, data] = socket.recv_multipart()
+            self.dispatch_reply(decoder.decode_message(data))
+
+    def send_heartbeats_if_time(self):
+        current_time = self.clock.now()
+        if (current_time - self.last_heartbeat_sent).seconds > SECONDS_PER_HEARTBEAT:
+            logging.info("Sending heartbeats to overseer")
+            self.request_overseer_for_all({node_id: HEARTBEAT for node_id in self.electronic_medical_records})
+            self.last_heartbeat_sent = current_time
+
+    def run_simulation(self):
+        logging.info("Starting simulation main loop for {} electronic_medical_records"
+                     .format(len(self.electronic_medical_records)))
+        self.last_heartbeat_sent = self.clock.now()
+        for electronic_medical_record in self.electronic_medical_records.values():
+            electronic_medical_record.prepare_simulation()
+        while True:
+            try:
+                sockets = dict(self.poller.poll(700))  # poll timeout in milliseconds
+            except KeyboardInterrupt:
+                break
+
+            if self.overseer_subscribe_socket in sockets:
+                if self.is_stop_simulation():
+                    logging.info("Received stop_simulation")
+                    break
+            for socket in self.health_district_system_sockets.values():
+                if socket in sockets:
+                    self.handle_health_district_system_replies(socket)
+
+            for electronic_medical_record in self.electronic_medical_records.values():
+                electronic_medical_record.run_periodic_tasks()
+            self.send_heartbeats_if_time()
+            self.log_metrics_if_requested()
+
+        self.shutdown()
+
+    def shutdown(self):
+        logging.info("Shutting down . . .")
+        self.log_metrics()
+        for socket in self.health_district_system_sockets.values():
+            socket.close(linger=2)
+        self.deregister()
+        self.overseer_request_socket.close(linger=2)
+        self.overseer_subscribe_socket.close(linger=2)
+        self.context.term()
+
+    # one "metrics for <node_id>" line per hosted record
+    def log_metrics(self):
+        for electronic_medical_record in self.electronic_medical_records.values():
+            electronic_medical_record.log_metrics()
+
+    def log_metrics_on_signal(self):
+        Node.log_metrics_on_signal(self)
+
+    def request_metrics(self, signal_number, frame):
+        Node.request_metrics(self, signal_number, frame)
+
+    def log_metrics_if_requested(self):
+        Node.log_metrics_if_requested(self)
+
+    def post_log_to_s3(self, log_file):
+        Node.post_log_to_s3(self, log_file)
+
+
+def main():
+    # get configuration for every hosted electronic_medical_record and setup overseer connection
+    config = get_electronic_medical_record_host_config()
+    log_file = "{}-{}.log".format(config[ROLE], sorted(config[NODE_CONFIGS])[0])
+    start_logging(log_file, config[EVENT_LOGGING])
+    logging.debug(config)
+
+    electronic_medical_record_host = ElectronicMedicalRecordHost(config)
+
+    # log the metrics of every hosted electronic_medical_record whenever SIGUSR1 is received
+    electronic_medical_record_host.log_metrics_on_signal()
+
+    # register every hosted electronic_medical_record with overseer
+    electronic_medical_record_host.register()
+
+    # get node_addresses from overseer
+    electronic_medical_record_host.receive_node_addresses()
+
+    # make peer connections, one per health_district_system
+    electronic_medical_record_host.connect_to_peers()
+
+    # configure main loop poller
+    electronic_medical_record_host.configure_poller()
+
+    # send "ready_to_start" messages to overseer
+    electronic_medical_record_host.send_ready_to_start()
+
+    # await "start_simulation" message from overseer
+    electronic_medical_record_host.await_start_simulation()
+
+    # run the simulation
+    electronic_medical_record_host.run_simulation()
+
+    # write out the queued log records, then post log to S3 URL if given
+    stop_logging()
+    electronic_medical_record_host.post_log_to_s3(log_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,59 @@
 import logging
+from time import perf_counter_ns
 
 import zmq
 
 from config.sds_config import get_node_config
+from shared.async_node import AsyncNode
 from shared.constants import *
+from shared.disease_count_delta import DiseaseCountDeltaEncoder
+from shared.event_log import start_logging, stop_logging
+from shared.metrics import get_message_type_metric, timed
 from shared.node import Node
 
 
 class HealthDistrictSystem(Node):
 
-    def __init__(self, config):
-        super(HealthDistrictSystem, self).__init__(config)
+    def __init__(self, config, context=None):
+        super(HealthDistrictSystem, self).__init__(config, context)
         self.daily_count_send_frequency = self.role_parameters[DAILY_COUNT_SEND_FREQUENCY]
+        self.request_handling = self.role_parameters.get(REQUEST_HANDLING, LOCKSTEP)
+        self.max_requests_per_poll = self.role_parameters.get(MAX_REQUESTS_PER_POLL, DEFAULT_MAX_REQUESTS_PER_POLL)
         self.electronic_medical_record_socket = None
         self.disease_count_publisher_socket = None
         self.disease_outbreak_alert_subscription_sockets = set()
         self.current_daily_disease_counts = self.new_daily_disease_counts()
-        self.previous_daily_disease_counts = []
+        self.daily_count_history = self.new_daily_count_history()
         self.outbreaks = set()
-
-    # health_district_system nodes use REP listeners to receive
-    # electronic_medical_record messages and PUB listeners to publish
-    # messages to disease_outbreak_analyzers
+        self.last_daily_count_sent = None
+        # 'delta':  publish only the counts that changed, with periodic full snapshots
+        self.disease_count_encoding = config.get(DISEASE_COUNT_ENCODING, FULL)
+        self.disease_count_snapshot_interval = config.get(DISEASE_COUNT_SNAPSHOT_INTERVAL,
+                                                          DEFAULT_DISEASE_COUNT_SNAPSHOT_INTERVAL)
+        # per-link delta state, keyed like vector_timestamp_encoders
+        self.disease_count_encoders = {}
+
+    # health_district_system nodes use REP listeners (or ROUTER listeners when
+    # request_handling is 'router') to receive electronic_medical_record messages
+    # and PUB listeners to publish messages to disease_outbreak_analyzers
     def setup_listeners(self):
-        # create listener zmq sockets and save IP address and ports in config
-        my_ip_address = self.get_ip_address()
-        self.electronic_medical_record_socket = self.context.socket(zmq.REP)
-        electronic_medical_record_port = self.electronic_medical_record_socket.bind_to_random_port(TCP_RANDOM_PORT)
+        # create listener zmq sockets and save their addresses in config
+        if self.is_router_front_end():
+            self.electronic_medical_record_socket = self.context.socket(zmq.ROUTER)
+        else:
+            self.electronic_medical_record_socket = self.context.socket(zmq.REP)
         self.disease_count_publisher_socket = self.context.socket(zmq.PUB)
-        disease_count_publisher_port = self.disease_count_publisher_socket.bind_to_random_port(TCP_RANDOM_PORT)
         self.config[ADDRESS_MAP] = {
             ROLE: self.role,
-            ELECTRONIC_MEDICAL_RECORD_ADDRESS: TCP_PREFIX + my_ip_address + ":" + str(electronic_medical_record_port),
-            DISEASE_OUTBREAK_ANALYZER_ADDRESS: TCP_PREFIX + my_ip_address + ":" + str(disease_count_publisher_port)
+            ELECTRONIC_MEDICAL_RECORD_ADDRESS:
+                self.bind_listener(self.electronic_medical_record_socket, ELECTRONIC_MEDICAL_RECORD_ADDRESS),
+            DISEASE_OUTBREAK_ANALYZER_ADDRESS:
+                self.bind_listener(self.disease_count_publisher_socket, DISEASE_OUTBREAK_ANALYZER_ADDRESS)
         }
 
+    def is_router_front_end(self):
+        return self.request_handling == ROUTER
+
     # shutdown listeners that were created in setup_listeners
     def shutdown_listeners(self):
         self.electronic_medical_record_socket.close(linger=2)
@@ -47,7 +66,7 @@ class HealthDistrictSystem(Node):
         logging.debug("Connecting to node_id's: {}".format(connection_node_ids))
         for connection_node_id in connection_node_ids:
             # get the connection addresses
-            connection_node_address = self.node_addresses[connection_node_id][HEALTH_DISTRICT_SYSTEM_ADDRESS]
+            connection_node_address = self.get_peer_address(connection_node_id, HEALTH_DISTRICT_SYSTEM_ADDRESS)
             disease_outbreak_alert_subscription_socket = self.context.socket(zmq.SUB)
             disease_outbreak_alert_subscription_socket.connect(connection_node_address)
             # empty string filter => receive all messages
@@ -70,46 +89,95 @@ class HealthDistrictSystem(Node):
         disease = message[DISEASE]
         self.current_daily_disease_counts[disease] = self.current_daily_disease_counts[disease] + 1
 
-    def handle_electronic_medical_record_request(self):
-        message = self.electronic_medical_record_socket.recv_pyobj()
-        # logging.debug("Received message: {}".format(message))
+    def handle_disease_notification_batch(self, message):
+        for disease, count in message[DISEASE_COUNTS].items():
+            self.current_daily_disease_counts[disease] = self.current_daily_disease_counts[disease] + count
+
+    # apply an electronic_medical_record message and build the reply to send back;
+    # returns None if the message_type is unknown
+    def process_electronic_medical_record_message(self, message):
+        start = perf_counter_ns()
         self.vector_timestamp.increment_count(self.node_id)
+        electronic_medical_record_id = message[ELECTRONIC_MEDICAL_RECORD_ID]
+        reply = None
 
         if message[MESSAGE_TYPE] == DISEASE_NOTIFICATION:
             self.handle_disease_notification(message)
-            disease_notification_vector_timestamp = message[VECTOR_TIMESTAMP]
-            self.vector_timestamp.update_from_other(disease_notification_vector_timestamp)
+            self.merge_vector_timestamp(message, electronic_medical_record_id)
             reply = {MESSAGE_TYPE: DISEASE_NOTIFICATION_REPLY,
-                     STATUS: RECEIVED,
-                     VECTOR_TIMESTAMP: self.vector_timestamp}
-            # logging.debug("Sending reply: {}".format(reply))
-            self.electronic_medical_record_socket.send_pyobj(reply)
+                     STATUS: RECEIVED}
+            self.attach_vector_timestamp(reply, electronic_medical_record_id)
             disease = message[DISEASE]
             logging.debug("{}: {} count is now {}".format(self.get_simulation_time(), disease,
                                                           self.current_daily_disease_counts[disease]))
 
+        elif message[MESSAGE_TYPE] == DISEASE_NOTIFICATION_BATCH:
+            self.handle_disease_notification_batch(message)
+            self.merge_vector_timestamp(message, electronic_medical_record_id)
+            reply = {MESSAGE_TYPE: DISEASE_NOTIFICATION_REPLY,
+                     STATUS: RECEIVED,
+                     SEQUENCE_NUMBER: message[SEQUENCE_NUMBER]}
+            self.attach_vector_timestamp(reply, electronic_medical_record_id)
+            logging.debug("{}: counts are now {}".format(self.get_simulation_time(),
+                                                         self.extract_disease_count_map()))
+
         elif message[MESSAGE_TYPE] == OUTBREAK_QUERY:
-            outbreak_query_vector_timestamp = message[VECTOR_TIMESTAMP]
-            self.vector_timestamp.update_from_other(outbreak_query_vector_timestamp)
+            self.merge_vector_timestamp(message, electronic_medical_record_id)
             reply = {MESSAGE_TYPE: OUTBREAK_QUERY_REPLY,
-                     OUTBREAKS: self.outbreaks,
-                     VECTOR_TIMESTAMP: self.vector_timestamp}
+                     OUTBREAKS: self.outbreaks}
+            if SEQUENCE_NUMBER in message:
+                reply[SEQUENCE_NUMBER] = message[SEQUENCE_NUMBER]
+            self.attach_vector_timestamp(reply, electronic_medical_record_id)
             logging.debug("Sending reply: {}".format(reply))
-            self.electronic_medical_record_socket.send_pyobj(reply)
 
         else:
             logging.warning("Unknown message_type: {} received from node_id: {}"
-                            .format(message[MESSAGE_TYPE], message[ELECTRONIC_MEDICAL_RECORD_ID]))
+                            .format(message[MESSAGE_TYPE], electronic_medical_record_id))
+        self.metrics.record(get_message_type_metric(PROCESS_MESSAGE_PREFIX, message[MESSAGE_TYPE]),
+                            perf_counter_ns() - start)
+        return reply
+
+    # REP front end:  receive exactly one request and send its reply
+    @timed(HANDLE_ELECTRONIC_MEDICAL_RECORD_REQUEST)
+    def handle_electronic_medical_record_request(self):
+        message = self.receive_message(self.electronic_medical_record_socket)
+        # logging.debug("Received message: {}".format(message))
+        reply = self.process_electronic_medical_record_message(message)
+        if reply is not None:
+            self.send_message(self.electronic_medical_record_socket, reply)
+
+    # ROUTER front end:  drain up to max_requests_per_poll pending requests from any number
+    # of electronic_medical_records, apply them all, and then send each reply to its sender.
+    # Replies are serialized after the whole batch is applied, so every reply carries the
+    # vector_timestamp that includes all of the batch's messages.
+    @timed(HANDLE_ELECTRONIC_MEDICAL_RECORD_REQUESTS)
+    def handle_electronic_medical_record_requests(self):
+        requests = []
+        while len(requests) < self.max_requests_per_poll:
+            try:
+                frames = self.electronic_medical_record_socket.recv_multipart(zmq.NOBLOCK)
+            except zmq.Again:
+                break
+            # frames are [identity, empty delimiter, payload]
+            envelope = frames[:-1]
+            message = self.decode_message(frames[-1])
+            requests.append((envelope, self.process_electronic_medical_record_message(message)))
+        logging.debug("Handled {} electronic_medical_record requests".format(len(requests)))
+        for envelope, reply in requests:
+            if reply is not None:
+                self.send_frames(self.electronic_medical_record_socket, envelope + [self.encode_message(reply)])
 
     def handle_disease_outbreak_alert(self, socket):
-        message = socket.recv_pyobj()
+        self.handle_disease_outbreak_alert_message(self.receive_message(socket), socket)
+
+    @timed(HANDLE_DISEASE_OUTBREAK_ALERT)
+    def handle_disease_outbreak_alert_message(self, message, socket):
         logging.debug("Received outbreak alert message: {}".format(message))
         self.vector_timestamp.increment_count(self.node_id)
-        disease_outbreak_alert_vector_timestamp = message[VECTOR_TIMESTAMP]
-        self.vector_timestamp.update_from_other(disease_outbreak_alert_vector_timestamp)
+        self.merge_vector_timestamp(message, socket)
         outbreak_disease = message[DISEASE]
-        logging.info("[{}] *** ALERT *** {} outbreak detected!  vector_timestamp: {}"
-                     .format(self.get_simulation_time(), outbreak_disease, self.vector_timestamp))
+        self.event_log.log(OUTBREAK_ALERT_RECEIVED, self.get_simulation_time(), self.vector_timestamp,
+                           disease=outbreak_disease)
         self.outbreaks.add(outbreak_disease)
 
     def new_daily_disease_counts(self):
@@ -126,88 +194,169 @@ class HealthDistrictSystem(Node):
         return disease_count_map
 
     def send_daily_disease_counts_using_sockets(self):
-        self.current_daily_disease_counts[VECTOR_TIMESTAMP] = self.vector_timestamp
-        logging.info("[{}] Sending disease counts: {}  vector_timestamp: {}"
-                     .format(self.get_simulation_time(), self.extract_disease_count_map(), self.vector_timestamp))
-        self.disease_count_publisher_socket.send_pyobj(self.current_daily_disease_counts)
+        self.event_log.log(DISEASE_COUNTS_SENT, self.get_simulation_time(), self.vector_timestamp,
+                           disease_counts=self.extract_disease_count_map())
+        if self.disease_count_publishing == DISEASE_TOPICS:
+            self.send_disease_count_topics()
+        elif self.disease_count_encoding == DELTA:
+            self.send_disease_count_delta(self.disease_count_publisher_socket, self.extract_disease_count_map())
+        else:
+            self.attach_vector_timestamp(self.current_daily_disease_counts, self.disease_count_publisher_socket)
+            self.send_message(self.disease_count_publisher_socket, self.current_daily_disease_counts)
+
+    # one daily count message per disease, each behind its disease's topic frame; vector_timestamp
+    # deltas are kept per topic since each disease_outbreak_analyzer only receives its own
+    def send_disease_count_topics(self):
+        for disease in self.diseases:
+            link_id = (self.disease_count_publisher_socket, disease)
+            if self.disease_count_encoding == DELTA:
+                self.send_disease_count_delta(link_id, {disease: self.current_daily_disease_counts[disease]},
+                                              self.get_disease_topic(disease))
+                continue
+            message = self.new_disease_count_message(disease)
+            self.attach_vector_timestamp(message, link_id)
+            self.send_frames(self.disease_count_publisher_socket,
+                             [self.get_disease_topic(disease), self.encode_message(message)])
+
+    # publish the counts that changed since the last publication on link_id, behind topic if given;
+    # nothing is sent when no count changed and no full snapshot is due
+    def send_disease_count_delta(self, link_id, disease_counts, topic=None):
+        encoder = self.disease_count_encoders.get(link_id)
+        if encoder is None:
+            encoder = DiseaseCountDeltaEncoder(self.disease_count_snapshot_interval)
+            self.disease_count_encoders[link_id] = encoder
+        delta = encoder.encode(disease_counts)
+        if delta is None:
+            self.metrics.increment(DISEASE_COUNTS_UNCHANGED)
+            return
+        sequence_number, is_full_snapshot, entries = delta
+        message = {MESSAGE_TYPE: DAILY_DISEASE_COUNT_DELTA,
+                   HEALTH_DISTRICT_SYSTEM_ID: self.node_id,
+                   SEQUENCE_NUMBER: sequence_number,
+                   FULL_SNAPSHOT: is_full_snapshot,
+                   DISEASE_COUNTS: entries}
+        for timestamp in (START_TIMESTAMP, END_TIMESTAMP):
+            if timestamp in self.current_daily_disease_counts:
+                message[timestamp] = self.current_daily_disease_counts[timestamp]
+        self.attach_vector_timestamp(message, link_id)
+        frames = [self.encode_message(message)]
+        if topic is not None:
+            frames.insert(0, topic)
+        self.send_frames(self.disease_count_publisher_socket, frames)
+
+    def new_disease_count_message(self, disease):
+        message = {MESSAGE_TYPE: DAILY_DISEASE_COUNT,
+                   HEALTH_DISTRICT_SYSTEM_ID: self.node_id,
+                   DISEASE: disease,
+                   disease: self.current_daily_disease_counts[disease]}
+        for timestamp in (START_TIMESTAMP, END_TIMESTAMP):
+            if timestamp in self.current_daily_disease_counts:
+                message[timestamp] = self.current_daily_disease_counts[timestamp]
+        return message
 
     def send_daily_disease_counts(self):
-        elapsed_days = self.get_elapsed_days(self.previous_daily_disease_counts)
+        elapsed_days = self.get_elapsed_days()
         sim_time = self.get_simulation_time()
         # if the day is over, send the end-of-day counts, then reset the counts
         if self.get_elapsed_time().days > elapsed_days:
             self.current_daily_disease_counts[END_TIMESTAMP] = sim_time
             self.vector_timestamp.increment_count(self.node_id)
             self.send_daily_disease_counts_using_sockets()
-            self.archive_current_day(self.current_daily_disease_counts, self.previous_daily_disease_counts)
+            self.archive_current_day(self.extract_disease_count_map(), self.current_daily_disease_counts)
             # reset current_daily_disease_counts
             self.current_daily_disease_counts = self.new_daily_disease_counts()
             self.current_daily_disease_counts[START_TIMESTAMP] = sim_time
+            for encoder in self.disease_count_encoders.values():
+                encoder.force_full_snapshot()
         else:  # otherwise, send the current counts if enough time has elapsed
             self.send_daily_disease_counts_using_sockets()
 
-    def shutdown(self):
-        logging.info("Shutting down . . .")
-        self.disconnect_from_peers()
-        self.shutdown_listeners()
-        self.deregister()
-        self.shutdown_zmq()
-
-    def run_simulation(self):
-        logging.info("Starting simulation main loop")
-        run_simulation = True
+    def prepare_simulation(self):
         self.record_start_time()
         start_time = self.get_start_time()
-        last_daily_count_sent = start_time
+        self.last_daily_count_sent = start_time
         self.current_daily_disease_counts[START_TIMESTAMP] = start_time
-        while run_simulation:
-            try:
-                sockets = dict(self.poller.poll(700))  # poll timeout in milliseconds
-            except KeyboardInterrupt:
-                break
 
-            for socket in sockets:
-                if socket == self.overseer_subscribe_socket:
-                    if self.is_stop_simulation():
-                        logging.info("[{}] Received stop_simulation".format(self.get_simulation_time()))
-                        run_simulation = False
-                        break
+    def handle_socket_events(self, sockets):
+        for socket in sockets:
+            if socket == self.overseer_subscribe_socket:
+                if self.is_stop_simulation():
+                    logging.info("[{}] Received stop_simulation".format(self.get_simulation_time()))
+                    return False
+
+            if socket in self.disease_outbreak_alert_subscription_sockets:
+                logging.debug("received disease_outbreak_alert message")
+                self.handle_disease_outbreak_alert(socket)
+
+            if socket == self.electronic_medical_record_socket:
+                if self.is_router_front_end():
+                    self.handle_electronic_medical_record_requests()
+                else:
+                    self.handle_electronic_medical_record_request()
+        return True
 
-                if socket in self.disease_outbreak_alert_subscription_sockets:
-                    logging.debug("received disease_outbreak_alert message")
-                    self.handle_disease_outbreak_alert(socket)
+    def run_periodic_tasks(self):
+        # update simulation time
+        sim_time = self.get_simulation_time()
+
+        # send the current daily disease counts to the disease_outbreak_analyzers
+        # if end of day, also reset daily counts
+        duration_since_last_daily_count_sent = sim_time - self.last_daily_count_sent
+        if (duration_since_last_daily_count_sent.seconds / SECONDS_PER_HOUR) > self.daily_count_send_frequency:
+            self.send_daily_disease_counts()
+            self.last_daily_count_sent = sim_time
+
+        # if enough time has passed, send a heartbeat to the overseer
+        self.send_heartbeat_if_time()
 
-                if socket == self.electronic_medical_record_socket:
-                    self.handle_electronic_medical_record_request()
 
-            # update simulation time
-            sim_time = self.get_simulation_time()
+# asyncio variant:  electronic_medical_record requests, each outbreak alert subscription, and the
+# daily count sends run as separate coroutines
+class AsyncHealthDistrictSystem(AsyncNode, HealthDistrictSystem):
 
-            # send the current daily disease counts to the disease_outbreak_analyzers
-            # if end of day, also reset daily counts
-            duration_since_last_daily_count_sent = sim_time - last_daily_count_sent
-            if (duration_since_last_daily_count_sent.seconds / SECONDS_PER_HOUR) > self.daily_count_send_frequency:
-                self.send_daily_disease_counts()
-                last_daily_count_sent = sim_time
+    async def serve_electronic_medical_records(self):
+        socket = self.electronic_medical_record_socket
+        while True:
+            if self.is_router_front_end():
+                frames = await socket.recv_multipart()
+                reply = self.process_electronic_medical_record_message(self.decode_message(frames[-1]))
+                if reply is not None:
+                    await socket.send_multipart(frames[:-1] + [self.encode_message(reply)])
+            else:
+                reply = self.process_electronic_medical_record_message(self.decode_message(await socket.recv()))
+                if reply is not None:
+                    await socket.send(self.encode_message(reply))
 
-            # if enough time has passed, send a heartbeat to the overseer
-            self.send_heartbeat_if_time()
+    async def receive_disease_outbreak_alerts(self, socket):
+        while True:
+            self.handle_disease_outbreak_alert_message(self.decode_message(await socket.recv()), socket)
 
-        # shutdown procedures
-        self.shutdown()
+    async def send_daily_disease_counts_periodically(self):
+        while not await self.stopped_within(self.get_seconds_for_hours(self.daily_count_send_frequency)):
+            self.send_daily_disease_counts()
+            self.last_daily_count_sent = self.get_simulation_time()
+
+    def periodic_coroutines(self):
+        return super(AsyncHealthDistrictSystem, self).periodic_coroutines() + \
+            [self.send_daily_disease_counts_periodically()]
+
+    def receive_coroutines(self):
+        return [self.serve_electronic_medical_records()] + \
+            [self.receive_disease_outbreak_alerts(socket) for socket in self.disease_outbreak_alert_subscription_sockets]
 
 
 def main():
     # get configuration and setup overseer connection
     config = get_node_config(HEALTH_DISTRICT_SYSTEM)
     log_file = "{}-{}.log".format(config[ROLE], config[NODE_ID])
-    logging.basicConfig(format='%(message)s',
-                        filename=log_file,
-                        level=logging.INFO)
+    start_logging(log_file, config[EVENT_LOGGING])
     logging.debug(config)
 
     health_district_system = HealthDistrictSystem(config)
 
+    # log metrics whenever SIGUSR1 is received
+    health_district_system.log_metrics_on_signal()
+
     # setup listening sockets
     health_district_system.setup_listeners()
 
@@ -232,7 +381,8 @@ def main():
     # run the simulation
     health_district_system.run_simulation()
 
-    # post log to S3 URL if given
+    # write out the queued log records, then post log to S3 URL if given
+    stop_logging()
     health_district_system.post_log_to_s3(log_file)
 
 
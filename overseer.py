@@ -1,46 +1,71 @@
+import heapq
 import json
 import logging
-import time
-from datetime import datetime
+from datetime import timedelta
 from urllib.parse import parse_qs
 
 import requests
 import zmq
 
 from config.sds_config import get_overseer_config
+from shared.clock import WallClock
 from shared.constants import *
 
 
 class Overseer:
 
-    def __init__(self, config):
+    def __init__(self, config, context=None):
         self.config = config
-        self.context = zmq.Context()
-        self.reply_socket = self.context.socket(zmq.REP)
-        self.reply_socket.bind(TCP_SPECIFIED_PORT + str(config[OVERSEER_REPLY_PORT]))
+        self.clock = WallClock()
+        # a shared context belongs to the runner, which terminates it once every node has shut down
+        self.owns_context = context is None
+        self.context = context if context is not None else zmq.Context()
+        # a ROUTER socket, so requests from different nodes can be answered in any order and the
+        # supervision loop can poll it with a timeout
+        self.reply_socket = self.context.socket(zmq.ROUTER)
         self.publish_socket = self.context.socket(zmq.PUB)
-        self.publish_socket.bind(TCP_SPECIFIED_PORT + str(config[OVERSEER_PUBLISH_PORT]))
+        if config.get(TRANSPORT, TCP) == INPROC:
+            self.reply_socket.bind(INPROC_OVERSEER_REPLY_ADDRESS)
+            self.publish_socket.bind(INPROC_OVERSEER_PUBLISH_ADDRESS)
+        else:
+            self.reply_socket.bind(TCP_SPECIFIED_PORT + str(config[OVERSEER_REPLY_PORT]))
+            self.publish_socket.bind(TCP_SPECIFIED_PORT + str(config[OVERSEER_PUBLISH_PORT]))
         self.poller = None
+        # map of node_id => routing frames of the node's outstanding request
+        self.reply_envelopes = {}
         # map of node_id => ip_address:port used for address registration
         self.node_addresses = {}
+        # set of registered nodes whose subscribe socket has received a subscription_check
+        self.subscribed_nodes = set()
+        # the node_addresses as published, for nodes that missed the broadcast
+        self.published_node_addresses = None
         # set of nodes that are ready to start the simulation
         self.nodes_ready_to_start = set()
         # node heartbeat tracking:  map of node_id => last_heartbeat_received
         self.node_heartbeats = {}
+        # min-heap of (deadline, node_id) with one entry per tracked node.  A heartbeat only updates
+        # node_heartbeats; a stale entry is pushed back to the node's real deadline when it reaches the top
+        self.heartbeat_deadlines = []
+        self.heartbeat_timeout = timedelta(seconds=SECONDS_WITHOUT_HEARTBEAT)
 
     def shutdown_zmq(self):
         self.publish_socket.close(linger=2)
         self.reply_socket.close(linger=2)
-        self.context.term()
+        if self.owns_context:
+            self.context.term()
 
     def send_to_node(self, socket, node_id, message):
         encoded_node_id = node_id.encode()
         encoded_message = message.encode()
-        socket.send_multipart([encoded_node_id, encoded_message])
+        socket.send_multipart(self.reply_envelopes.pop(node_id) + [encoded_node_id, encoded_message])
 
+    # a node's REQ socket sends [node_id, message]; the ROUTER socket prepends the routing frames
+    # (the REQ socket's identity and an empty delimiter), which the reply has to start with
     def receive_from_nodes(self):
-        [encoded_node_id, encoded_reply] = self.reply_socket.recv_multipart()
+        frames = self.reply_socket.recv_multipart()
+        [encoded_node_id, encoded_reply] = frames[-2:]
         node_id = encoded_node_id.decode()
+        self.reply_envelopes[node_id] = frames[:-2]
         reply = encoded_reply.decode()
         ret_val = (node_id, reply)
         return ret_val
@@ -51,10 +76,34 @@ class Overseer:
     def all_deregistrations_completed(self):
         return len(self.node_addresses) == 0
 
-    def handle_node_registration_request(self):
+    def all_subscriptions_confirmed(self):
+        return len(self.config[NODES]) == len(self.subscribed_nodes)
+
+    # handle one startup request:  a registration, a subscription confirmation, a request for
+    # node_addresses, or ready_to_start.  Registrations and ready_to_start may overlap, since
+    # each node goes through the startup handshake at its own pace
+    def handle_startup_request(self):
         (node_id, message) = self.receive_from_nodes()
         logging.debug("Received message: \'{}\' from: \'{}\'".format(message, node_id))
-        address_map = json.loads(message)
+        if message == SUBSCRIBED:
+            self.handle_subscription_confirmation(node_id)
+        elif message == GET_NODE_ADDRESSES:
+            self.handle_node_addresses_request(node_id)
+        elif message == READY_TO_START:
+            self.handle_node_ready(node_id)
+        elif message == GET_REGISTERED_NODES:
+            self.handle_registered_nodes_request(node_id)
+        else:
+            self.handle_node_registration(node_id, message)
+
+    def handle_node_registration(self, node_id, message):
+        try:
+            address_map = json.loads(message)
+        except ValueError:
+            warning_message = "Did not receive expected registration message!"
+            logging.warning(warning_message)
+            self.send_to_node(self.reply_socket, node_id, warning_message)
+            return
         node_role = address_map[ROLE]
         if (node_role == ELECTRONIC_MEDICAL_RECORD) or \
                 (node_role == HEALTH_DISTRICT_SYSTEM) or \
@@ -67,6 +116,38 @@ class Overseer:
             logging.error("Unknown node role: {}.  No configuration for this node role!!".format(node_role))
 
         self.send_to_node(self.reply_socket, node_id, "Successful registration for {}".format(node_id))
+        # the node now waits for a subscription_check; if its subscription has not reached the
+        # publish socket yet, the check is published again until the node confirms
+        self.publish_subscription_check()
+
+    # the simulation runner tracks node startup with this request, so it is answered in every phase
+    def handle_registered_nodes_request(self, node_id):
+        self.send_to_node(self.reply_socket, node_id, json.dumps(sorted(self.node_addresses)))
+
+    def publish_subscription_check(self):
+        self.publish_socket.send_string(SUBSCRIPTION_CHECK)
+
+    def handle_subscription_confirmation(self, node_id):
+        self.subscribed_nodes.add(node_id)
+        self.send_to_node(self.reply_socket, node_id, "'subscribed' received for {}".format(node_id))
+        logging.info("{} is subscribed.".format(node_id))
+
+    def handle_node_addresses_request(self, node_id):
+        if self.published_node_addresses is None:
+            self.send_to_node(self.reply_socket, node_id, NODE_ADDRESSES_NOT_PUBLISHED)
+        else:
+            logging.info("Sending node addresses to {}".format(node_id))
+            self.send_to_node(self.reply_socket, node_id, self.published_node_addresses)
+
+    # wait until every node is registered and subscribed, publishing a subscription_check whenever
+    # no request arrives for SECONDS_PER_SUBSCRIPTION_CHECK while some node has not confirmed
+    def await_registrations_and_subscriptions(self):
+        timeout = int(SECONDS_PER_SUBSCRIPTION_CHECK * 1000)
+        while not (self.all_registrations_completed() and self.all_subscriptions_confirmed()):
+            if self.reply_socket.poll(timeout, zmq.POLLIN):
+                self.handle_startup_request()
+            elif len(self.subscribed_nodes) < len(self.node_addresses):
+                self.publish_subscription_check()
 
     def handle_node_deregistration_request(self):
         (node_id, message) = self.receive_from_nodes()
@@ -81,30 +162,21 @@ class Overseer:
             self.send_to_node(self.reply_socket, node_id, warning_message)
         
     def publish_node_addresses(self):
-        json_node_addresses = json.dumps(self.node_addresses)
-        self.publish_socket.send_string(json_node_addresses)
+        self.published_node_addresses = json.dumps(self.node_addresses)
+        self.publish_socket.send_string(self.published_node_addresses)
 
-    def handle_node_ready_request(self):
-        (node_id, message) = self.receive_from_nodes()
-        logging.debug("Received message: \'{}\' from: \'{}\'".format(message, node_id))
-        if message == READY_TO_START:
-            self.nodes_ready_to_start.add(node_id)
-            self.send_to_node(self.reply_socket, node_id, "'ready_to_start' received for {}".format(node_id))
-            logging.info("{} is ready to start.".format(node_id))
-        else:
-            warning_message = "Did not receive expected 'ready_to_start' message!"
-            logging.warning(warning_message)
-            self.send_to_node(self.reply_socket, node_id, warning_message)
+    def handle_node_ready(self, node_id):
+        self.nodes_ready_to_start.add(node_id)
+        self.send_to_node(self.reply_socket, node_id, "'ready_to_start' received for {}".format(node_id))
+        logging.info("{} is ready to start.".format(node_id))
 
     def all_nodes_ready(self):
         return len(self.config[NODES]) == len(self.nodes_ready_to_start)
 
     def publish_start_simulation(self):
         logging.info("Starting the simulation . . .")
-        start_time = datetime.now()
         # set initial node heartbeat time
-        for node_id in self.node_addresses:
-            self.node_heartbeats[node_id] = start_time
+        self.track_node_heartbeats(self.node_addresses)
         # publish start message
         self.publish_socket.send_string(START_SIMULATION)
 
@@ -112,13 +184,39 @@ class Overseer:
         logging.info("Stopping the simulation . . .")
         self.publish_socket.send_string(STOP_SIMULATION)
 
+    # start liveness tracking of node_ids as if each had just sent a heartbeat
+    def track_node_heartbeats(self, node_ids):
+        start_time = self.clock.now()
+        self.node_heartbeats = {node_id: start_time for node_id in node_ids}
+        self.heartbeat_deadlines = [(start_time + self.heartbeat_timeout, node_id) for node_id in self.node_heartbeats]
+        heapq.heapify(self.heartbeat_deadlines)
+
+    def record_heartbeat(self, node_id):
+        if node_id not in self.node_heartbeats:
+            heapq.heappush(self.heartbeat_deadlines, (self.clock.now() + self.heartbeat_timeout, node_id))
+        self.node_heartbeats[node_id] = self.clock.now()
+        logging.info("Heartbeat received from: {}".format(node_id))
+
+    # report the nodes whose deadlines have passed; a silent node is reported again after every further
+    # heartbeat timeout.  Only expired heap entries are visited, so a check costs O(log n) per expiry
     def check_node_heartbeats(self):
-        current_time = datetime.now()
-        for node_id, last_heartbeat_timestamp in self.node_heartbeats.items():
-            elapsed_time = current_time - last_heartbeat_timestamp
-            if elapsed_time.seconds > SECONDS_WITHOUT_HEARTBEAT:
+        current_time = self.clock.now()
+        while self.heartbeat_deadlines and self.heartbeat_deadlines[0][0] < current_time:
+            node_id = self.heartbeat_deadlines[0][1]
+            last_heartbeat_timestamp = self.node_heartbeats[node_id]
+            deadline = last_heartbeat_timestamp + self.heartbeat_timeout
+            if deadline < current_time:
                 logging.error("*** No heartbeats from {} since {}!  {} may be down or bad network connection."
                               .format(node_id, last_heartbeat_timestamp, node_id))
+                deadline = current_time + self.heartbeat_timeout
+            heapq.heapreplace(self.heartbeat_deadlines, (deadline, node_id))
+
+    # milliseconds until the earliest heartbeat deadline, or None to wait for the next request
+    def get_poll_timeout(self):
+        if not self.heartbeat_deadlines:
+            return None
+        time_until_deadline = self.heartbeat_deadlines[0][0] - self.clock.now()
+        return max(int(time_until_deadline.total_seconds() * 1000) + 1, 0)
 
     def post_log_to_s3(self, log_file):
         if LOG_POST_URL in self.config:
@@ -130,30 +228,75 @@ class Overseer:
             reply = requests.post(url, data=fields, files=files)
             logging.debug("Received post_log_to_s3 reply: {}".format(reply))
 
+    # handle one message received while the simulation runs;
+    # returns False when a remote shutdown request is received
+    def handle_supervision_request(self):
+        running_simulation = True
+        (node_id, message) = self.receive_from_nodes()
+        logging.debug("Received message: {} from node: {}".format(message, node_id))
+        if message == STOP_SIMULATION:
+            self.send_to_node(self.reply_socket, node_id, ACKNOWLEDGED)
+            logging.info("Received remote shutdown request")
+            running_simulation = False
+        elif message == HEARTBEAT:
+            self.send_to_node(self.reply_socket, node_id, HEARTBEAT_RECEIVED)
+            self.record_heartbeat(node_id)
+        elif message == GET_REGISTERED_NODES:
+            self.handle_registered_nodes_request(node_id)
+        self.check_node_heartbeats()
+        return running_simulation
+
     def supervise_simulation(self):
         # publish "start_simulation" message to all nodes
         self.publish_start_simulation()
-        # main simulation run loop
+        # main simulation run loop:  wake up for each request, or when the next heartbeat deadline passes
+        self.poller = zmq.Poller()
+        self.poller.register(self.reply_socket, zmq.POLLIN)
         running_simulation = True
         logging.info("Press Ctrl-C to stop simulation.")
         while running_simulation:
             try:
-                (node_id, message) = self.receive_from_nodes()
-                logging.debug("Received message: {} from node: {}".format(message, node_id))
-                if message == STOP_SIMULATION:
-                    self.send_to_node(self.reply_socket, node_id, ACKNOWLEDGED)
-                    logging.info("Received remote shutdown request")
-                    running_simulation = False
-                elif message == HEARTBEAT:
-                    self.send_to_node(self.reply_socket, node_id, HEARTBEAT_RECEIVED)
-                    self.node_heartbeats[node_id] = datetime.now()
-                    logging.info("Heartbeat received from: {}".format(node_id))
-                self.check_node_heartbeats()
+                sockets = dict(self.poller.poll(self.get_poll_timeout()))
+                if self.reply_socket in sockets:
+                    running_simulation = self.handle_supervision_request()
+                else:
+                    self.check_node_heartbeats()
             except KeyboardInterrupt:  # wait for Ctrl-C to exit main simulation run loop
                 break
+        self.poller.unregister(self.reply_socket)
         # publish "stop_simulation" message to all nodes
         self.publish_stop_simulation()
 
+    # the overseer's whole life cycle:  registration, startup, supervision, and deregistration
+    def run_simulation(self):
+        # register all nodes and wait until every node receives what the overseer publishes
+        logging.info("Waiting for nodes to register . . .")
+        self.await_registrations_and_subscriptions()
+        logging.info("All nodes are registered and subscribed.")
+        logging.debug("registered node_addresses: {}".format(self.node_addresses))
+
+        # publish node_addresses to all nodes
+        logging.info("Publishing node addresses . . .")
+        self.publish_node_addresses()
+
+        # wait for all nodes to connect to peers and then send "Ready" message
+        logging.info("Waiting for nodes to get ready . . .")
+        while not self.all_nodes_ready():
+            self.handle_startup_request()
+        logging.info("All nodes are ready to start.")
+
+        # supervise simulation until user presses Ctrl-C
+        self.supervise_simulation()
+
+        # wait for all nodes to deregister
+        logging.info("Waiting for nodes to deregister . . .")
+        while not self.all_deregistrations_completed():
+            self.handle_node_deregistration_request()
+        logging.info("All nodes are deregistered.  Shutting down . . .")
+
+        # shutdown
+        self.shutdown_zmq()
+
 
 def main():
     # get configuration and setup overseer listening
@@ -166,37 +309,7 @@ def main():
 
     overseer = Overseer(config)
 
-    # register all nodes
-    logging.info("Waiting for nodes to register . . .")
-    while not overseer.all_registrations_completed():
-        overseer.handle_node_registration_request()
-    logging.info("All nodes are registered.")
-    logging.debug("registered node_addresses: {}".format(overseer.node_addresses))
-
-    # sleep 1 second for each node to allow all nodes to finish startup
-    time.sleep(len(overseer.config[NODES]) + 1)
-
-    # publish node_addresses to all nodes
-    logging.info("Publishing node addresses . . .")
-    overseer.publish_node_addresses()
-
-    # wait for all nodes to connect to peers and then send "Ready" message
-    logging.info("Waiting for nodes to get ready . . .")
-    while not overseer.all_nodes_ready():
-        overseer.handle_node_ready_request()
-    logging.info("All nodes are ready to start.")
-
-    # supervise simulation until user presses Ctrl-C
-    overseer.supervise_simulation()
-
-    # wait for all nodes to deregister
-    logging.info("Waiting for nodes to deregister . . .")
-    while not overseer.all_deregistrations_completed():
-        overseer.handle_node_deregistration_request()
-    logging.info("All nodes are deregistered.  Shutting down . . .")
-
-    # shutdown
-    overseer.shutdown_zmq()
+    overseer.run_simulation()
 
     # post log to S3 URL if given
     overseer.post_log_to_s3(log_file)
@@ -1,8 +1,11 @@
 # given a simulation configuration file and some AWS credentials via the command line, run a simulation using AWS EC2
-import signal
-from multiprocessing import Process
+import logging
+import sys
+import time
 
 from aws.aws_helper import *
+from aws.deployment import RemoteProcess, deploy_to_instances
+from aws.placement import plan_placement
 from config.sds_config import get_runner_config
 from shared.run import Run
 
@@ -14,22 +17,41 @@ class RunAws(Run):
         self.ec2_instances = None
         self.overseer_instance = None
         self.simulation_node_instances = {}
-
-    def run_in_instance(self, ec2_instance, command_line):
-        signal.signal(signal.SIGINT, signal.SIG_IGN)
-        ec2_instance.run_command(command_line)
-
-    def run_in_own_process_instance(self, node_id, ec2_instance, command_line):
+        # one list of node_ids per simulation node EC2 instance
+        self.placement_plan = plan_placement(config[NODE_CONFIGS], config[INSTANCE_CAPACITY])
+
+    # the overseer gets an EC2 instance of its own; the nodes of each list of the placement plan share one
+    def assign_instances(self, ec2_instances):
+        self.ec2_instances = ec2_instances
+        self.overseer_instance = ec2_instances[0]
+        for ec2_instance, node_ids in zip(ec2_instances[1:], self.placement_plan):
+            logging.info("EC2 Instance {} runs {}".format(ec2_instance.instance_id, ", ".join(node_ids)))
+            for node_id in node_ids:
+                self.simulation_node_instances[node_id] = ec2_instance
+
+    # run the overseer or a simulation node on its EC2 instance; Run.launch_nodes watches it like a local process
+    def start_process(self, node_id, command_line):
         logging.debug("Launching process with command_line: {}".format(command_line))
-        self.processes[node_id] = Process(target=self.run_in_instance,
-                                          args=(ec2_instance, command_line,),
-                                          name=node_id)
-        self.processes[node_id].start()
+        if node_id == OVERSEER:
+            ec2_instance = self.overseer_instance
+        else:
+            ec2_instance = self.simulation_node_instances[node_id]
+        self.processes[node_id] = RemoteProcess(ec2_instance, command_line)
 
     def close_ssh_connections(self):
         for ec2_instance in self.ec2_instances:
             ec2_instance.ssh_close()
 
+    # stop whatever was started and terminate the EC2 instances, after an error or a Ctrl-C before the
+    # simulation started
+    def abort_simulation(self):
+        if self.context is not None:
+            self.terminate_processes()
+        self.close_ssh_connections()
+        logging.info("======= TERMINATING EC2 INSTANCES =======")
+        terminate_instances(self.ec2_instances)
+        sys.exit(1)
+
     def build_overseer_command_line_for_aws(self, config_url, log_post_url):
         return "{}; {} {} '{}' {} '{}'".format(CD_LFSDS_DIR,
                                                PYTHON,
@@ -40,7 +62,8 @@ class RunAws(Run):
 
     def build_simulation_node_command_lines_for_aws(self, config_url, log_post_urls):
         node_command_lines = {}
-        for node_id in self.config[NODES]:
+        # launched instance by instance, each health_district_system ahead of its electronic_medical_records
+        for node_id in [node_id for node_ids in self.placement_plan for node_id in node_ids]:
             role = self.config[NODES][node_id]
             if role == ELECTRONIC_MEDICAL_RECORD:
                 script_name = ELECTRONIC_MEDICAL_RECORD_SCRIPT_NAME
@@ -76,22 +99,16 @@ def main():
 
     run_aws = RunAws(config)
 
-    # create EC2 instances for all the nodes needed plus the overseer
-    logging.info("======= CREATING {} EC2 INSTANCES =======".format(len(config[NODES]) + 1))
-    run_aws.ec2_instances = create_ec2_instances(len(config[NODES]) + 1)
+    # create EC2 instances for the placement plan plus the overseer
+    instance_count = len(run_aws.placement_plan) + 1
+    logging.info("======= CREATING {} EC2 INSTANCES FOR {} SIMULATION NODES ======="
+                 .format(instance_count, len(config[NODES])))
+    run_aws.assign_instances(create_ec2_instances(instance_count))
 
     # start overseer EC2 instance
     logging.info("======= STARTING EC2 INSTANCES =======")
     start_instances(run_aws.ec2_instances)
 
-    # match overseer to EC2 instance
-    run_aws.overseer_instance = run_aws.ec2_instances[0]
-    # match simulation node_ids to EC2 instances
-    sim_node_index = 1
-    for node_id in run_aws.config[NODES]:
-        run_aws.simulation_node_instances[node_id] = run_aws.ec2_instances[sim_node_index]
-        sim_node_index = sim_node_index + 1
-
     # generate simulation folder name based on simulation config filename, hostname, PID, and start timestamp
     simulation_folder_name = generate_simulation_folder_name(config)
 
@@ -101,20 +118,19 @@ def main():
 
     # generate signed POST URLs for log files
     logging.info("======= GENERATING LOG POST URLs =======")
-    time.sleep(1)
-    #   overseer log
-    overseer_log_key = "{}{}".format(simulation_folder_prefix, OVERSEER_LOG)
-    overseer_log_post_url = generate_log_post_url(LFSDS_S3_BUCKET, overseer_log_key)
-    #   simulation node logs
-    log_post_urls = {}
+    #   overseer log, then simulation node logs
+    log_keys = {OVERSEER: "{}{}".format(simulation_folder_prefix, OVERSEER_LOG)}
     for node_id, role in config[NODES].items():
-        log_key = "{}{}-{}.log".format(simulation_folder_prefix, role, node_id)
-        logging.debug("Generating log POST URL for key: {}".format(log_key))
-        log_post_urls[node_id] = generate_log_post_url(LFSDS_S3_BUCKET, log_key)
+        log_keys[node_id] = "{}{}-{}.log".format(simulation_folder_prefix, role, node_id)
+    log_post_urls = generate_log_post_urls(LFSDS_S3_BUCKET, log_keys)
+    overseer_log_post_url = log_post_urls.pop(OVERSEER)
+
+    # instances get their public IP addresses once they are running
+    logging.info("======= WAITING FOR EC2 INSTANCES TO RUN =======")
+    wait_until_instances_are_running(run_aws.ec2_instances)
 
     # get overseer EC2 instance IP address
     logging.info("======= UPDATING SIMULATION CONFIG FILE WITH OVERSEER IP ADDRESS =======")
-    time.sleep(1)
     overseer_ip_address = run_aws.overseer_instance.get_public_ip_address()
     run_aws.config[OVERSEER_HOST] = overseer_ip_address
 
@@ -125,18 +141,15 @@ def main():
 
     # upload updated temp config file to S3 simulation folder
     logging.info("======= UPLOADING SIMULATION CONFIG FILE TO S3 BUCKET =======")
-    time.sleep(1)
     config_file_key = "{}{}".format(simulation_folder_prefix, SIMULATION_CONFIG_JSON)
     upload_and_rename_file_to_s3_bucket(LFSDS_S3_BUCKET, temp_config_filename, config_file_key)
 
     # generate signed URL for config file
     logging.info("======= GENERATING SIGNED URL FOR SIMULATION CONFIG FILE =======")
-    time.sleep(1)
     config_url = generate_config_url(LFSDS_S3_BUCKET, config_file_key)
 
     # build overseer command line
     logging.info("======= BUILDING LAUNCHER COMMAND LINES =======")
-    time.sleep(1)
     overseer_command_line = run_aws.build_overseer_command_line_for_aws(config_url, overseer_log_post_url)
     logging.debug("overseer command line is: {}".format(overseer_command_line))
 
@@ -144,59 +157,55 @@ def main():
     simulation_node_command_lines = run_aws.build_simulation_node_command_lines_for_aws(config_url, log_post_urls)
     logging.debug("simulation nodes command lines are: {}".format(simulation_node_command_lines))
 
-    logging.info("======= WAITING FOR EC2 INSTANCES TO FINISH LAUNCHING =======")
-    logging.info("This could take a while . . .")
-    wait_until_instances_are_running(run_aws.ec2_instances)
-
-    # run "git clone" on all instances to get the latest version of the LFSDS scripts and modules
+    # run "git clone" on all instances to get the latest version of the LFSDS scripts and modules;
+    # each instance is deployed to as soon as it accepts SSH connections
     logging.info("======= DEPLOYING LIQUID FORTRESS SIMULATED DISEASE SURVEILLANCE =======")
-    time.sleep(1)
-    for ec2_instance in run_aws.ec2_instances:
-        ec2_instance.run_command(GIT_CLONE_COMMAND)
-        time.sleep(2)
-        ec2_instance.ssh_close()
-        # Close the connection to avoid paramiko bug when passing ssh connection to child threads
-
-    # start overseer script with config file URL and log POST URL
-    time.sleep(5)
-    logging.info("======= STARTING OVERSEER SCRIPT =======")
-    run_aws.run_in_own_process_instance(OVERSEER, run_aws.overseer_instance, overseer_command_line)
-    time.sleep(5)
-
-    # start simulation node scripts with config file URL, node_id, and respective log POST URL
-    for sim_node_id, sim_node_command_line in simulation_node_command_lines.items():
-        logging.info("======= STARTING SIMULATION NODE WITH node_id: {} =======".format(sim_node_id))
-        run_aws.run_in_own_process_instance(sim_node_id,
-                                            run_aws.simulation_node_instances[sim_node_id],
-                                            sim_node_command_line)
-        time.sleep(1)
-
-    # wait until all child processes are started before creating zmq context
-    time.sleep(5)
-    run_aws.connect_to_overseer()
+    logging.info("This could take a while . . .")
+    try:
+        deploy_to_instances(run_aws.ec2_instances, config[MAX_DEPLOYMENT_WORKERS])
+
+        # the runner asks the overseer which nodes have registered while it launches them
+        run_aws.connect_to_overseer()
+
+        # start overseer script with config file URL and log POST URL
+        logging.info("======= STARTING OVERSEER SCRIPT =======")
+        run_aws.start_process(OVERSEER, overseer_command_line)
+
+        # start simulation node scripts with config file URL, node_id, and respective log POST URL
+        logging.info("======= STARTING SIMULATION NODES =======")
+        run_aws.launch_nodes(simulation_node_command_lines, config[MAX_STARTING_NODES])
+    except RuntimeError as error:
+        logging.error(error)
+        run_aws.abort_simulation()
+    except KeyboardInterrupt:
+        # the simulation has not started, so the nodes go down with their instances
+        logging.info("\n======= STOPPING BEFORE THE SIMULATION STARTED =======")
+        run_aws.abort_simulation()
 
     logging.info("====================================================================")
     logging.info("[    Simulation is starting.  Press Ctrl-C to stop the simulation. ]")
     logging.info("====================================================================")
-    # listen for Ctrl-C
-    while True:
+    # listen for Ctrl-C, reporting any node that fails in the meantime
+    failed_node_ids = set()
+    while run_aws.processes[OVERSEER].poll() is None:
         try:
             time.sleep(1)
+            failed_node_ids.update(run_aws.report_failed_processes(failed_node_ids))
         except KeyboardInterrupt:
+            # upon Ctrl-C, send "stop_simulation" message to overseer
+            logging.info("\n======= SENDING stop_simulation TO OVERSEER =======")
+            run_aws.send_to_overseer(STOP_SIMULATION)
+            reply = run_aws.receive_from_overseer()
+            logging.debug("Overseer reply: {}".format(reply))
             break
 
-    # upon Ctrl-C, send "stop_simulation" message to overseer
-    logging.info("\n======= SENDING stop_simulation TO OVERSEER =======")
-    run_aws.send_to_overseer(STOP_SIMULATION)
-    reply = run_aws.receive_from_overseer()
-    logging.debug("Overseer reply: {}".format(reply))
-
     # at stop_simulation, overseer and each simulation node sends logs using the respective log POST URL
-    logging.info("======= WAITING FOR CHILD THREADS TO COMPLETE =======")
-    time.sleep(5)
+    # before its command exits
+    logging.info("======= WAITING FOR OVERSEER AND SIMULATION NODES TO EXIT =======")
     for node_id, process in run_aws.processes.items():
-        logging.debug("Joining {}".format(node_id))
-        process.join()
+        logging.debug("Waiting for {}".format(node_id))
+        process.wait()
+    run_aws.close_ssh_connections()
 
     # shutdown EC2 instances
     logging.info("======= TERMINATING EC2 INSTANCES =======")
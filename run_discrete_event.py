@@ -0,0 +1,133 @@
+# given a simulation configuration file, run the whole simulation in virtual time inside this process:
+# the overseer and every node run as event handlers on a shared virtual clock that jumps straight
+# to the next scheduled event, so a simulated year takes seconds instead of hours
+import logging
+import time
+from datetime import timedelta
+
+import zmq
+
+from config.sds_config import get_discrete_event_config
+from disease_outbreak_analyzer import DiseaseOutbreakAnalyzer
+from electronic_medical_record import ElectronicMedicalRecord
+from health_district_system import HealthDistrictSystem
+from overseer import Overseer
+from shared.constants import *
+from shared.discrete_event_engine import DiscreteEventEngine, VirtualContext, VirtualNetwork
+from shared.event_log import start_logging, stop_logging
+from shared.run import Run
+
+NODE_CLASSES = {
+    ELECTRONIC_MEDICAL_RECORD: ElectronicMedicalRecord,
+    HEALTH_DISTRICT_SYSTEM: HealthDistrictSystem,
+    DISEASE_OUTBREAK_ANALYZER: DiseaseOutbreakAnalyzer,
+}
+
+# every node shares one virtual host
+VIRTUAL_HOST = '127.0.0.1'
+
+
+class RunDiscreteEvent(Run):
+
+    def __init__(self, config):
+        super(RunDiscreteEvent, self).__init__(config)
+        self.engine = DiscreteEventEngine(config[SEED], config[NETWORK_LATENCY])
+        self.network = VirtualNetwork(self.engine)
+        self.overseer = None
+        self.overseer_context = None
+        self.nodes = {}
+
+    def create_overseer(self):
+        self.overseer_context = VirtualContext(self.network)
+        self.overseer = Overseer(self.config[OVERSEER_CONFIG], self.overseer_context)
+        self.overseer.clock = self.engine.clock
+
+    # node_ids are visited in sorted order so that seeds and event order do not depend on the config's layout
+    def create_nodes(self):
+        for node_id in sorted(self.config[NODE_CONFIGS]):
+            node_config = self.config[NODE_CONFIGS][node_id]
+            node_config[PUBLIC_IP_ADDRESS] = VIRTUAL_HOST
+            # the virtual network only models tcp connections between hosts
+            node_config[SAME_HOST_TRANSPORT] = TCP
+            context = VirtualContext(self.network)
+            node = NODE_CLASSES[node_config[ROLE]](node_config, context)
+            node.clock = self.engine.clock
+            if node.role == ELECTRONIC_MEDICAL_RECORD and RANDOM_SEED not in node.role_parameters:
+                node.random_generator.seed(self.engine.random_generator.getrandbits(64))
+            context.on_readable = self.make_socket_handler(node)
+            self.nodes[node_id] = node
+
+    @staticmethod
+    def make_socket_handler(node):
+        def handle_readable_socket(socket):
+            node.handle_socket_events({socket: zmq.POLLIN})
+        return handle_readable_socket
+
+    # the same startup sequence as each script's main(), with the overseer's side of each
+    # request handled inline as the virtual requests arrive
+    def start_nodes(self):
+        self.overseer_context.on_readable = lambda socket: self.overseer.handle_startup_request()
+        for node in self.nodes.values():
+            node.setup_listeners()
+            node.register()
+        self.overseer.publish_node_addresses()
+        for node in self.nodes.values():
+            node.receive_node_addresses()
+            node.connect_to_peers()
+            node.send_ready_to_start()
+        self.overseer_context.on_readable = lambda socket: self.overseer.handle_supervision_request()
+        self.overseer.publish_start_simulation()
+        for node in self.nodes.values():
+            node.await_start_simulation()
+            node.prepare_simulation()
+
+    def schedule_periodic_tasks(self):
+        tick_interval = timedelta(seconds=self.config[TICK_INTERVAL])
+        for node in self.nodes.values():
+            self.engine.schedule_periodic(tick_interval, node.run_periodic_tasks)
+        # the overseer's poll loop wakes up for heartbeat deadlines; here they are checked every tick
+        self.engine.schedule_periodic(tick_interval, self.overseer.check_node_heartbeats)
+
+    def stop_nodes(self):
+        self.overseer_context.on_readable = lambda socket: self.overseer.handle_node_deregistration_request()
+        for node in self.nodes.values():
+            node.shutdown()
+        self.overseer.shutdown_zmq()
+
+    # convert simulated days into the real-time duration the nodes measure with their clocks
+    def get_end_time(self):
+        time_scaling_factor = self.config[OVERSEER_CONFIG][TIME_SCALING_FACTOR]
+        duration = timedelta(seconds=self.config[DAYS] * SECONDS_PER_DAY / time_scaling_factor)
+        return self.engine.now() + duration
+
+
+def main():
+    config = get_discrete_event_config()
+    start_logging(DISCRETE_EVENT_LOG, config[EVENT_LOGGING])
+    logging.debug(config)
+
+    run_discrete_event = RunDiscreteEvent(config)
+    wall_clock_start = time.perf_counter()
+
+    run_discrete_event.create_overseer()
+    run_discrete_event.create_nodes()
+    run_discrete_event.start_nodes()
+    run_discrete_event.schedule_periodic_tasks()
+
+    end_time = run_discrete_event.get_end_time()
+    logging.info("Running {} simulated days with seed {} until virtual time {}"
+                 .format(config[DAYS], config[SEED], end_time))
+    run_discrete_event.engine.run_until(end_time)
+
+    run_discrete_event.stop_nodes()
+    elapsed = time.perf_counter() - wall_clock_start
+    summary = "Simulated {} days ({} events) in {:.2f} seconds".format(config[DAYS],
+                                                                        run_discrete_event.engine.events_processed,
+                                                                        elapsed)
+    logging.info(summary)
+    stop_logging()
+    print(summary)
+
+
+if __name__ == "__main__":
+    main()
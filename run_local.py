@@ -1,5 +1,6 @@
 # given a simulation configuration file, run a simulation on the local host
 import logging
+import sys
 import time
 
 from config.sds_config import get_runner_config
@@ -28,36 +29,45 @@ def main():
     simulation_node_command_lines = run_local.build_simulation_node_command_lines(run_local.config[CONFIG_FILE])
     # logging.debug("simulation node command lines are: {}".format(simulation_node_command_lines))
 
+    # the runner asks the overseer which nodes have registered while it launches them
+    run_local.connect_to_overseer()
+
     # start overseer
     logging.info("Starting the Overseer . . .")
-    run_local.run_in_own_process(OVERSEER, overseer_command_line)
-
-    # start simulation nodes
-    for sim_node_id, sim_node_command_line in simulation_node_command_lines.items():
-        logging.info("Starting simulation node_id: {}".format(sim_node_id))
-        run_local.run_in_own_process(sim_node_id, sim_node_command_line)
-        time.sleep(1)
-
-    # wait until all child processes are started before creating zmq context
-    run_local.connect_to_overseer()
+    run_local.start_process(OVERSEER, overseer_command_line)
+
+    # start simulation nodes, several at a time
+    try:
+        run_local.launch_nodes(simulation_node_command_lines, run_local.config[MAX_STARTING_NODES])
+    except RuntimeError as error:
+        logging.error("{}  Stopping the simulation . . .".format(error))
+        run_local.terminate_processes()
+        sys.exit(1)
+    except KeyboardInterrupt:
+        # the nodes ignore Ctrl-C, so stop the ones already started
+        logging.info("\nStopping the simulation before it started . . .")
+        run_local.terminate_processes()
+        sys.exit(1)
 
     logging.info("Simulation is starting.  Press Ctrl-C to stop the simulation.")
-    # listen for Ctrl-C
-    while True:
+    # listen for Ctrl-C, reporting any process that fails in the meantime; the simulation may also be
+    # stopped by a remote shutdown request, after which the overseer exits
+    failed_node_ids = set()
+    while run_local.processes[OVERSEER].poll() is None:
         try:
             time.sleep(1)
+            failed_node_ids.update(run_local.report_failed_processes(failed_node_ids))
         except KeyboardInterrupt:
+            # upon Ctrl-C, send "stop_simulation" message to overseer
+            logging.info("\nSending stop_simulation to Overseer . . .")
+            run_local.send_to_overseer(STOP_SIMULATION)
+            reply = run_local.receive_from_overseer()
+            logging.debug("Overseer reply: {}".format(reply))
             break
 
-    # upon Ctrl-C, send "stop_simulation" message to overseer
-    logging.info("\nSending stop_simulation to Overseer . . .")
-    run_local.send_to_overseer(STOP_SIMULATION)
-    reply = run_local.receive_from_overseer()
-    logging.debug("Overseer reply: {}".format(reply))
-
     for node_id, process in run_local.processes.items():
-        logging.debug("Joining {}".format(node_id))
-        process.join()
+        logging.debug("Waiting for {}".format(node_id))
+        process.wait()
     logging.info("All simulation processes stopped.  Exiting . . .")
 
 
@@ -0,0 +1,215 @@
+# given a simulation configuration file, run the whole simulation inside this process:  the
+# overseer and every node share one zmq context and talk over inproc endpoints, and a single
+# scheduler loop polls the sockets of every node that never blocks on a peer's reply.
+# With --asyncio, every node instead runs as coroutines of one asyncio event loop.
+import asyncio
+import logging
+import signal
+import threading
+import time
+from datetime import datetime, timedelta
+
+import zmq
+import zmq.asyncio
+
+from config.sds_config import get_single_process_config
+from disease_outbreak_analyzer import AsyncDiseaseOutbreakAnalyzer, DiseaseOutbreakAnalyzer
+from electronic_medical_record import AsyncElectronicMedicalRecord, ElectronicMedicalRecord
+from health_district_system import AsyncHealthDistrictSystem, HealthDistrictSystem
+from overseer import Overseer
+from shared.constants import *
+from shared.event_log import start_logging, stop_logging
+from shared.run import Run
+
+NODE_CLASSES = {
+    ELECTRONIC_MEDICAL_RECORD: ElectronicMedicalRecord,
+    HEALTH_DISTRICT_SYSTEM: HealthDistrictSystem,
+    DISEASE_OUTBREAK_ANALYZER: DiseaseOutbreakAnalyzer,
+}
+
+ASYNC_NODE_CLASSES = {
+    ELECTRONIC_MEDICAL_RECORD: AsyncElectronicMedicalRecord,
+    HEALTH_DISTRICT_SYSTEM: AsyncHealthDistrictSystem,
+    DISEASE_OUTBREAK_ANALYZER: AsyncDiseaseOutbreakAnalyzer,
+}
+
+# each node runs its periodic tasks after its own events or after this long without any,
+# the same cadence as the poll timeout in Node.run_simulation
+NODE_TICK = timedelta(seconds=DEFAULT_TICK_INTERVAL)
+
+
+class RunSingleProcess(Run):
+
+    def __init__(self, config):
+        super(RunSingleProcess, self).__init__(config)
+        self.context = zmq.Context()
+        self.overseer = None
+        self.overseer_thread = None
+        self.nodes = {}
+        # nodes driven by the scheduler loop, and the node that owns each polled socket
+        self.scheduled_nodes = []
+        self.socket_owners = {}
+        self.next_tick = {}
+        self.poller = zmq.Poller()
+        # nodes whose main loop blocks on a peer's reply run Node.run_simulation in their own thread
+        self.node_threads = {}
+        self.stop_requested = False
+        self.stop_sent = False
+
+    # the overseer answers blocking requests from every node, so it always gets its own thread
+    def start_overseer(self):
+        self.overseer = Overseer(self.config[OVERSEER_CONFIG], self.context)
+        self.overseer_thread = threading.Thread(target=self.overseer.run_simulation, name=OVERSEER)
+        self.overseer_thread.start()
+
+    def connect_to_overseer(self):
+        self.overseer_request_socket = self.context.socket(zmq.REQ)
+        self.overseer_request_socket.connect(INPROC_OVERSEER_REPLY_ADDRESS)
+
+    def create_nodes(self):
+        for node_id in sorted(self.config[NODE_CONFIGS]):
+            node_config = self.config[NODE_CONFIGS][node_id]
+            self.nodes[node_id] = NODE_CLASSES[node_config[ROLE]](node_config, self.context)
+
+    # asyncio nodes get sockets from an asyncio view of the same underlying context
+    def create_async_nodes(self):
+        async_context = zmq.asyncio.Context.shadow(self.context.underlying)
+        for node_id in sorted(self.config[NODE_CONFIGS]):
+            node_config = self.config[NODE_CONFIGS][node_id]
+            self.nodes[node_id] = ASYNC_NODE_CLASSES[node_config[ROLE]](node_config, async_context)
+
+    # the startup handshake from each script's main(), run node by node; every step either
+    # talks to the overseer thread or reads a message that the overseer has already published
+    def start_nodes(self):
+        for node in self.nodes.values():
+            node.setup_listeners()
+            node.register()
+        for node in self.nodes.values():
+            node.receive_node_addresses()
+            node.connect_to_peers()
+            node.configure_poller()
+            node.send_ready_to_start()
+        for node in self.nodes.values():
+            node.await_start_simulation()
+
+    def run_node_in_own_thread(self, node):
+        self.node_threads[node.node_id] = threading.Thread(target=node.run_simulation, name=node.node_id)
+        self.node_threads[node.node_id].start()
+
+    def schedule_node(self, node):
+        node.prepare_simulation()
+        for socket, flags in node.poller.sockets:
+            self.poller.register(socket, flags)
+            self.socket_owners[socket] = node
+        self.next_tick[node] = datetime.now() + NODE_TICK
+        self.scheduled_nodes.append(node)
+
+    def unschedule_node(self, node):
+        for socket, _ in node.poller.sockets:
+            self.poller.unregister(socket)
+            del self.socket_owners[socket]
+        del self.next_tick[node]
+        self.scheduled_nodes.remove(node)
+
+    def launch_nodes(self):
+        for node in self.nodes.values():
+            if node.blocks_on_peer_replies():
+                self.run_node_in_own_thread(node)
+            else:
+                self.schedule_node(node)
+        logging.info("{} nodes on the scheduler loop, {} in their own threads"
+                     .format(len(self.scheduled_nodes), len(self.node_threads)))
+
+    def request_stop(self, signal_number=None, frame=None):
+        self.stop_requested = True
+
+    def send_stop_simulation(self):
+        logging.info("Sending stop_simulation to Overseer . . .")
+        self.send_to_overseer(STOP_SIMULATION)
+        reply = self.receive_from_overseer()
+        logging.debug("Overseer reply: {}".format(reply))
+        self.stop_sent = True
+
+    # one poll loop for all scheduled nodes:  each node handles the events on its own sockets,
+    # and runs its periodic tasks after those events or once its tick interval passes
+    def run_scheduler(self, duration):
+        end_time = datetime.now() + timedelta(seconds=duration) if duration is not None else None
+        while self.scheduled_nodes or (not self.stop_sent and self.node_threads):
+            now = datetime.now()
+            if self.stop_requested or (end_time is not None and now >= end_time):
+                if not self.stop_sent:
+                    self.send_stop_simulation()
+            if not self.scheduled_nodes:
+                time.sleep(NODE_TICK.total_seconds())
+                continue
+
+            timeout = max(0, (min(self.next_tick.values()) - now).total_seconds() * 1000)
+            if end_time is not None and not self.stop_sent:
+                timeout = min(timeout, max(0, (end_time - now).total_seconds() * 1000))
+            events = dict(self.poller.poll(timeout))
+            node_events = {node: {} for node in self.scheduled_nodes}
+            for socket, event in events.items():
+                node_events[self.socket_owners[socket]][socket] = event
+
+            now = datetime.now()
+            for node in list(self.scheduled_nodes):
+                sockets = node_events[node]
+                if not sockets and now < self.next_tick[node]:
+                    continue
+                if not node.handle_socket_events(sockets):
+                    self.unschedule_node(node)
+                    node.shutdown()
+                    continue
+                node.run_periodic_tasks()
+                self.next_tick[node] = datetime.now() + NODE_TICK
+
+    async def await_stop_request(self, duration):
+        end_time = datetime.now() + timedelta(seconds=duration) if duration is not None else None
+        while not self.stop_requested and (end_time is None or datetime.now() < end_time):
+            await asyncio.sleep(0.1)
+
+    # every node's startup handshake and simulation run concurrently on this event loop
+    async def run_async_nodes(self, duration):
+        await asyncio.gather(*(node.start() for node in self.nodes.values()))
+        simulations = [asyncio.ensure_future(node.run_simulation()) for node in self.nodes.values()]
+        logging.info("{} nodes on the asyncio event loop".format(len(simulations)))
+        await self.await_stop_request(duration)
+        self.send_stop_simulation()
+        await asyncio.gather(*simulations)
+
+    def join_threads(self):
+        for node_id, thread in self.node_threads.items():
+            logging.debug("Joining {}".format(node_id))
+            thread.join()
+        self.overseer_thread.join()
+        self.overseer_request_socket.close(linger=2)
+        self.context.term()
+
+
+def main():
+    config = get_single_process_config()
+    start_logging(SINGLE_PROCESS_LOG, config[EVENT_LOGGING])
+    logging.debug(config)
+
+    run_single_process = RunSingleProcess(config)
+    # Ctrl-C only sets a flag, so the scheduler never stops in the middle of a node's handler
+    signal.signal(signal.SIGINT, run_single_process.request_stop)
+
+    print("Starting the simulation in this process.  Press Ctrl-C to stop the simulation.")
+    run_single_process.start_overseer()
+    run_single_process.connect_to_overseer()
+    if config[ASYNCIO]:
+        run_single_process.create_async_nodes()
+        asyncio.run(run_single_process.run_async_nodes(config[DURATION]))
+    else:
+        run_single_process.create_nodes()
+        run_single_process.start_nodes()
+        run_single_process.launch_nodes()
+        run_single_process.run_scheduler(config[DURATION])
+    run_single_process.join_threads()
+    stop_logging()
+    print("All simulation nodes stopped.  Exiting . . .")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+# asyncio variant of Node built on zmq.asyncio:  every peer receive and every periodic task
+# (heartbeats, daily count sends, outbreak queries, day rollover) runs as its own coroutine, so
+# periodic work is never held up behind a socket wait and many nodes can share one event loop.
+#
+# role classes combine AsyncNode with the synchronous role class, e.g.
+#     class AsyncHealthDistrictSystem(AsyncNode, HealthDistrictSystem)
+# so all message processing is shared; only the methods that wait for a message are coroutines.
+# The synchronous helpers that only send (publishing counts and alerts, pipelined batches) are
+# reused as they are:  they send through send_frames, which keeps each send's future until it
+# finishes, logs its error, and lets shutdown wait for the sends still queued.
+import asyncio
+import json
+import logging
+from datetime import timedelta
+from time import perf_counter_ns
+
+import zmq
+import zmq.asyncio
+
+from shared.constants import *
+from shared.node import Node
+
+
+class AsyncNode(Node):
+
+    def __init__(self, config, context=None):
+        super(AsyncNode, self).__init__(config, context if context is not None else zmq.asyncio.Context())
+        self.owns_context = context is None
+        # created in start() so that they belong to the running event loop
+        self.overseer_lock = None
+        self.stop_event = None
+        # futures of the sends made by the synchronous helpers that have not finished yet
+        self.pending_sends = set()
+
+    # overseer requests:  the REQ socket allows one request at a time, so concurrent
+    # coroutines (e.g. heartbeats during shutdown) take turns
+    async def send_to_overseer(self, message):
+        logging.debug("Sending message: \'{}\' from: {}".format(message, self.node_id))
+        await self.overseer_request_socket.send_multipart([self.node_id.encode(), message.encode()])
+
+    def send_frames(self, socket, frames):
+        future = socket.send_multipart(frames)
+        self.pending_sends.add(future)
+        future.add_done_callback(self.finish_send)
+
+    def finish_send(self, future):
+        self.pending_sends.discard(future)
+        if not future.cancelled() and future.exception() is not None:
+            logging.error("Send failed: {!r}".format(future.exception()))
+
+    # wait for the synchronous helpers' queued sends, but not forever on a peer that stopped receiving
+    async def flush_sends(self):
+        if self.pending_sends:
+            await asyncio.wait(set(self.pending_sends), timeout=SECONDS_TO_FLUSH_SENDS)
+
+    async def receive_from_overseer(self):
+        while True:
+            [encoded_destination_node_id, encoded_reply] = await self.overseer_request_socket.recv_multipart()
+            if self.node_id == encoded_destination_node_id.decode():
+                return encoded_reply.decode()
+
+    async def request_overseer(self, message):
+        async with self.overseer_lock:
+            await self.send_to_overseer(message)
+            reply = await self.receive_from_overseer()
+        logging.debug(reply)
+        return reply
+
+    async def receive_subscription_message(self):
+        return await self.overseer_subscribe_socket.recv_string()
+
+    async def register(self):
+        logging.debug("{} registering with overseer".format(self.node_id))
+        await self.request_overseer(json.dumps(self.get_registered_address_map()))
+        await self.confirm_subscription()
+
+    async def confirm_subscription(self):
+        while await self.receive_subscription_message() != SUBSCRIPTION_CHECK:
+            pass
+        await self.request_overseer(SUBSCRIBED)
+
+    async def deregister(self):
+        logging.debug("{} deregistering with overseer".format(self.node_id))
+        await self.request_overseer(DEREGISTER)
+
+    async def receive_node_addresses(self):
+        while True:
+            if await self.overseer_subscribe_socket.poll(SECONDS_WITHOUT_NODE_ADDRESSES * 1000, zmq.POLLIN):
+                json_node_addresses = await self.receive_subscription_message()
+                if json_node_addresses == SUBSCRIPTION_CHECK:
+                    continue
+            else:
+                json_node_addresses = await self.request_overseer(GET_NODE_ADDRESSES)
+                if json_node_addresses == NODE_ADDRESSES_NOT_PUBLISHED:
+                    continue
+            self.set_node_addresses(json.loads(json_node_addresses))
+            return
+
+    async def send_ready_to_start(self):
+        await self.request_overseer(READY_TO_START)
+
+    async def await_start_simulation(self):
+        while True:
+            message = await self.receive_subscription_message()
+            if message == START_SIMULATION:
+                return
+            if message != SUBSCRIPTION_CHECK:
+                logging.warning("received message: '" + message + "' while awaiting for simulation_start")
+
+    async def await_stop_simulation(self):
+        while True:
+            message = await self.receive_subscription_message()
+            if message == STOP_SIMULATION:
+                logging.info("[{}] Received stop_simulation".format(self.get_simulation_time()))
+                return
+            logging.warning("received message: '" + message + "' but there is no logic defined to handle it")
+
+    # the startup handshake from each script's main()
+    async def start(self):
+        self.overseer_lock = asyncio.Lock()
+        self.stop_event = asyncio.Event()
+        self.setup_listeners()
+        await self.register()
+        await self.receive_node_addresses()
+        self.connect_to_peers()
+        await self.send_ready_to_start()
+        await self.await_start_simulation()
+
+    # sleep for the given number of real seconds; returns True, early, if stop_simulation arrives
+    async def stopped_within(self, seconds):
+        try:
+            await asyncio.wait_for(self.stop_event.wait(), seconds)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    # real seconds until the simulation clock reaches the start of the given simulated day
+    def get_seconds_until_day(self, day):
+        remaining = timedelta(days=day) - self.get_elapsed_time()
+        return max(0.0, remaining.total_seconds() / self.time_scaling_factor)
+
+    # real seconds for a simulated interval given in hours
+    def get_seconds_for_hours(self, hours):
+        return hours * SECONDS_PER_HOUR / self.time_scaling_factor
+
+    # wait for the next message on socket; returns None if stop_simulation arrives first,
+    # so a node never hangs on a peer that has already shut down
+    async def receive_unless_stopped(self, socket):
+        receive = asyncio.ensure_future(socket.recv())
+        stop = asyncio.ensure_future(self.stop_event.wait())
+        done, _ = await asyncio.wait({receive, stop}, return_when=asyncio.FIRST_COMPLETED)
+        if receive in done:
+            stop.cancel()
+            return receive.result()
+        receive.cancel()
+        return None
+
+    async def send_heartbeats(self):
+        while not await self.stopped_within(SECONDS_PER_HEARTBEAT):
+            logging.info("Sending heartbeat to overseer")
+            start = perf_counter_ns()
+            await self.request_overseer(HEARTBEAT)
+            self.metrics.record(HEARTBEAT_ROUND_TRIP, perf_counter_ns() - start)
+
+    # logs the metrics requested by SIGUSR1, as the synchronous main loop does after each poll
+    async def log_requested_metrics(self):
+        while not await self.stopped_within(SECONDS_PER_METRICS_CHECK):
+            self.log_metrics_if_requested()
+
+    # coroutines that finish by themselves once stop_simulation is received
+    def periodic_coroutines(self):
+        return [self.send_heartbeats(), self.log_requested_metrics()]
+
+    # coroutines that wait on peer sockets; they are cancelled once stop_simulation is received
+    def receive_coroutines(self):
+        return []
+
+    async def run_simulation(self):
+        logging.info("Starting simulation main loop")
+        self.prepare_simulation()
+        periodic_tasks = [asyncio.ensure_future(coroutine) for coroutine in self.periodic_coroutines()]
+        receive_tasks = [asyncio.ensure_future(coroutine) for coroutine in self.receive_coroutines()]
+        await self.await_stop_simulation()
+        self.stop_event.set()
+        await asyncio.gather(*periodic_tasks)
+        for task in receive_tasks:
+            task.cancel()
+        for result in await asyncio.gather(*receive_tasks, return_exceptions=True):
+            if isinstance(result, Exception) and not isinstance(result, asyncio.CancelledError):
+                logging.error("Receive task failed: {!r}".format(result))
+        await self.shutdown()
+
+    async def shutdown(self):
+        logging.info("Shutting down . . .")
+        self.log_metrics()
+        await self.flush_sends()
+        self.disconnect_from_peers()
+        self.shutdown_listeners()
+        await self.deregister()
+        self.shutdown_zmq()
+
+    async def run(self):
+        await self.start()
+        await self.run_simulation()
@@ -0,0 +1,24 @@
+# clocks that nodes and the overseer read the current time from
+from datetime import datetime
+
+
+# real time:  what every node uses when it runs as its own process
+class WallClock:
+
+    def now(self):
+        return datetime.now()
+
+
+# virtual time:  only moves when the discrete event engine advances it to the next event
+class VirtualClock:
+
+    def __init__(self, start_time):
+        self.current_time = start_time
+
+    def now(self):
+        return self.current_time
+
+    def advance_to(self, time):
+        if time < self.current_time:
+            raise ValueError("Cannot move virtual clock back from {} to {}".format(self.current_time, time))
+        self.current_time = time
@@ -1,119 +1,333 @@
 # 'constants' used by various components
 
+ACHIEVED_RATE = 'achieved_rate'
 ACKNOWLEDGED = 'Acknowledged'
 ADDRESS_MAP = 'address_map'
 APPEND = 'a'
+ASYNCIO = 'asyncio'
+ASYNCIO_ARG = '--asyncio'
 AWS_RUN_SHELL_SCRIPT = 'AWS-RunShellScript'
+BACKGROUND_LOG_WRITER = 'background_log_writer'
+BASELINE_ARG = '--baseline'
+BASELINE_DAYS = 'baseline_days'
+BENCHMARK = 'benchmark'
+BEST_SECONDS = 'best_seconds'
+BINARY = 'binary'
 BUCKET = 'Bucket'
+BYTES_RECEIVED = 'bytes_received'
+BYTES_SENT = 'bytes_sent'
+CALLS_PER_RUN = 'calls_per_run'
 CD_LFSDS_DIR = 'cd LiquidFortressSimulatedDiseaseSurveillance'
+CLIENTS = 'clients'
+CLIENTS_ARG = '--clients'
+CLUSTER_SIZE = 'cluster_size'
+COMBINED = 'combined'
 COMMANDS = 'commands'
 CONFIG_FILE = 'config_file'
 CONNECTIONS = 'connections'
+CONTROL_LIMIT = 'control_limit'
+COUNT = 'count'
+COUNTERS = 'counters'
+COUNTS = 'counts'
+CUSUM = 'cusum'
+DAY = 'day'
+DAYS = 'days'
+DAYS_ARG = '--days'
 DAILY_COUNT_SEND_FREQUENCY = 'daily_count_send_frequency'
 DAILY_DISEASE_COUNT = 'daily_disease_count'
+DAILY_DISEASE_COUNT_DELTA = 'daily_disease_count_delta'
 DAILY_OUTBREAK_THRESHOLD = 'daily_outbreak_threshold'
+DAILY_TOTAL_UPDATED = 'daily_total_updated'
+DECISION_INTERVAL = 'decision_interval'
+DEFAULT_BENCHMARK_REPEAT = 5
+DEFAULT_DISEASE_COUNT_SNAPSHOT_INTERVAL = 8
+DEFAULT_DRAIN_TIME = 2.0
+DEFAULT_FULL_SNAPSHOT_INTERVAL = 32
+DEFAULT_HISTORY_RETENTION_DAYS = 90
+DEFAULT_INSTANCE_CAPACITY = 8  # resource units per EC2 instance
+DEFAULT_LOAD_CLIENTS = 10
+DEFAULT_MAX_DEPLOYMENT_WORKERS = 16
+DEFAULT_MAX_NOTIFICATIONS_IN_FLIGHT = 8
+DEFAULT_MAX_RATE = 100000
+DEFAULT_MAX_REQUESTS_PER_POLL = 256
+DEFAULT_MAX_STARTING_NODES = 8
+DEFAULT_NETWORK_LATENCY = 0.001  # seconds
+DEFAULT_RAMP_FACTOR = 2.0
+DEFAULT_SIMULATION_DAYS = 30
+DEFAULT_START_RATE = 100
+DEFAULT_STEP_DURATION = 5.0
+DEFAULT_TICK_INTERVAL = 0.7  # seconds, matches the node main loop poll timeout
+DELTA = 'delta'
 DEREGISTER = 'deregister'
+DICT = 'dict'
+DISCRETE_EVENT_LOG = 'discrete_event.log'
 DISEASE = 'disease'
+DISEASES_OCCURRED = 'diseases_occurred'
+DISEASE_COUNTS = 'disease_counts'
+DISEASE_COUNTS_SENT = 'disease_counts_sent'
+DISEASE_COUNTS_UNCHANGED = 'disease_counts_unchanged'
+DISEASE_COUNT_ENCODING = 'disease_count_encoding'
+DISEASE_COUNT_GAPS = 'disease_count_gaps'
+DISEASE_COUNT_PUBLISHING = 'disease_count_publishing'
+DISEASE_COUNT_SNAPSHOT_INTERVAL = 'disease_count_snapshot_interval'
 DISEASE_GENERATION = 'disease_generation'
 DISEASE_GENERATION_PARAMETERS = 'disease_generation_parameters'
 DISEASES = 'diseases'
+DISEASE_GENERATOR = 'disease_generator'
 DISEASE_NOTIFICATION = 'disease_notification'
+DISEASE_NOTIFICATION_BATCH = 'disease_notification_batch'
+DISEASE_NOTIFICATION_BATCH_ROUND_TRIP = 'disease_notification_batch_round_trip'
 DISEASE_NOTIFICATION_REPLY = 'disease_notification_reply'
+DISEASE_NOTIFICATION_ROUND_TRIP = 'disease_notification_round_trip'
+DISEASE_OCCURRED = 'disease_occurred'
 DISEASE_OUTBREAK_ALERT = 'disease_outbreak_alert'
 DISEASE_OUTBREAK_ANALYZER = 'disease_outbreak_analyzer'
 DISEASE_OUTBREAK_ANALYZER_ADDRESS = 'disease_outbreak_analyzer_address'
 DISEASE_OUTBREAK_ANALYZER_ID = 'disease_outbreak_analyzer_id'
 DISEASE_OUTBREAK_ANALYZER_SCRIPT_NAME = 'disease_outbreak_analyzer.py'
+DISEASE_PROBABILITIES = 'disease_probabilities'
+DISEASE_TOPICS = 'disease_topics'
+DISEASE_TOPIC_TERMINATOR = '\0'
 DOT_AWS = '.aws'
+DRAIN_TIME_ARG = '--drain_time'
+DURATION = 'duration'
+DURATION_ARG = '--duration'
 EC2 = 'ec2'
 ELECTRONIC_MEDICAL_RECORD = 'electronic_medical_record'
 ELECTRONIC_MEDICAL_RECORD_ADDRESS = 'electronic_medical_record_address'
+ELECTRONIC_MEDICAL_RECORD_HOST = 'electronic_medical_record_host'
+ELECTRONIC_MEDICAL_RECORD_HOST_SCRIPT_NAME = 'electronic_medical_record_host.py'
 ELECTRONIC_MEDICAL_RECORD_ID = 'electronic_medical_record_id'
 ELECTRONIC_MEDICAL_RECORD_SCRIPT_NAME = 'electronic_medical_record.py'
+ENCODED_BYTES = 'encoded_bytes'
 END_TIMESTAMP = 'end_timestamp'
+EVENT = 'event'
+EVENTS_DROPPED_PREFIX = 'events_dropped.'
+EVENT_LOGGING = 'event_logging'
+EWMA = 'ewma'
+FARRINGTON = 'farrington'
 FIELDS = 'fields'
 FILE = 'file'
+FILTER_ARG = '--filter'
+FULL = 'full'
+FULL_SNAPSHOT = 'full_snapshot'
+FULL_SNAPSHOT_INTERVAL = 'full_snapshot_interval'
+GET_NODE_ADDRESSES = 'get_node_addresses'
 GET_OBJECT = 'get_object'
+GET_REGISTERED_NODES = 'get_registered_nodes'
 GIT_CLONE_COMMAND = 'git clone https://github.com/rmcnew/LiquidFortressSimulatedDiseaseSurveillance'
+HANDLE_DAILY_DISEASE_COUNT_MESSAGE = 'handle_daily_disease_count_message'
+HANDLE_DISEASE_OUTBREAK_ALERT = 'handle_disease_outbreak_alert'
+HANDLE_ELECTRONIC_MEDICAL_RECORD_REQUEST = 'handle_electronic_medical_record_request'
+HANDLE_ELECTRONIC_MEDICAL_RECORD_REQUESTS = 'handle_electronic_medical_record_requests'
+HANDLE_PIPELINED_REPLY = 'handle_pipelined_reply'
+HANDLE_SOCKET_EVENTS = 'handle_socket_events'
 HEALTH_DISTRICT_COUNTS = 'health_district_counts'
 HEALTH_DISTRICT_SYSTEM = 'health_district_system'
 HEALTH_DISTRICT_SYSTEM_ADDRESS = 'health_district_system_address'
 HEALTH_DISTRICT_SYSTEM_ID = 'health_district_system_id'
+HEALTH_DISTRICT_SYSTEM_ROUND_TRIP = 'health_district_system_round_trip'
 HEALTH_DISTRICT_SYSTEM_SCRIPT_NAME = 'health_district_system.py'
 HEARTBEAT = 'heartbeat'
 HEARTBEAT_RECEIVED = 'Heartbeat Received'
+HEARTBEAT_ROUND_TRIP = 'heartbeat_round_trip'
+HISTOGRAMS = 'histograms'
+HISTORY_RETENTION_DAYS = 'history_retention_days'
+HISTORY_SPILL = 'history_spill'
+HISTORY_SPILL_SUFFIX = '-history'
 HOST = 'host'
 HTTPS = 'https'
+INDEXED = 'indexed'
+INPROC = 'inproc'
+INPROC_OVERSEER_PUBLISH_ADDRESS = 'inproc://overseer/publish'
+INPROC_OVERSEER_REPLY_ADDRESS = 'inproc://overseer/reply'
+INPROC_PREFIX = 'inproc://'
+INSTANCE_CAPACITY = 'instance_capacity'
+INSTANCE_CAPACITY_ARG = '--instance_capacity'
 INSTANCE_ID = 'InstanceId'
+INSTANCE_RUNNING = 'instance_running'
 INSTANCE_STATUS = 'InstanceStatus'
 INSTANCE_STATUSES = 'InstanceStatuses'
+IPC = 'ipc'
+IPC_ADDRESSES = 'ipc_addresses'
+IPC_PREFIX = 'ipc://'
+JSON_EVENT_LOG = 'json_event_log'
 KEY = 'Key'
+LATENCY_MAX_MS = 'latency_max_ms'
+LATENCY_P50_MS = 'latency_p50_ms'
+LATENCY_P90_MS = 'latency_p90_ms'
+LATENCY_P99_MS = 'latency_p99_ms'
+LEVEL = 'level'
 LFSDS_S3_BUCKET = 'liquid-fortress-simulated-disease-surveillance'
 LFSDS_SECURITY_GROUP_ID = 'sg-f306668c'
+LOAD_GENERATOR_LOG = 'load_generator.log'
 LOCAL_TIMESTAMP = 'local_timestamp'
+LOG_EXTENSION = '.log'
 LOG_POST_URL = 'log_post_url'
 LOG_POST_URL_ARG = '--log_post_url'
+LOCKSTEP = 'lockstep'
 LFSDS_KEY_NAME = 'Overseer'
 LFSDS_KEY_FILENAME = 'Overseer.pem'
+MAX_DEPLOYMENT_WORKERS = 'max_deployment_workers'
+MAX_DEPLOYMENT_WORKERS_ARG = '--max_deployment_workers'
+MAX_NOTIFICATIONS_IN_FLIGHT = 'max_notifications_in_flight'
+MAX_RATE_ARG = '--max_rate'
+MAX_REQUESTS_PER_POLL = 'max_requests_per_poll'
 MAX_PROBABILITY = 'max_probability'
+MAX_STARTING_NODES = 'max_starting_nodes'
+MAX_STARTING_NODES_ARG = '--max_starting_nodes'
+MAX_SUSTAINED_RATE = 'max_sustained_rate'
+MAX_US = 'max_us'
+MEAN_US = 'mean_us'
+MEDIAN_SECONDS = 'median_seconds'
+MESSAGE = 'message'
+MESSAGES_RECEIVED_PREFIX = 'messages_received.'
+MESSAGES_SENT_PREFIX = 'messages_sent.'
+MINIMUM_COUNT = 'minimum_count'
 MIN_PROBABILITY = 'min_probability'
 MESSAGE_TYPE = 'message_type'
+MIN_US = 'min_us'
+NDJSON_EXTENSION = '.ndjson'
+NETWORK_LATENCY = 'network_latency'
+NETWORK_LATENCY_ARG = '--network_latency'
+NODE_ADDRESSES_NOT_PUBLISHED = 'node_addresses_not_published'
+NODE_CONFIGS = 'node_configs'
 NODE_ID = 'node_id'
 NODES = 'nodes'
+NODE_IDS = 'node_ids'
 NOTIFICATION_SENT = 'notification_sent'
+NOTIFICATION_MODE = 'notification_mode'
+OFFERED_RATE = 'offered_rate'
 OK = 'ok'
+OTHER_MESSAGE_TYPE = 'other'
+OUTBREAK_ALERT_RECEIVED = 'outbreak_alert_received'
 OUTBREAK_DAILY_QUERY_FREQUENCY = 'outbreak_daily_query_frequency'
+OUTBREAK_DETECTED = 'outbreak_detected'
+OUTBREAK_DETECTION = 'outbreak_detection'
+OUTBREAK_DETECTION_PARAMETERS = 'outbreak_detection_parameters'
 OUTBREAK_QUERY = 'outbreak_query'
 OUTBREAK_QUERY_REPLY = 'outbreak_query_reply'
 OUTBREAKS = 'outbreaks'
+OUTBREAK_REPORTED = 'outbreak_reported'
+OUTPUT_ARG = '--output'
 OVERSEER = 'overseer'
+OVERSEER_CONFIG = 'overseer_config'
 OVERSEER_HOST = 'overseer_host'
 OVERSEER_LOG = 'overseer.log'
 OVERSEER_PUBLISH_PORT = 'overseer_publish_port'
 OVERSEER_REPLY_PORT = 'overseer_reply_port'
 OVERSEER_SCRIPT_NAME = 'overseer.py'
+P50_US = 'p50_us'
+P90_US = 'p90_us'
+P999_US = 'p999_us'
+P99_US = 'p99_us'
+PARAMETERS = 'parameters'
+PICKLE = 'pickle'
+PIPELINED = 'pipelined'
+POLL_WAIT = 'poll_wait'
 PROBABILITY = 'probability'
+PROCESS_MESSAGE_PREFIX = 'process_message.'
 PUBLISH_PORT = 'publish_port'
 PUBLIC_IP_ADDRESS = 'public_ip_address'
 PUBLIC_IP_ADDRESS_ARG = '--public_ip_address'
 PYTHON = '/usr/bin/python3'
+PYTHON_VERSION = 'python_version'
+RAMP_FACTOR_ARG = '--ramp_factor'
 RANDOM = 'random'
+RANDOM_SEED = 'random_seed'
 R = 'r'
+RATE_LIMITS = 'rate_limits'
 RB = 'rb'
 READY_TO_START = 'ready_to_start'
 RECEIVED = 'received'
+REFERENCE_VALUE = 'reference_value'
+REFUSED = 'refused'
+REPEAT_ARG = '--repeat'
 REPLY_PORT = 'reply_port'
+REQUEST_HANDLING = 'request_handling'
+RESOURCE_UNITS = 'resource_units'
+RESULTS = 'results'
 ROLE = 'role'
 ROLE_PARAMETERS = 'role_parameters'
+ROUTER = 'router'
 RUN_AWS = 'run_aws'
+RUN_DISCRETE_EVENT = 'run_discrete_event'
 RUN_LOCAL = 'run_local'
+RUN_PERIODIC_TASKS = 'run_periodic_tasks'
+RUN_SINGLE_PROCESS = 'run_single_process'
 RUNNING = 'running'
 S3 = 's3'
+SAME_HOST_TRANSPORT = 'same_host_transport'
+SAMPLE_RATES = 'sample_rates'
+SATURATED = 'saturated'
+SATURATION_RATE = 'saturation_rate'
+SCALAR = 'scalar'
+SEASONS = 'seasons'
+SEASON_DAYS = 'season_days'
+SEED = 'seed'
+SEED_ARG = '--seed'
 SECONDS_PER_HEARTBEAT = 60
 SECONDS_PER_HOUR = 3600
+SECONDS_PER_METRICS_CHECK = 0.7
 SECONDS_PER_DAY = SECONDS_PER_HOUR * 24
+SECONDS_PER_REGISTRATION_CHECK = 0.2
+SECONDS_PER_SSH_RETRY = 2
+SECONDS_PER_SUBSCRIPTION_CHECK = 0.1
+SECONDS_TO_FLUSH_SENDS = 2
 SECONDS_WITHOUT_HEARTBEAT = SECONDS_PER_HEARTBEAT * 3
+SECONDS_WITHOUT_NODE_ADDRESSES = 5
+SECONDS_WITHOUT_REGISTRATION = 60
+SECONDS_WITHOUT_SSH = 300
+SEND_OUTBREAK_QUERY = 'send_outbreak_query'
+SENT_RATE = 'sent_rate'
+SEQUENCE_NUMBER = 'sequence_number'
 SIMULATION_CONFIG_JSON = 'simulation_config.json'
 SIMULATION_RUNNER = 'simulation_runner'
+SIM_TIME = 'sim_time'
 SINE = 'sine'
 SINE_PERIOD_MAX = 0.8
 SINE_PERIOD_MIN = 0.2
+SINGLE_PROCESS_LOG = 'single_process.log'
+SMOOTHING = 'smoothing'
 SSH_TIMEOUT = 7.0  # seconds
 SSM = 'ssm'
+START_RATE_ARG = '--start_rate'
 START_SIMULATION = 'start_simulation'
 START_TIMESTAMP = 'start_timestamp'
 STATUS = 'Status'
+STEPS = 'steps'
+STEP_DURATION = 'step_duration'
+STEP_DURATION_ARG = '--step_duration'
 STOP_SIMULATION = 'stop_simulation'
+SUBSCRIBED = 'subscribed'
+SUBSCRIPTION_CHECK = 'subscription_check'
+SYNCHRONOUS = 'synchronous'
 SYSTEM_STATUS = 'SystemStatus'
 T2_MICRO = 't2.micro'
+TCP = 'tcp'
 TCP_PREFIX = 'tcp://'
 TCP_RANDOM_PORT = 'tcp://*'
 TCP_SPECIFIED_PORT = 'tcp://*:'
+THRESHOLD = 'threshold'
+TICK_INTERVAL = 'tick_interval'
+TICK_INTERVAL_ARG = '--tick_interval'
+TIME = 'time'
 TIME_SCALING_FACTOR = 'time_scaling_factor'
 TOTAL = 'total'
+TRANSPORT = 'transport'
 TYPE = 'type'
 UBUNTU = 'ubuntu'
 UBUNTU_PYTHON3_AMI_ID = 'ami-bf8609c7'
+UNANSWERED = 'unanswered'
 URL = 'url'
+VECTORIZED = 'vectorized'
 VECTOR_TIMESTAMP = 'vector_timestamp'
+VECTOR_TIMESTAMP_DELTA = 'vector_timestamp_delta'
+VECTOR_TIMESTAMP_ENCODING = 'vector_timestamp_encoding'
+VECTOR_TIMESTAMP_IMPLEMENTATION = 'vector_timestamp_implementation'
+WARMUP_DAYS = 'warmup_days'
+WINDOW_HALF_WIDTH = 'window_half_width'
+WIRE_PROTOCOL = 'wire_protocol'
 WRITE = 'w'
+
+Z_SCORE = 'z_score'
\ No newline at end of file
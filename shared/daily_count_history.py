@@ -0,0 +1,129 @@
+# bounded, column-oriented history of archived days' disease counts.
+#
+# each series (a disease for health_district_systems; a health_district_system_id or the total
+# for disease_outbreak_analyzers) is a typed array with one count per day, and each day's start
+# and end sim times are kept as POSIX timestamps.  Only the last retention_days days stay in
+# memory; older days are appended to a newline-delimited JSON spill file (when one is given)
+# and read back by offset on the rare queries that reach that far, or are dropped otherwise.
+import json
+from array import array
+from datetime import datetime
+
+from shared.constants import *
+
+COUNT_TYPECODE = 'q'
+OFFSET_TYPECODE = 'q'
+TIMESTAMP_TYPECODE = 'd'
+
+
+class DailyCountHistory:
+
+    def __init__(self, retention_days=DEFAULT_HISTORY_RETENTION_DAYS, spill_file=None):
+        if retention_days < 1:
+            raise ValueError("retention_days must be at least 1!")
+        self.retention_days = retention_days
+        self.spill_file = spill_file
+        # series => counts of the days in memory, oldest first
+        self.columns = {}
+        self.start_timestamps = array(TIMESTAMP_TYPECODE)
+        self.end_timestamps = array(TIMESTAMP_TYPECODE)
+        # day number of the oldest day in memory; days before it were spilled or dropped
+        self.first_day = 0
+        # file offset of each spilled day's line
+        self.spill_offsets = array(OFFSET_TYPECODE)
+
+    # the number of days archived so far
+    def get_day_count(self):
+        return self.first_day + len(self.start_timestamps)
+
+    # the oldest day that can still be queried
+    def get_first_available_day(self):
+        return 0 if self.spill_file is not None else self.first_day
+
+    def get_series(self):
+        return list(self.columns)
+
+    # archive one day:  counts maps series => count; series missing from counts count 0 that day
+    def append_day(self, counts, start_timestamp, end_timestamp):
+        days_in_memory = len(self.start_timestamps)
+        for series in counts:
+            if series not in self.columns:
+                self.columns[series] = array(COUNT_TYPECODE, bytes(array(COUNT_TYPECODE).itemsize * days_in_memory))
+        for series, column in self.columns.items():
+            column.append(counts.get(series, 0))
+        self.start_timestamps.append(start_timestamp.timestamp())
+        self.end_timestamps.append(end_timestamp.timestamp())
+        if len(self.start_timestamps) > self.retention_days:
+            self.evict_days(len(self.start_timestamps) - self.retention_days)
+
+    # move the oldest days out of memory, to the spill file if there is one
+    def evict_days(self, day_count):
+        if self.spill_file is not None:
+            # the first spill starts a new file so offsets from an earlier run are never mixed in
+            with open(self.spill_file, APPEND if self.spill_offsets else WRITE) as file:
+                for index in range(day_count):
+                    self.spill_offsets.append(file.tell())
+                    file.write(json.dumps(self.get_day_in_memory(index)) + '\n')
+        for series, column in self.columns.items():
+            del column[:day_count]
+        del self.start_timestamps[:day_count]
+        del self.end_timestamps[:day_count]
+        self.first_day = self.first_day + day_count
+
+    def get_day_in_memory(self, index):
+        return {DAY: self.first_day + index,
+                START_TIMESTAMP: self.start_timestamps[index],
+                END_TIMESTAMP: self.end_timestamps[index],
+                COUNTS: {series: column[index] for series, column in self.columns.items()}}
+
+    def read_spilled_days(self, first_day, last_day):
+        days = []
+        with open(self.spill_file) as file:
+            for day in range(first_day, last_day):
+                file.seek(self.spill_offsets[day])
+                days.append(json.loads(file.readline()))
+        return days
+
+    def check_days(self, first_day, last_day):
+        if first_day < self.get_first_available_day() or last_day > self.get_day_count() or first_day > last_day:
+            raise KeyError("days {} to {} are not in the history of days {} to {}!"
+                           .format(first_day, last_day, self.get_first_available_day(), self.get_day_count()))
+
+    # one archived day as {day, start_timestamp, end_timestamp, counts}, with datetime timestamps
+    def get_day(self, day):
+        self.check_days(day, day + 1)
+        if day >= self.first_day:
+            archived_day = self.get_day_in_memory(day - self.first_day)
+        else:
+            archived_day = self.read_spilled_days(day, day + 1)[0]
+        archived_day[START_TIMESTAMP] = datetime.fromtimestamp(archived_day[START_TIMESTAMP])
+        archived_day[END_TIMESTAMP] = datetime.fromtimestamp(archived_day[END_TIMESTAMP])
+        return archived_day
+
+    # the series' counts for days first_day up to (not including) last_day
+    def get_counts(self, series, first_day, last_day):
+        self.check_days(first_day, last_day)
+        counts = array(COUNT_TYPECODE)
+        if first_day < self.first_day:
+            spilled_days = self.read_spilled_days(first_day, min(last_day, self.first_day))
+            counts.extend(spilled_day[COUNTS].get(series, 0) for spilled_day in spilled_days)
+        start = max(first_day, self.first_day) - self.first_day
+        end = last_day - self.first_day
+        if end > start:
+            column = self.columns.get(series)
+            if column is not None:
+                counts.extend(column[start:end])
+            else:
+                counts.extend(array(COUNT_TYPECODE, bytes(array(COUNT_TYPECODE).itemsize * (end - start))))
+        return counts
+
+    # the series' counts for the last days archived days, or as many as can still be queried
+    def get_recent_counts(self, series, days):
+        day_count = self.get_day_count()
+        return self.get_counts(series, max(self.get_first_available_day(), day_count - days), day_count)
+
+    def get_total(self, series, first_day, last_day):
+        return sum(self.get_counts(series, first_day, last_day))
+
+    def __len__(self):
+        return self.get_day_count()
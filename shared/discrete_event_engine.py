@@ -0,0 +1,248 @@
+# discrete event simulation support:  a priority queue of scheduled events against a virtual
+# clock, plus an in-memory stand-in for the zmq sockets the nodes use, so that unmodified
+# overseer and node objects can exchange messages in virtual time
+import heapq
+import itertools
+import logging
+from collections import deque
+from datetime import datetime, timedelta
+from random import Random
+
+import zmq
+
+from shared.clock import VirtualClock
+from shared.constants import *
+
+# a fixed start time keeps runs with the same seed identical
+DEFAULT_START_TIME = datetime(2018, 1, 1)
+FIRST_VIRTUAL_PORT = 49152
+
+
+class DiscreteEventEngine:
+
+    def __init__(self, seed, network_latency, start_time=DEFAULT_START_TIME):
+        self.clock = VirtualClock(start_time)
+        self.random_generator = Random(seed)
+        self.network_latency = timedelta(seconds=network_latency)
+        # heap of (time, sequence, callback, args); sequence breaks ties in scheduling order
+        self.events = []
+        self.event_sequence = itertools.count()
+        self.events_processed = 0
+
+    def now(self):
+        return self.clock.now()
+
+    def schedule_at(self, time, callback, *args):
+        heapq.heappush(self.events, (time, next(self.event_sequence), callback, args))
+
+    def schedule_after(self, delay, callback, *args):
+        self.schedule_at(self.clock.now() + delay, callback, *args)
+
+    # run callback every interval until it returns False
+    def schedule_periodic(self, interval, callback):
+        def run_and_reschedule():
+            if callback() is not False:
+                self.schedule_after(interval, run_and_reschedule)
+        self.schedule_after(interval, run_and_reschedule)
+
+    # process events in time order, jumping the clock straight to each one
+    def run_until(self, end_time):
+        while self.events and self.events[0][0] <= end_time:
+            time, _, callback, args = heapq.heappop(self.events)
+            self.clock.advance_to(time)
+            callback(*args)
+            self.events_processed = self.events_processed + 1
+        if end_time > self.clock.now():
+            self.clock.advance_to(end_time)
+
+
+# the set of bound endpoints that virtual sockets connect to
+class VirtualNetwork:
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.endpoints = {}
+        self.pending_connections = {}
+        self.next_port = FIRST_VIRTUAL_PORT
+        self.identities = itertools.count()
+
+    # tcp endpoints are matched on port only, since every node shares one virtual host
+    @staticmethod
+    def endpoint_key(address):
+        if address.startswith(TCP_PREFIX):
+            return address.rsplit(':', 1)[-1]
+        return address
+
+    def allocate_port(self):
+        port = self.next_port
+        self.next_port = self.next_port + 1
+        return port
+
+    def bind(self, socket, address):
+        key = self.endpoint_key(address)
+        if key in self.endpoints:
+            raise zmq.ZMQError(zmq.EADDRINUSE, "Virtual address already in use: {}".format(address))
+        self.endpoints[key] = socket
+        for connecting_socket in self.pending_connections.pop(key, []):
+            connecting_socket.link(socket)
+
+    def connect(self, socket, address):
+        key = self.endpoint_key(address)
+        if key in self.endpoints:
+            socket.link(self.endpoints[key])
+        else:
+            self.pending_connections.setdefault(key, []).append(socket)
+
+    def unbind(self, socket):
+        for key in [key for key, bound_socket in self.endpoints.items() if bound_socket is socket]:
+            del self.endpoints[key]
+
+    def deliver(self, sender, target, frames):
+        if target.closed:
+            return
+        target.inbound.append(frames)
+        if sender.socket_type == zmq.REQ:
+            # the sender blocks in recv until the reply arrives, so the request is handled inline
+            target.notify()
+        elif target.socket_type != zmq.REQ:
+            self.engine.schedule_after(self.engine.network_latency, target.notify)
+
+
+# one per simulated process; on_readable(socket) is called whenever one of its sockets has
+# a message waiting, in place of the process's poll loop
+class VirtualContext:
+
+    def __init__(self, network):
+        self.network = network
+        self.on_readable = None
+        self.sockets = []
+
+    def socket(self, socket_type):
+        socket = VirtualSocket(self, socket_type)
+        self.sockets.append(socket)
+        return socket
+
+    def term(self):
+        pass
+
+
+class VirtualSocket:
+
+    def __init__(self, context, socket_type):
+        self.context = context
+        self.network = context.network
+        self.socket_type = socket_type
+        self.identity = str(next(self.network.identities)).encode()
+        self.peers = []
+        self.peers_by_identity = {}
+        self.subscriptions = []
+        self.inbound = deque()
+        self.outgoing_frames = []
+        self.partial_frames = []
+        self.reply_envelope = None
+        self.closed = False
+
+    def bind(self, address):
+        self.network.bind(self, address)
+
+    def bind_to_random_port(self, address):
+        port = self.network.allocate_port()
+        self.bind("{}:{}".format(address, port))
+        return port
+
+    def connect(self, address):
+        self.network.connect(self, address)
+
+    def link(self, other):
+        self.peers.append(other)
+        self.peers_by_identity[other.identity] = other
+        other.peers.append(self)
+        other.peers_by_identity[self.identity] = self
+
+    def setsockopt(self, option, value):
+        if option == zmq.SUBSCRIBE:
+            self.subscriptions.append(value)
+
+    def setsockopt_string(self, option, value):
+        self.setsockopt(option, value.encode())
+
+    def close(self, linger=None):
+        self.closed = True
+        self.network.unbind(self)
+
+    def notify(self):
+        if self.inbound and not self.closed and self.context.on_readable is not None:
+            self.context.on_readable(self)
+
+    def poll(self, timeout=None, flags=zmq.POLLIN):
+        if self.partial_frames or self.inbound:
+            return zmq.POLLIN
+        return 0
+
+    # sending
+    def send(self, data, flags=0):
+        self.outgoing_frames.append(data)
+        if not flags & zmq.SNDMORE:
+            frames = self.outgoing_frames
+            self.outgoing_frames = []
+            self.route(frames)
+
+    def send_multipart(self, frames, flags=0):
+        for frame in frames[:-1]:
+            self.send(frame, zmq.SNDMORE)
+        self.send(frames[-1])
+
+    def send_string(self, string, flags=0):
+        self.send(string.encode(), flags)
+
+    def route(self, frames):
+        if self.socket_type == zmq.REQ:
+            self.network.deliver(self, self.peers[0], [self.identity, b''] + frames)
+        elif self.socket_type == zmq.DEALER:
+            self.network.deliver(self, self.peers[0], [self.identity] + frames)
+        elif self.socket_type == zmq.REP:
+            envelope = self.reply_envelope
+            self.reply_envelope = None
+            self.network.deliver(self, self.peers_by_identity[envelope[0]], envelope[1:] + frames)
+        elif self.socket_type == zmq.ROUTER:
+            target = self.peers_by_identity.get(frames[0])
+            if target is None:
+                logging.warning("Virtual ROUTER socket dropped message for unknown identity {}".format(frames[0]))
+            else:
+                self.network.deliver(self, target, frames[1:])
+        elif self.socket_type == zmq.PUB:
+            for peer in self.peers:
+                if any(frames[0].startswith(subscription) for subscription in peer.subscriptions):
+                    self.network.deliver(self, peer, list(frames))
+        else:
+            raise TypeError("Virtual socket type {} cannot send".format(self.socket_type))
+
+    # receiving
+    def next_message(self, flags):
+        if not self.inbound:
+            if flags & zmq.NOBLOCK:
+                raise zmq.Again()
+            raise RuntimeError("Virtual socket would block forever:  no message is waiting")
+        frames = self.inbound.popleft()
+        if self.socket_type == zmq.REP:
+            delimiter = frames.index(b'')
+            self.reply_envelope = frames[:delimiter + 1]
+            return frames[delimiter + 1:]
+        if self.socket_type == zmq.REQ:
+            return frames[1:]
+        return frames
+
+    def recv_multipart(self, flags=0):
+        if self.partial_frames:
+            frames = self.partial_frames
+            self.partial_frames = []
+            return frames
+        return self.next_message(flags)
+
+    def recv(self, flags=0):
+        if not self.partial_frames:
+            self.partial_frames = self.next_message(flags)
+        return self.partial_frames.pop(0)
+
+    def recv_string(self, flags=0):
+        return self.recv(flags).decode()
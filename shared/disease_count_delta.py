@@ -0,0 +1,65 @@
+# change-only publishing of daily disease counts
+#
+# with disease_count_encoding 'delta', a health_district_system publishes only the diseases whose
+# counts changed since its last publication on the same link, and skips the publication entirely
+# when nothing changed.  Every disease_count_snapshot_interval-th send opportunity publishes all
+# counts as a full snapshot, so late subscribers and subscribers that missed a message catch up.
+# Counts are absolute, so applying a delta after a gap is safe; it just leaves the diseases that
+# changed in the missed message stale until the next full snapshot.  Counts are reset to zero at the
+# end of each day, so the first publication of every day is a full snapshot.
+import logging
+
+
+class DiseaseCountDeltaEncoder:
+
+    def __init__(self, snapshot_interval):
+        self.snapshot_interval = snapshot_interval
+        self.send_opportunities = 0
+        self.next_sequence_number = 0
+        self.last_sent = {}
+
+    # the next encode sends a full snapshot, e.g. after the counts were reset at the end of a day (a new
+    # day's count that equals the last day's published count would otherwise look unchanged)
+    def force_full_snapshot(self):
+        self.send_opportunities = 0
+
+    # returns (sequence_number, is_full_snapshot, {disease: count}), or None if nothing changed
+    def encode(self, disease_counts):
+        is_full_snapshot = (self.send_opportunities % self.snapshot_interval) == 0
+        self.send_opportunities = self.send_opportunities + 1
+        if is_full_snapshot:
+            entries = dict(disease_counts)
+        else:
+            last_sent = self.last_sent
+            entries = {disease: count for disease, count in disease_counts.items() if last_sent.get(disease) != count}
+            if not entries:
+                return None
+        self.last_sent = dict(disease_counts)
+        sequence_number = self.next_sequence_number
+        self.next_sequence_number = self.next_sequence_number + 1
+        return sequence_number, is_full_snapshot, entries
+
+
+class DiseaseCountDeltaDecoder:
+
+    def __init__(self, link_id):
+        self.link_id = link_id
+        self.expected_sequence_number = None
+        self.synchronized = False
+        self.gap_count = 0
+
+    # track the publication's sequence number; returns True if a gap was detected
+    def apply(self, sequence_number, is_full_snapshot):
+        gap = False
+        if is_full_snapshot:
+            self.synchronized = True
+        elif sequence_number != self.expected_sequence_number:
+            if self.synchronized:
+                gap = True
+                self.gap_count = self.gap_count + 1
+                logging.warning("disease count delta gap from {}: expected #{} but received #{}; "
+                                "waiting for the next full snapshot"
+                                .format(self.link_id, self.expected_sequence_number, sequence_number))
+            self.synchronized = False
+        self.expected_sequence_number = sequence_number + 1
+        return gap
@@ -0,0 +1,75 @@
+# vectorized disease generation for electronic_medical_records:  instead of one random() call and
+# one sin() per disease per loop iteration, each tick compares a row of pre-drawn uniform numbers
+# against a vector holding every disease's probability, so the cost per tick barely grows with the
+# number of tracked diseases.  Uniform numbers are drawn for block_size ticks at a time.
+#
+# disease_generation_parameters may give per-disease probabilities under 'disease_probabilities':
+#   random model:  {disease: probability}
+#   sine model:    {disease: [min_probability, max_probability]}
+# diseases that are not listed use the shared 'probability' (or 'min_probability'/'max_probability')
+from math import pi
+
+import numpy
+
+from shared.constants import *
+
+DEFAULT_BLOCK_SIZE = 64
+
+
+def check_probability(probability):
+    if (probability < 0.0) or (probability > 1.0):
+        raise TypeError("probability {} out of range 0.0 <= x <= 1.0".format(probability))
+    return probability
+
+
+class VectorizedDiseaseGenerator:
+
+    def __init__(self, diseases, disease_generation, disease_generation_parameters, seed=None,
+                 block_size=DEFAULT_BLOCK_SIZE):
+        self.diseases = list(diseases)
+        self.disease_generation = disease_generation
+        self.random_generator = numpy.random.default_rng(seed)
+        self.block_size = block_size
+        self.block = None
+        self.next_row = block_size
+        disease_probabilities = disease_generation_parameters.get(DISEASE_PROBABILITIES, {})
+        if disease_generation == RANDOM:
+            probabilities = [disease_probabilities.get(disease, disease_generation_parameters.get(PROBABILITY))
+                             for disease in self.diseases]
+            self.probabilities = numpy.array([check_probability(p) for p in probabilities])
+        elif disease_generation == SINE:
+            ranges = [disease_probabilities.get(disease, (disease_generation_parameters.get(MIN_PROBABILITY),
+                                                          disease_generation_parameters.get(MAX_PROBABILITY)))
+                      for disease in self.diseases]
+            self.min_probabilities = numpy.array([check_probability(low) for low, _ in ranges])
+            self.max_probabilities = numpy.array([check_probability(high) for _, high in ranges])
+        else:
+            raise ValueError("Unknown disease_generation: {}!".format(disease_generation))
+
+    # probability vectors for the given times, one row per time
+    def get_probabilities(self, times):
+        if self.disease_generation == RANDOM:
+            return numpy.broadcast_to(self.probabilities, (len(times), len(self.diseases)))
+        # same curve as ElectronicMedicalRecord.generate_disease_sine:  the second of the minute
+        seconds = numpy.array([time.second for time in times], dtype=float)
+        scale = numpy.abs(numpy.sin(seconds / 60 * 2 * pi))[:, numpy.newaxis]
+        return scale * (self.max_probabilities - self.min_probabilities) + self.min_probabilities
+
+    def draw_uniform(self, ticks):
+        if ticks > self.block_size:
+            return self.random_generator.random((ticks, len(self.diseases)))
+        if self.next_row + ticks > self.block_size:
+            self.block = self.random_generator.random((self.block_size, len(self.diseases)))
+            self.next_row = 0
+        rows = self.block[self.next_row:self.next_row + ticks]
+        self.next_row = self.next_row + ticks
+        return rows
+
+    # occurrence counts per disease summed over one tick per given time
+    def generate_counts(self, times):
+        return (self.draw_uniform(len(times)) < self.get_probabilities(times)).sum(axis=0)
+
+    # {disease: count} for the diseases that occurred at least once at the given times
+    def generate(self, times):
+        counts = self.generate_counts(times)
+        return {self.diseases[index]: int(counts[index]) for index in numpy.flatnonzero(counts)}
@@ -0,0 +1,195 @@
+# off-thread logging for the nodes' per-message events.
+#
+# a node records an event (disease occurred, counts sent, alert, ...) with EventLog.log, which only
+# copies the values the log line needs onto a queue; a LogWriter thread formats the line, including
+# the whole vector_timestamp, and writes it.  While a LogWriter runs, every ordinary logging call
+# goes through the same queue, so the log file keeps the order in which things happened.
+#
+# high-frequency events can be sampled (keep one of every N) or rate limited (at most N per
+# second) per event name; dropped events are counted in the node's metrics.  The LogWriter can also
+# write every record to a newline-delimited JSON file next to the log file for analysis.
+import atexit
+import json
+import logging
+import logging.handlers
+import threading
+import traceback
+from queue import SimpleQueue
+from time import monotonic, time
+
+from shared.constants import *
+
+# the log line of each event, filled in with the event's fields
+EVENT_FORMATS = {
+    DAILY_TOTAL_UPDATED: "[{sim_time}] {disease} daily total is now {total}.  vector_timestamp: {vector_timestamp}",
+    DISEASE_COUNTS_SENT: "[{sim_time}] Sending disease counts: {disease_counts}  vector_timestamp: {vector_timestamp}",
+    DISEASE_OCCURRED: "[{sim_time}] Disease occurred: {disease}  vector_timestamp: {vector_timestamp}",
+    DISEASES_OCCURRED: "[{sim_time}] Diseases occurred: {disease_counts}  vector_timestamp: {vector_timestamp}",
+    OUTBREAK_ALERT_RECEIVED: "[{sim_time}] *** ALERT *** {disease} outbreak detected!  "
+                             "vector_timestamp: {vector_timestamp}",
+    OUTBREAK_DETECTED: "[{sim_time}] *** ALERT *** {disease} outbreak detected!  vector_timestamp: {vector_timestamp}",
+    OUTBREAK_REPORTED: "[{sim_time}] *** ALERT *** {disease} outbreak reported!  vector_timestamp: {vector_timestamp}",
+}
+
+# the running LogWriter, if any; without one, events are formatted and logged on the calling thread
+log_writer = None
+
+
+def format_event(event, fields):
+    return EVENT_FORMATS[event].format(**fields)
+
+
+# the JSON line of an event:  vector_timestamps become {node_id: count}, other values their JSON or str form
+def get_event_json(logged_at, node_id, event, fields):
+    record = {TIME: logged_at, NODE_ID: node_id, EVENT: event}
+    for name, value in fields.items():
+        record[name] = dict(value.items()) if name == VECTOR_TIMESTAMP else value
+    return json.dumps(record, default=str)
+
+
+def get_record_json(record):
+    return json.dumps({TIME: record.created, LEVEL: record.levelname, MESSAGE: record.getMessage()}, default=str)
+
+
+# the stdlib QueueHandler formats each record on the calling thread; the queue never leaves
+# this process, so records are handed over as they are and the LogWriter formats them
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+
+    def prepare(self, record):
+        return record
+
+
+class LogWriter:
+
+    def __init__(self, log_file, json_log_file=None):
+        self.queue = SimpleQueue()
+        self.handler = logging.FileHandler(log_file)
+        self.handler.setFormatter(logging.Formatter('%(message)s'))
+        self.json_file = open(json_log_file, APPEND) if json_log_file is not None else None
+        self.queue_handler = DeferredQueueHandler(self.queue)
+        self.thread = threading.Thread(target=self.run, name='log_writer', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    # queue items are logging records, event tuples, or None to stop
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            try:
+                if isinstance(item, logging.LogRecord):
+                    self.write_record(item)
+                else:
+                    self.write_event(*item)
+            except Exception:
+                # a bad record must not stop the thread that writes all the others
+                traceback.print_exc()
+        self.handler.flush()
+        if self.json_file is not None:
+            self.json_file.close()
+
+    def write_record(self, record):
+        self.handler.handle(record)
+        if self.json_file is not None:
+            self.json_file.write(get_record_json(record) + '\n')
+
+    def write_event(self, logged_at, node_id, event, fields):
+        record = logging.makeLogRecord({'msg': format_event(event, fields), 'levelno': logging.INFO,
+                                        'levelname': logging.getLevelName(logging.INFO), 'created': logged_at})
+        self.handler.handle(record)
+        if self.json_file is not None:
+            self.json_file.write(get_event_json(logged_at, node_id, event, fields) + '\n')
+
+    def put_event(self, node_id, event, fields):
+        self.queue.put((time(), node_id, event, fields))
+
+    # write everything queued so far and stop the thread
+    def stop(self):
+        self.queue.put(None)
+        self.thread.join()
+
+
+# replaces logging.basicConfig in the node scripts:  log to log_file through a LogWriter thread,
+# unless the configuration's event_logging turns the background writer off
+def start_logging(log_file, event_logging=None):
+    global log_writer
+    event_logging = event_logging or {}
+    if not event_logging.get(BACKGROUND_LOG_WRITER, True):
+        logging.basicConfig(format='%(message)s', filename=log_file, level=logging.INFO)
+        return
+    json_log_file = None
+    if event_logging.get(JSON_EVENT_LOG, False):
+        json_log_file = log_file[:-len(LOG_EXTENSION)] if log_file.endswith(LOG_EXTENSION) else log_file
+        json_log_file = json_log_file + NDJSON_EXTENSION
+    log_writer = LogWriter(log_file, json_log_file)
+    root_logger = logging.getLogger()
+    root_logger.addHandler(log_writer.queue_handler)
+    root_logger.setLevel(logging.INFO)
+    log_writer.start()
+    atexit.register(stop_logging)
+
+
+# flush the LogWriter and log synchronously from here on, e.g. before the log file is posted to S3
+def stop_logging():
+    global log_writer
+    if log_writer is None:
+        return
+    writer = log_writer
+    log_writer = None
+    writer.stop()
+    root_logger = logging.getLogger()
+    root_logger.removeHandler(writer.queue_handler)
+    root_logger.addHandler(writer.handler)
+
+
+class EventLog:
+
+    def __init__(self, node_id, metrics, event_logging=None):
+        event_logging = event_logging or {}
+        self.node_id = node_id
+        self.metrics = metrics
+        # sampled events keep one of every N occurrences:  event => N
+        self.sample_intervals = {event: max(1, round(1 / sample_rate))
+                                 for event, sample_rate in event_logging.get(SAMPLE_RATES, {}).items()}
+        self.sample_counts = {}
+        # rate limited events spend one token each from a bucket that refills at the limit per second
+        self.rate_limits = event_logging.get(RATE_LIMITS, {})
+        self.tokens = {}
+        self.last_refill = {}
+
+    # True if this occurrence of event should be logged
+    def is_admitted(self, event):
+        sample_interval = self.sample_intervals.get(event)
+        if sample_interval is not None:
+            sample_count = self.sample_counts.get(event, 0)
+            self.sample_counts[event] = sample_count + 1
+            if sample_count % sample_interval:
+                return False
+        rate_limit = self.rate_limits.get(event)
+        if rate_limit is not None:
+            now = monotonic()
+            tokens = min(rate_limit, self.tokens.get(event, rate_limit)
+                         + (now - self.last_refill.get(event, now)) * rate_limit)
+            self.last_refill[event] = now
+            if tokens < 1:
+                self.tokens[event] = tokens
+                return False
+            self.tokens[event] = tokens - 1
+        return True
+
+    # fields are the event's values other than sim_time and vector_timestamp; they must not be
+    # changed after the call, since they are formatted later on the LogWriter thread
+    def log(self, event, sim_time, vector_timestamp, **fields):
+        if not self.is_admitted(event):
+            self.metrics.increment(EVENTS_DROPPED_PREFIX + event)
+            return
+        fields[SIM_TIME] = sim_time
+        writer = log_writer
+        if writer is not None:
+            fields[VECTOR_TIMESTAMP] = vector_timestamp.copy()
+            writer.put_event(self.node_id, event, fields)
+        elif logging.getLogger().isEnabledFor(logging.INFO):
+            fields[VECTOR_TIMESTAMP] = vector_timestamp
+            logging.info(format_event(event, fields))
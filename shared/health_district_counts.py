@@ -0,0 +1,56 @@
+# per-health_district_system daily counts for one disease with an incrementally maintained total
+from array import array
+
+
+class HealthDistrictCounts:
+
+    # slots maps health_district_system_id => array index; pass the same dict to each
+    # day's HealthDistrictCounts so the ids are only interned once
+    def __init__(self, slots=None):
+        self.slots = slots if slots is not None else {}
+        self.counts = array('q')
+        self.reported = bytearray()
+        # the number of districts that reported, so len() is O(1)
+        self.reported_count = 0
+        self.total = 0
+
+    def get_slot(self, health_district_system_id):
+        slot = self.slots.get(health_district_system_id)
+        if slot is None:
+            slot = len(self.slots)
+            self.slots[health_district_system_id] = slot
+        missing = slot + 1 - len(self.counts)
+        if missing > 0:
+            self.counts.extend(array('q', bytes(self.counts.itemsize * missing)))
+            self.reported.extend(bytes(missing))
+        return slot
+
+    # replace the district's count and adjust the total by the difference; O(1)
+    def update(self, health_district_system_id, disease_count):
+        slot = self.get_slot(health_district_system_id)
+        self.total = self.total + disease_count - self.counts[slot]
+        self.counts[slot] = disease_count
+        if not self.reported[slot]:
+            self.reported[slot] = 1
+            self.reported_count = self.reported_count + 1
+        return self.total
+
+    def items(self):
+        return [(health_district_system_id, self.counts[slot])
+                for health_district_system_id, slot in self.slots.items()
+                if slot < len(self.reported) and self.reported[slot]]
+
+    def __getitem__(self, health_district_system_id):
+        slot = self.slots.get(health_district_system_id)
+        if slot is None or slot >= len(self.reported) or not self.reported[slot]:
+            raise KeyError(health_district_system_id)
+        return self.counts[slot]
+
+    def __iter__(self):
+        return iter([health_district_system_id for health_district_system_id, _ in self.items()])
+
+    def __len__(self):
+        return self.reported_count
+
+    def __repr__(self):
+        return str(dict(self.items()))
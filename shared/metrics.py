@@ -0,0 +1,131 @@
+# low-overhead instrumentation for nodes:  named counters and HDR-style latency histograms.
+#
+# a LatencyHistogram keeps a count per log-linear bucket of nanosecond values:  values below
+# 2 ** SIGNIFICANT_BITS get one bucket each, and every larger power of two is split into
+# 2 ** (SIGNIFICANT_BITS - 1) equal buckets, so any recorded value is reported within about
+# 3% while the histogram stays a few hundred counters long.  Recording is a bit_length, a shift,
+# and an array increment.
+import functools
+import logging
+import json
+from array import array
+from time import perf_counter_ns
+
+from shared.constants import *
+from shared.wire_codec import MESSAGE_TYPE_IDS
+
+SIGNIFICANT_BITS = 6
+HALF_BUCKET_COUNT = 1 << (SIGNIFICANT_BITS - 1)
+NANOSECONDS_PER_MICROSECOND = 1000
+
+# reported percentiles:  snapshot key => percentile
+PERCENTILES = {
+    P50_US: 50.0,
+    P90_US: 90.0,
+    P99_US: 99.0,
+    P999_US: 99.9,
+}
+
+
+def get_bucket_index(value):
+    shift = value.bit_length() - SIGNIFICANT_BITS
+    if shift <= 0:
+        return value
+    return shift * HALF_BUCKET_COUNT + (value >> shift)
+
+
+# the lowest value that falls in the bucket
+def get_bucket_value(index):
+    if index < 2 * HALF_BUCKET_COUNT:
+        return index
+    shift = index // HALF_BUCKET_COUNT - 1
+    return (index - shift * HALF_BUCKET_COUNT) << shift
+
+
+# the metric name for a message type:  types outside the protocol all share OTHER_MESSAGE_TYPE, so a
+# peer that sends arbitrary types cannot grow a node's counters and histograms without bound
+def get_message_type_metric(prefix, message_type):
+    if message_type not in MESSAGE_TYPE_IDS:
+        message_type = OTHER_MESSAGE_TYPE
+    return prefix + message_type
+
+
+class LatencyHistogram:
+
+    def __init__(self):
+        self.counts = array('Q')
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def record(self, nanoseconds):
+        index = get_bucket_index(nanoseconds)
+        if index >= len(self.counts):
+            self.counts.extend(array('Q', bytes(self.counts.itemsize * (index + 1 - len(self.counts)))))
+        self.counts[index] = self.counts[index] + 1
+        self.count = self.count + 1
+        self.total = self.total + nanoseconds
+        if self.min is None or nanoseconds < self.min:
+            self.min = nanoseconds
+        if nanoseconds > self.max:
+            self.max = nanoseconds
+
+    # the lowest value of the bucket that holds the given percentile, capped at the recorded maximum
+    def get_value_at_percentile(self, percentile):
+        if self.count == 0:
+            return 0
+        rank = max(1, -(-self.count * percentile // 100))
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen = seen + bucket_count
+            if seen >= rank:
+                return min(get_bucket_value(index), self.max)
+        return self.max
+
+    def get_snapshot(self):
+        snapshot = {COUNT: self.count,
+                    MEAN_US: self.total / self.count / NANOSECONDS_PER_MICROSECOND if self.count else 0,
+                    MIN_US: (self.min or 0) / NANOSECONDS_PER_MICROSECOND,
+                    MAX_US: self.max / NANOSECONDS_PER_MICROSECOND}
+        for key, percentile in PERCENTILES.items():
+            snapshot[key] = self.get_value_at_percentile(percentile) / NANOSECONDS_PER_MICROSECOND
+        return snapshot
+
+
+class NodeMetrics:
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+
+    def increment(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def record(self, name, nanoseconds):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = LatencyHistogram()
+            self.histograms[name] = histogram
+        histogram.record(nanoseconds)
+
+    def get_snapshot(self):
+        return {COUNTERS: dict(self.counters),
+                HISTOGRAMS: {name: histogram.get_snapshot() for name, histogram in self.histograms.items()}}
+
+    def log_snapshot(self, node_id):
+        logging.info("metrics for {}: {}".format(node_id, json.dumps(self.get_snapshot(), sort_keys=True)))
+
+
+# record how long each call of a node method takes in the node's histogram of the given name
+def timed(histogram_name):
+    def decorator(method):
+        @functools.wraps(method)
+        def timed_method(self, *args, **kwargs):
+            start = perf_counter_ns()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self.metrics.record(histogram_name, perf_counter_ns() - start)
+        return timed_method
+    return decorator
@@ -1,46 +1,194 @@
 # parent class for all node types:  electronic_medical_record, health_district_system, and disease_outbreak_analyzer
 import json
 import logging
+import os
+import pickle
+import signal
 import socket
-from datetime import datetime
+import tempfile
+from time import perf_counter_ns
 from urllib.parse import parse_qs
 
 import requests
 import zmq
 
+from shared.clock import WallClock
 from shared.constants import *
-from shared.vector_timestamp import VectorTimestamp
+from shared.daily_count_history import DailyCountHistory
+from shared.event_log import EventLog
+from shared.metrics import NodeMetrics, get_message_type_metric
+from shared.vector_timestamp import IndexedVectorTimestamp, NodeIndex, VectorTimestamp
+from shared.vector_timestamp_delta import VectorTimestampDeltaDecoder, VectorTimestampDeltaEncoder
+from shared.wire_codec import WireCodec
 
 
 class Node:
 
-    def __init__(self, config):
+    # context defaults to a new zmq.Context; runners that host several nodes in one
+    # process (or simulate the network) pass in a shared one
+    def __init__(self, config, context=None):
         self.config = config
         self.node_id = config[NODE_ID]
         self.time_scaling_factor = config[TIME_SCALING_FACTOR]
         self.role = config[ROLE]
         self.role_parameters = config[ROLE_PARAMETERS]
         self.diseases = config[DISEASES]
+        self.wire_protocol = config.get(WIRE_PROTOCOL, PICKLE)
+        self.wire_codec = WireCodec(self.diseases)
+        self.clock = WallClock()
         self.simulation_start_time = None
         self.last_heartbeat_sent = None
         self.node_addresses = None
         self.vector_timestamp = VectorTimestamp()
-        self.context = zmq.Context()
+        self.vector_timestamp_encoding = config.get(VECTOR_TIMESTAMP_ENCODING, FULL)
+        self.full_snapshot_interval = config.get(FULL_SNAPSHOT_INTERVAL, DEFAULT_FULL_SNAPSHOT_INTERVAL)
+        # 'combined':  one daily count message with every disease; 'disease_topics':  one message per
+        # disease behind a topic frame, so that subscribers filter on their disease inside libzmq
+        self.disease_count_publishing = config.get(DISEASE_COUNT_PUBLISHING, COMBINED)
+        # per-link delta state, keyed by peer node_id (or by socket for PUB/SUB streams)
+        self.vector_timestamp_encoders = {}
+        self.vector_timestamp_decoders = {}
+        # per-handler latency histograms and message counters; logged at shutdown and on SIGUSR1
+        self.metrics = NodeMetrics()
+        # set by SIGUSR1 and logged by the main loop, since logging is not safe inside a signal handler
+        self.metrics_requested = False
+        # per-message events are formatted and written off the main loop; see shared/event_log.py
+        self.event_log = EventLog(self.node_id, self.metrics, config.get(EVENT_LOGGING))
+        # transport is 'tcp' unless a runner hosts every node in one process and sets it to 'inproc'
+        self.transport = config.get(TRANSPORT, TCP)
+        # tcp listeners are also bound to ipc:// endpoints, which peers on the same host connect to instead,
+        # unless the config's same_host_transport is 'tcp' (or libzmq has no ipc support on this platform)
+        self.same_host_transport = config.get(SAME_HOST_TRANSPORT, IPC) if zmq.has(IPC) else TCP
+        self.ipc_addresses = {}
+        # a shared context belongs to the runner, which terminates it once every node has shut down
+        self.owns_context = context is None
+        self.context = context if context is not None else zmq.Context()
         self.poller = None
+        self.overseer_request_socket = None
+        self.overseer_subscribe_socket = None
+        self.connect_to_overseer()
+
+    def connect_to_overseer(self):
         self.overseer_request_socket = self.context.socket(zmq.REQ)
-        overseer_host = config[OVERSEER_HOST]
-        overseer_reply_port = str(config[OVERSEER_REPLY_PORT])
-        overseer_publish_port = str(config[OVERSEER_PUBLISH_PORT])
-        self.overseer_request_socket.connect("tcp://{}:{}".format(overseer_host, overseer_reply_port))
         self.overseer_subscribe_socket = self.context.socket(zmq.SUB)
-        self.overseer_subscribe_socket.connect("tcp://{}:{}".format(overseer_host, overseer_publish_port))
+        if self.transport == INPROC:
+            self.overseer_request_socket.connect(INPROC_OVERSEER_REPLY_ADDRESS)
+            self.overseer_subscribe_socket.connect(INPROC_OVERSEER_PUBLISH_ADDRESS)
+        else:
+            overseer_host = self.config[OVERSEER_HOST]
+            overseer_reply_port = str(self.config[OVERSEER_REPLY_PORT])
+            overseer_publish_port = str(self.config[OVERSEER_PUBLISH_PORT])
+            self.overseer_request_socket.connect("tcp://{}:{}".format(overseer_host, overseer_reply_port))
+            self.overseer_subscribe_socket.connect("tcp://{}:{}".format(overseer_host, overseer_publish_port))
         # empty string filter => receive all messages
         self.overseer_subscribe_socket.setsockopt_string(zmq.SUBSCRIBE, '')
 
     def shutdown_zmq(self):
         self.overseer_request_socket.close(linger=2)
         self.overseer_subscribe_socket.close(linger=2)
-        self.context.term()
+        if self.owns_context:
+            self.context.term()
+        self.remove_ipc_endpoints()
+
+    # libzmq leaves the files of ipc endpoints behind once their sockets are closed
+    def remove_ipc_endpoints(self):
+        for ipc_address in self.ipc_addresses.values():
+            try:
+                os.remove(ipc_address[len(IPC_PREFIX):])
+            except OSError:
+                pass
+
+    # bind a listener socket and return the address peers should connect to:  a random
+    # tcp port on this host, or an inproc endpoint named after this node and the listener;
+    # tcp listeners get an ipc endpoint as well, registered in the address map's ipc_addresses
+    def bind_listener(self, socket, listener_name):
+        if self.transport == INPROC:
+            address = "{}{}/{}".format(INPROC_PREFIX, self.node_id, listener_name)
+            socket.bind(address)
+            return address
+        port = socket.bind_to_random_port(TCP_RANDOM_PORT)
+        if self.same_host_transport == IPC:
+            ipc_address = "{}{}/lfsds-{}-{}".format(IPC_PREFIX, tempfile.gettempdir(), self.node_id, port)
+            socket.bind(ipc_address)
+            self.ipc_addresses[listener_name] = ipc_address
+        return TCP_PREFIX + self.get_ip_address() + ":" + str(port)
+
+    # the address to connect to a peer's listener:  its ipc endpoint when the peer registered one and its
+    # tcp address is on this node's host, otherwise the address in its address map
+    def get_peer_address(self, node_id, listener_name):
+        address_map = self.node_addresses[node_id]
+        address = address_map[listener_name]
+        ipc_address = address_map.get(IPC_ADDRESSES, {}).get(listener_name)
+        if self.same_host_transport == IPC and ipc_address is not None and \
+                address.startswith(TCP_PREFIX) and address[len(TCP_PREFIX):].rsplit(':', 1)[0] == self.get_ip_address():
+            address = ipc_address
+        logging.info("Connecting to {} of {} at {}".format(listener_name, node_id, address))
+        return address
+
+    # peer messages are dicts; on the wire they are pickled or, when the config's
+    # wire_protocol is 'binary', encoded with the shared WireCodec
+    def encode_message(self, message):
+        if self.wire_protocol == BINARY:
+            data = self.wire_codec.encode(message)
+        else:
+            data = pickle.dumps(message)
+        self.metrics.increment(get_message_type_metric(MESSAGES_SENT_PREFIX, message[MESSAGE_TYPE]))
+        self.metrics.increment(BYTES_SENT, len(data))
+        return data
+
+    def decode_message(self, data):
+        if self.wire_protocol == BINARY:
+            message = self.wire_codec.decode(data)
+        else:
+            message = pickle.loads(data)
+        self.metrics.increment(get_message_type_metric(MESSAGES_RECEIVED_PREFIX, message[MESSAGE_TYPE]))
+        self.metrics.increment(BYTES_RECEIVED, len(data))
+        return message
+
+    def send_message(self, socket, message):
+        self.send_frames(socket, [self.encode_message(message)])
+
+    # every peer send of the helpers shared with AsyncNode goes through here
+    def send_frames(self, socket, frames):
+        socket.send_multipart(frames)
+
+    def receive_message(self, socket):
+        return self.decode_message(socket.recv())
+
+    # True if the main loop can block waiting for a peer's reply; such nodes cannot share
+    # a thread with the peers they wait on
+    def blocks_on_peer_replies(self):
+        return False
+
+    # add this node's vector_timestamp to an outgoing message:  the whole clock, or only
+    # the entries that changed since the last message on link_id when using delta encoding
+    def attach_vector_timestamp(self, message, link_id):
+        if self.vector_timestamp_encoding == DELTA:
+            encoder = self.vector_timestamp_encoders.get(link_id)
+            if encoder is None:
+                encoder = VectorTimestampDeltaEncoder(self.full_snapshot_interval)
+                self.vector_timestamp_encoders[link_id] = encoder
+            message[VECTOR_TIMESTAMP_DELTA] = encoder.encode(self.vector_timestamp)
+        else:
+            message[VECTOR_TIMESTAMP] = self.vector_timestamp
+        return message
+
+    # merge the vector_timestamp (or vector_timestamp delta) carried by a received message
+    def merge_vector_timestamp(self, message, link_id):
+        if VECTOR_TIMESTAMP_DELTA in message:
+            decoder = self.vector_timestamp_decoders.get(link_id)
+            if decoder is None:
+                decoder = VectorTimestampDeltaDecoder(link_id)
+                self.vector_timestamp_decoders[link_id] = decoder
+            decoder.apply(message[VECTOR_TIMESTAMP_DELTA], self.vector_timestamp)
+        else:
+            self.vector_timestamp.update_from_other(message[VECTOR_TIMESTAMP])
+
+    # the topic frame of a disease's daily counts; the terminator keeps one disease's topic from
+    # being a prefix of another's (e.g. 'flu' and 'flu_b')
+    @staticmethod
+    def get_disease_topic(disease):
+        return (disease + DISEASE_TOPIC_TERMINATOR).encode()
 
     def send_to_overseer(self, message):
         logging.debug("Sending message: \'{}\' from: {}".format(message, self.node_id))
@@ -61,12 +209,28 @@ class Node:
 
     def register(self):
         logging.debug("{} registering with overseer".format(self.node_id))
-        address_map = self.config[ADDRESS_MAP]
-        address_map[TYPE] = ADDRESS_MAP
+        address_map = self.get_registered_address_map()
         serialized_address_map = json.dumps(address_map)
         self.send_to_overseer(serialized_address_map)
         reply = self.receive_from_overseer()
         logging.debug(reply)
+        self.confirm_subscription()
+
+    def get_registered_address_map(self):
+        address_map = self.config[ADDRESS_MAP]
+        address_map[TYPE] = ADDRESS_MAP
+        if self.ipc_addresses:
+            address_map[IPC_ADDRESSES] = self.ipc_addresses
+        return address_map
+
+    # the overseer publishes a subscription_check until this node confirms that one arrived, so nothing
+    # else is published before every node's subscribe socket is known to be connected
+    def confirm_subscription(self):
+        while self.receive_subscription_message() != SUBSCRIPTION_CHECK:
+            pass
+        self.send_to_overseer(SUBSCRIBED)
+        reply = self.receive_from_overseer()
+        logging.debug(reply)
 
     def deregister(self):
         logging.debug("{} deregistering with overseer".format(self.node_id))
@@ -75,10 +239,35 @@ class Node:
         reply = self.receive_from_overseer()
         logging.debug(reply)
 
+    # node_addresses are published once every node is subscribed; if they do not arrive within
+    # SECONDS_WITHOUT_NODE_ADDRESSES, ask the overseer for them instead
     def receive_node_addresses(self):
-        json_node_addresses = self.receive_subscription_message()
-        self.node_addresses = json.loads(json_node_addresses)
+        while True:
+            if self.overseer_subscribe_socket.poll(SECONDS_WITHOUT_NODE_ADDRESSES * 1000, zmq.POLLIN):
+                json_node_addresses = self.receive_subscription_message()
+                if json_node_addresses == SUBSCRIPTION_CHECK:
+                    continue
+            else:
+                self.send_to_overseer(GET_NODE_ADDRESSES)
+                json_node_addresses = self.receive_from_overseer()
+                if json_node_addresses == NODE_ADDRESSES_NOT_PUBLISHED:
+                    continue
+            self.set_node_addresses(json.loads(json_node_addresses))
+            return
+
+    def set_node_addresses(self, node_addresses):
+        self.node_addresses = node_addresses
         logging.debug("node_addresses received from overseer: {}".format(self.node_addresses))
+        if self.config.get(VECTOR_TIMESTAMP_IMPLEMENTATION) == INDEXED:
+            self.use_indexed_vector_timestamp(sorted(self.node_addresses))
+
+    # switch to an array-backed vector_timestamp; node_ids must be given in the same order
+    # on every node so that peers' clocks can be merged array-to-array
+    def use_indexed_vector_timestamp(self, node_ids):
+        indexed_vector_timestamp = IndexedVectorTimestamp(NodeIndex.get_shared(node_ids))
+        indexed_vector_timestamp.update_from_other(self.vector_timestamp)
+        self.vector_timestamp = indexed_vector_timestamp
+        logging.debug("Using indexed vector_timestamp over {} node_ids".format(len(node_ids)))
 
     def send_ready_to_start(self):
         message = READY_TO_START
@@ -92,6 +281,8 @@ class Node:
             message = self.receive_subscription_message()
             if message == START_SIMULATION:
                 continue_to_wait = False
+            elif message == SUBSCRIPTION_CHECK:
+                pass
             else:
                 logging.warning("received message: '" + message + "' while awaiting for simulation_start")
                 pass
@@ -105,14 +296,14 @@ class Node:
             return False
 
     def record_start_time(self):
-        self.simulation_start_time = datetime.now()
-        self.last_heartbeat_sent = datetime.now()
+        self.simulation_start_time = self.clock.now()
+        self.last_heartbeat_sent = self.clock.now()
 
     def get_start_time(self):
         return self.simulation_start_time
 
     def get_elapsed_time(self):
-        return (datetime.now() - self.simulation_start_time) * self.time_scaling_factor
+        return (self.clock.now() - self.simulation_start_time) * self.time_scaling_factor
 
     def get_simulation_time(self):
         elapsed_time = self.get_elapsed_time()
@@ -121,15 +312,74 @@ class Node:
         return sim_time
 
     def send_heartbeat_if_time(self):
-        current_time = datetime.now()
+        current_time = self.clock.now()
         time_since_last_heartbeat = current_time - self.last_heartbeat_sent
         if time_since_last_heartbeat.seconds > SECONDS_PER_HEARTBEAT:
             logging.info("Sending heartbeat to overseer")
+            start = perf_counter_ns()
             self.send_to_overseer(HEARTBEAT)
             reply = self.receive_from_overseer()
+            self.metrics.record(HEARTBEAT_ROUND_TRIP, perf_counter_ns() - start)
             self.last_heartbeat_sent = current_time
             logging.debug("Heartbeat response: {}".format(reply))
 
+    # the main loop shared by all node types:  each subclass implements prepare_simulation,
+    # handle_socket_events (returning False once stop_simulation is received), and
+    # run_periodic_tasks, which runs after every poll
+    def run_simulation(self):
+        logging.info("Starting simulation main loop")
+        self.prepare_simulation()
+        while True:
+            # poll sockets and handle incoming messages
+            start = perf_counter_ns()
+            try:
+                sockets = dict(self.poller.poll(700))  # poll timeout in milliseconds
+            except KeyboardInterrupt:
+                break
+            polled = perf_counter_ns()
+            self.metrics.record(POLL_WAIT, polled - start)
+
+            if not self.handle_socket_events(sockets):
+                break
+            handled = perf_counter_ns()
+            self.metrics.record(HANDLE_SOCKET_EVENTS, handled - polled)
+
+            self.run_periodic_tasks()
+            self.metrics.record(RUN_PERIODIC_TASKS, perf_counter_ns() - handled)
+            self.log_metrics_if_requested()
+
+        # shutdown procedures
+        self.shutdown()
+
+    def shutdown(self):
+        logging.info("Shutting down . . .")
+        self.log_metrics()
+        self.disconnect_from_peers()
+        self.shutdown_listeners()
+        self.deregister()
+        self.shutdown_zmq()
+
+    # counters and latency histograms recorded so far
+    def get_metrics(self):
+        return self.metrics.get_snapshot()
+
+    def log_metrics(self):
+        self.metrics.log_snapshot(self.node_id)
+
+    # log metrics from the main loop whenever the process receives SIGUSR1, e.g. kill -USR1 <pid>; only
+    # the main thread can install signal handlers, so the node scripts call this from main()
+    def log_metrics_on_signal(self):
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, self.request_metrics)
+
+    def request_metrics(self, signal_number, frame):
+        self.metrics_requested = True
+
+    def log_metrics_if_requested(self):
+        if self.metrics_requested:
+            self.metrics_requested = False
+            self.log_metrics()
+
     def post_log_to_s3(self, log_file):
         if LOG_POST_URL in self.config:
             logging.info("POSTing log file: {} to s3 . . .".format(log_file))
@@ -151,12 +401,19 @@ class Node:
                 return None
             return temp_socket.getsockname()[0]
 
-    @staticmethod
-    def archive_current_day(current_daily_disease_counts, previous_daily_disease_counts):
-        logging.debug("Archiving current daily disease counts: {}".format(current_daily_disease_counts))
-        previous_daily_disease_counts.append(current_daily_disease_counts)
-        logging.debug("previous_daily_disease_counts is now: {}".format(previous_daily_disease_counts))
+    # archived days' counts:  the last history_retention_days days in memory and, when the
+    # role_parameters set history_spill, older days in a <role>-<node_id>-history.ndjson file
+    def new_daily_count_history(self):
+        spill_file = None
+        if self.role_parameters.get(HISTORY_SPILL, False):
+            spill_file = "{}-{}{}{}".format(self.role, self.node_id, HISTORY_SPILL_SUFFIX, NDJSON_EXTENSION)
+        return DailyCountHistory(self.role_parameters.get(HISTORY_RETENTION_DAYS, DEFAULT_HISTORY_RETENTION_DAYS),
+                                 spill_file)
 
-    @staticmethod
-    def get_elapsed_days(previous_daily_disease_counts):
-        return len(previous_daily_disease_counts)
+    def archive_current_day(self, disease_counts, current_daily_disease_counts):
+        logging.debug("Archiving current daily disease counts: {}".format(disease_counts))
+        self.daily_count_history.append_day(disease_counts, current_daily_disease_counts[START_TIMESTAMP],
+                                            current_daily_disease_counts[END_TIMESTAMP])
+
+    def get_elapsed_days(self):
+        return self.daily_count_history.get_day_count()
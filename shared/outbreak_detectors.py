@@ -0,0 +1,216 @@
+# outbreak detectors for disease_outbreak_analyzers.
+#
+# a detector turns the archived days' totals into an alarm threshold for the current day:  the
+# threshold is recomputed once per day, when the previous day is archived, so checking each daily
+# count update is a single comparison of the running total against it.  The running total only
+# grows during a day, so once it crosses the day's threshold, the full day's total would as well.
+#
+# role_parameters choose the detector with 'outbreak_detection' and tune it with
+# 'outbreak_detection_parameters':
+#   threshold:   the fixed daily_outbreak_threshold (the default)
+#   ewma:        exponentially weighted mean and variance of past totals; alarm above
+#                mean + control_limit * standard deviation
+#   cusum:       one-sided CUSUM of past totals standardized against a rolling baseline_days window;
+#                alarm when today's total would push the sum above decision_interval
+#   farrington:  seasonal baseline of the totals around the same day in up to `seasons` previous
+#                season_days-long seasons; alarm above mean + z_score * sqrt(dispersion * mean)
+# until a detector has warmup_days of history, it falls back to daily_outbreak_threshold.  No
+# detector alarms below minimum_count.
+import math
+from collections import deque
+
+from shared.constants import *
+
+DEFAULT_BASELINE_DAYS = 7
+DEFAULT_CONTROL_LIMIT = 3.0
+DEFAULT_DECISION_INTERVAL = 4.0
+DEFAULT_MINIMUM_COUNT = 1
+DEFAULT_REFERENCE_VALUE = 0.5
+DEFAULT_SEASON_DAYS = 365
+DEFAULT_SEASONS = 3
+DEFAULT_SMOOTHING = 0.3
+DEFAULT_WARMUP_DAYS = 7
+DEFAULT_WINDOW_HALF_WIDTH = 3
+DEFAULT_Z_SCORE = 2.58
+# standard deviations (and farrington means) below this are raised to it, so a flat or empty
+# baseline does not alarm on one extra case
+MINIMUM_STANDARD_DEVIATION = 1.0
+
+
+# the smallest integer total above the upper limit, but never below minimum_count
+def get_alarm_threshold(upper_limit, minimum_count):
+    return max(math.floor(upper_limit) + 1, minimum_count)
+
+
+class ThresholdDetector:
+
+    def __init__(self, parameters, daily_outbreak_threshold):
+        self.daily_outbreak_threshold = daily_outbreak_threshold
+        self.threshold = daily_outbreak_threshold
+
+    # called once with the history the detector will be given, before the first day is archived
+    def check_history(self, daily_count_history):
+        pass
+
+    # called each time a day is archived, with the history that now ends with that day
+    def start_day(self, daily_count_history):
+        pass
+
+    def get_threshold(self):
+        return self.threshold
+
+    def is_outbreak(self, total):
+        return total >= self.threshold
+
+
+# detectors whose threshold comes from a baseline of the archived days' totals
+class BaselineDetector(ThresholdDetector):
+
+    def __init__(self, parameters, daily_outbreak_threshold):
+        super(BaselineDetector, self).__init__(parameters, daily_outbreak_threshold)
+        self.minimum_count = parameters.get(MINIMUM_COUNT, DEFAULT_MINIMUM_COUNT)
+        self.warmup_days = parameters.get(WARMUP_DAYS, DEFAULT_WARMUP_DAYS)
+
+    def start_day(self, daily_count_history):
+        self.update(daily_count_history)
+        if daily_count_history.get_day_count() < self.warmup_days:
+            self.threshold = self.daily_outbreak_threshold
+        else:
+            self.threshold = get_alarm_threshold(self.get_upper_limit(daily_count_history), self.minimum_count)
+
+    # fold the newest archived day into the detector's state
+    def update(self, daily_count_history):
+        pass
+
+    # the largest total that is not an outbreak
+    def get_upper_limit(self, daily_count_history):
+        raise NotImplementedError
+
+
+class EwmaDetector(BaselineDetector):
+
+    def __init__(self, parameters, daily_outbreak_threshold):
+        super(EwmaDetector, self).__init__(parameters, daily_outbreak_threshold)
+        self.smoothing = parameters.get(SMOOTHING, DEFAULT_SMOOTHING)
+        self.control_limit = parameters.get(CONTROL_LIMIT, DEFAULT_CONTROL_LIMIT)
+        if not 0 < self.smoothing <= 1:
+            raise ValueError("smoothing must be greater than 0 and at most 1!")
+        self.mean = None
+        self.variance = 0.0
+
+    def update(self, daily_count_history):
+        total = daily_count_history.get_recent_counts(TOTAL, 1)[0]
+        if self.mean is None:
+            self.mean = float(total)
+            return
+        difference = total - self.mean
+        self.mean = self.mean + self.smoothing * difference
+        self.variance = (1 - self.smoothing) * (self.variance + self.smoothing * difference * difference)
+
+    def get_upper_limit(self, daily_count_history):
+        standard_deviation = max(math.sqrt(self.variance), MINIMUM_STANDARD_DEVIATION)
+        return self.mean + self.control_limit * standard_deviation
+
+
+class CusumDetector(BaselineDetector):
+
+    def __init__(self, parameters, daily_outbreak_threshold):
+        super(CusumDetector, self).__init__(parameters, daily_outbreak_threshold)
+        self.reference_value = parameters.get(REFERENCE_VALUE, DEFAULT_REFERENCE_VALUE)
+        self.decision_interval = parameters.get(DECISION_INTERVAL, DEFAULT_DECISION_INTERVAL)
+        self.baseline = deque(maxlen=parameters.get(BASELINE_DAYS, DEFAULT_BASELINE_DAYS))
+        # running sums over the baseline window
+        self.baseline_sum = 0
+        self.baseline_sum_of_squares = 0
+        self.cumulative_sum = 0.0
+
+    def get_baseline(self):
+        count = len(self.baseline)
+        mean = self.baseline_sum / count
+        variance = max(self.baseline_sum_of_squares / count - mean * mean, 0.0)
+        return mean, max(math.sqrt(variance), MINIMUM_STANDARD_DEVIATION)
+
+    def update(self, daily_count_history):
+        total = daily_count_history.get_recent_counts(TOTAL, 1)[0]
+        # score the finished day against the baseline before it joins the baseline
+        if self.baseline:
+            mean, standard_deviation = self.get_baseline()
+            self.cumulative_sum = max(0.0, self.cumulative_sum + (total - mean) / standard_deviation
+                                      - self.reference_value)
+            if self.cumulative_sum > self.decision_interval:
+                self.cumulative_sum = 0.0
+        if len(self.baseline) == self.baseline.maxlen:
+            oldest = self.baseline[0]
+            self.baseline_sum = self.baseline_sum - oldest
+            self.baseline_sum_of_squares = self.baseline_sum_of_squares - oldest * oldest
+        self.baseline.append(total)
+        self.baseline_sum = self.baseline_sum + total
+        self.baseline_sum_of_squares = self.baseline_sum_of_squares + total * total
+
+    # today's total x alarms when cumulative_sum + (x - mean) / standard_deviation - reference_value
+    # exceeds decision_interval
+    def get_upper_limit(self, daily_count_history):
+        mean, standard_deviation = self.get_baseline()
+        return mean + standard_deviation * (self.decision_interval + self.reference_value - self.cumulative_sum)
+
+
+class FarringtonDetector(BaselineDetector):
+
+    def __init__(self, parameters, daily_outbreak_threshold):
+        super(FarringtonDetector, self).__init__(parameters, daily_outbreak_threshold)
+        self.season_days = parameters.get(SEASON_DAYS, DEFAULT_SEASON_DAYS)
+        self.seasons = parameters.get(SEASONS, DEFAULT_SEASONS)
+        self.window_half_width = parameters.get(WINDOW_HALF_WIDTH, DEFAULT_WINDOW_HALF_WIDTH)
+        self.z_score = parameters.get(Z_SCORE, DEFAULT_Z_SCORE)
+        if self.window_half_width >= self.season_days:
+            raise ValueError("window_half_width must be less than season_days!")
+        # warm up until at least one whole window a season ago has been archived
+        self.warmup_days = max(self.warmup_days, self.season_days + self.window_half_width)
+
+    # without the days a season ago, there are never any reference days, and the detector would
+    # silently stay on daily_outbreak_threshold forever
+    def check_history(self, daily_count_history):
+        if daily_count_history.spill_file is None \
+                and daily_count_history.retention_days < self.season_days + self.window_half_width:
+            raise ValueError("history_retention_days of {} cannot hold the farrington reference days of {} days ago; "
+                             "raise it to at least {} or turn on history_spill!"
+                             .format(daily_count_history.retention_days, self.season_days,
+                                     self.season_days + self.window_half_width))
+
+    # totals of the days around today in the previous seasons that the history still holds
+    def get_reference_totals(self, daily_count_history):
+        today = daily_count_history.get_day_count()
+        first_available_day = daily_count_history.get_first_available_day()
+        reference_totals = []
+        for season in range(1, self.seasons + 1):
+            first_day = today - season * self.season_days - self.window_half_width
+            last_day = today - season * self.season_days + self.window_half_width + 1
+            if first_day < first_available_day:
+                break
+            reference_totals.extend(daily_count_history.get_counts(TOTAL, first_day, last_day))
+        return reference_totals
+
+    def get_upper_limit(self, daily_count_history):
+        reference_totals = self.get_reference_totals(daily_count_history)
+        if len(reference_totals) < 2:
+            return self.daily_outbreak_threshold - 1
+        mean = sum(reference_totals) / len(reference_totals)
+        variance = sum((total - mean) ** 2 for total in reference_totals) / (len(reference_totals) - 1)
+        # quasi-Poisson:  variance = dispersion * mean, with dispersion at least 1
+        dispersion = max(variance / mean, 1.0) if mean > 0 else 1.0
+        return mean + self.z_score * math.sqrt(dispersion * max(mean, MINIMUM_STANDARD_DEVIATION))
+
+
+OUTBREAK_DETECTORS = {
+    THRESHOLD: ThresholdDetector,
+    EWMA: EwmaDetector,
+    CUSUM: CusumDetector,
+    FARRINGTON: FarringtonDetector,
+}
+
+
+def create_outbreak_detector(outbreak_detection, parameters, daily_outbreak_threshold):
+    detector_class = OUTBREAK_DETECTORS.get(outbreak_detection)
+    if detector_class is None:
+        raise ValueError("Unknown outbreak_detection: {}!".format(outbreak_detection))
+    return detector_class(parameters, daily_outbreak_threshold)
@@ -1,10 +1,13 @@
 # parent class for all runner classes
+import json
 import logging
 import os
 import signal
 import subprocess
 import sys
+import time
 from multiprocessing import Process
+from statistics import median
 
 import zmq
 
@@ -17,6 +20,8 @@ class Run:
         self.config = config
         self.node_id = SIMULATION_RUNNER
         self.processes = {}
+        # map of node_id => seconds from launching the node's process to its registration with the overseer
+        self.startup_latencies = {}
         self.context = None
         self.overseer_request_socket = None
 
@@ -63,6 +68,79 @@ class Run:
         self.processes[node_id] = Process(target=self.run_as_subprocess, args=(command_line,), name=node_id)
         self.processes[node_id].start()
 
+    # start command_line as a child process without waiting for it; like run_as_subprocess, the child
+    # ignores Ctrl-C, which the runner handles by sending stop_simulation to the overseer
+    def start_process(self, node_id, command_line):
+        logging.debug("Launching process with command_line: {}".format(command_line))
+        self.processes[node_id] = subprocess.Popen(command_line.split(' '), preexec_fn=ignore_interrupts)
+
+    def check_process(self, node_id, waiting_for):
+        return_code = self.processes[node_id].poll()
+        if return_code is not None:
+            raise RuntimeError("{} exited with code {} {}!".format(node_id, return_code, waiting_for))
+
+    # launch one process per simulation node, keeping at most max_starting of them between launch and
+    # registration with the overseer.  Returns once every node is registered; raises RuntimeError as
+    # soon as a node exits or goes SECONDS_WITHOUT_REGISTRATION without registering
+    def launch_nodes(self, command_lines, max_starting):
+        pending = list(command_lines.items())
+        launch_times = {}
+        start = time.perf_counter()
+        while len(self.startup_latencies) < len(command_lines):
+            while pending and len(launch_times) - len(self.startup_latencies) < max_starting:
+                node_id, command_line = pending.pop(0)
+                logging.info("Starting simulation node_id: {}".format(node_id))
+                self.start_process(node_id, command_line)
+                launch_times[node_id] = time.perf_counter()
+            registered_node_ids = self.request_registered_node_ids()
+            current_time = time.perf_counter()
+            for node_id, launch_time in launch_times.items():
+                if node_id in self.startup_latencies:
+                    continue
+                if node_id in registered_node_ids:
+                    self.startup_latencies[node_id] = current_time - launch_time
+                    logging.info("{} registered {:.2f} seconds after launch"
+                                 .format(node_id, self.startup_latencies[node_id]))
+                    continue
+                self.check_process(node_id, "before registering with the overseer")
+                if current_time - launch_time > SECONDS_WITHOUT_REGISTRATION:
+                    raise RuntimeError("{} did not register with the overseer within {} seconds!"
+                                       .format(node_id, SECONDS_WITHOUT_REGISTRATION))
+            if len(self.startup_latencies) < len(launch_times):
+                time.sleep(SECONDS_PER_REGISTRATION_CHECK)
+        self.log_startup_latencies(time.perf_counter() - start)
+
+    def request_registered_node_ids(self):
+        self.send_to_overseer(GET_REGISTERED_NODES)
+        while not self.overseer_request_socket.poll(int(SECONDS_PER_REGISTRATION_CHECK * 1000), zmq.POLLIN):
+            self.check_process(OVERSEER, "while nodes were starting")
+        return set(json.loads(self.receive_from_overseer()))
+
+    def log_startup_latencies(self, elapsed):
+        slowest_node_id = max(self.startup_latencies, key=self.startup_latencies.get)
+        logging.info("All {} nodes registered in {:.2f} seconds; startup latency median {:.2f} seconds, "
+                     "max {:.2f} seconds ({})"
+                     .format(len(self.startup_latencies), elapsed, median(self.startup_latencies.values()),
+                             self.startup_latencies[slowest_node_id], slowest_node_id))
+
+    # log the processes that failed since the last call; returns their node_ids
+    def report_failed_processes(self, reported_node_ids):
+        failed_node_ids = [node_id for node_id, process in self.processes.items()
+                           if node_id not in reported_node_ids and process.poll()]
+        for node_id in failed_node_ids:
+            logging.error("{} exited with code {} while the simulation was running!"
+                          .format(node_id, self.processes[node_id].returncode))
+        return failed_node_ids
+
+    def terminate_processes(self):
+        for process in self.processes.values():
+            if process.poll() is None:
+                process.terminate()
+        for process in self.processes.values():
+            process.wait()
+        self.overseer_request_socket.close(linger=0)
+        self.context.term()
+
     def connect_to_overseer(self):
         logging.debug("connecting to overseer . . .")
         self.context = zmq.Context()
@@ -84,3 +162,7 @@ class Run:
             reply = encoded_reply.decode()
             if self.node_id == destination_node_id:
                 return reply
+
+
+def ignore_interrupts():
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
@@ -1,30 +1,231 @@
 # implement a simple vector clock
+import hashlib
+import json
+import weakref
 
+import numpy
 
+# element type of IndexedVectorTimestamp counts:  little-endian unsigned 32-bit integers (the width
+# of counters in the binary wire protocol), so that the bytes of a counts array mean the same on every host
+COUNT_DTYPE = numpy.dtype('<u4')
+
+
+# every clock numbers its changes with change_count, and remembers the change_count at which each
+# entry last changed, so that a delta encoder only needs to keep get_change_count() of its last send
+# to find the entries changed since (changed_since)
 class VectorTimestamp:
 
     def __init__(self):
         self.vector_timestamp = {}
+        # node_id => change_count of the entry's last change, least recently changed first, so the
+        # entries changed after any change_count are at the end
+        self.changes = {}
+        self.change_count = 0
+
+    def record_change(self, node_id):
+        self.change_count = self.change_count + 1
+        self.changes.pop(node_id, None)
+        self.changes[node_id] = self.change_count
 
-    def increment_count(self, node_id):
+    # amount counts several events of node_id at once, e.g. every disease that occurred in one tick
+    def increment_count(self, node_id, amount=1):
         if node_id in self.vector_timestamp:
-            self.vector_timestamp[node_id] = self.vector_timestamp[node_id] + 1
+            self.vector_timestamp[node_id] = self.vector_timestamp[node_id] + amount
         else:
-            self.vector_timestamp[node_id] = 1
+            self.vector_timestamp[node_id] = amount
+        self.record_change(node_id)
 
     def update_from_other(self, other_vector_timestamp):
-        # iterate through the other_vector_timestamp
+        # iterate through the other_vector_timestamp, keeping the max of the two counts
         for node_id, other_count in other_vector_timestamp.items():
-            # if vector_timestamp has the node_id, use the max of the two counts
-            if node_id in self.vector_timestamp:
-                my_count = self.vector_timestamp[node_id]
-                max_count = max(my_count, other_count)
-                self.vector_timestamp[node_id] = max_count
-            else:  # otherwise, copy the other_count into vector_timestamp
+            if other_count > self.vector_timestamp.get(node_id, 0):
                 self.vector_timestamp[node_id] = other_count
+                self.record_change(node_id)
 
     def items(self):
         return self.vector_timestamp.items()
 
+    def get_change_count(self):
+        return self.change_count
+
+    # the entries that changed after change_count; visits only those entries
+    def changed_since(self, change_count):
+        entries = {}
+        for node_id, changed_at in reversed(self.changes.items()):
+            if changed_at <= change_count:
+                break
+            entries[node_id] = self.vector_timestamp[node_id]
+        return entries
+
+    # an independent clock with the same counts, e.g. to log this moment's clock later
+    def copy(self):
+        vector_timestamp = VectorTimestamp()
+        vector_timestamp.vector_timestamp = dict(self.vector_timestamp)
+        return vector_timestamp
+
+    # only the counts travel; the change history stays with the sender's clock
+    def __getstate__(self):
+        return {'vector_timestamp': self.vector_timestamp}
+
+    def __setstate__(self, state):
+        self.vector_timestamp = state['vector_timestamp']
+        self.changes = {}
+        self.change_count = 0
+
     def __repr__(self):
         return str(self.vector_timestamp)
+
+
+# assigns each node_id of a node list a dense integer index.  Every node builds its NodeIndex from
+# the same sorted node list, so the list's fingerprint (a digest that is the same in every process)
+# is all a clock needs to send to tell its receiver how its counts line up.  A NodeIndex never
+# changes once built; node_ids outside the list are counted separately by each clock.
+class NodeIndex:
+
+    # shared node indexes by fingerprint; an entry goes away with the last clock that uses it
+    registry = weakref.WeakValueDictionary()
+
+    def __init__(self, node_ids):
+        self.node_ids = tuple(node_ids)
+        self.indexes = {node_id: index for index, node_id in enumerate(self.node_ids)}
+        digest = hashlib.blake2b(json.dumps(self.node_ids).encode(), digest_size=8).digest()
+        self.fingerprint = int.from_bytes(digest, 'big')
+
+    # the node index of node_ids, shared with every clock of this process that uses the same node list
+    @staticmethod
+    def get_shared(node_ids):
+        node_index = NodeIndex(node_ids)
+        shared_node_index = NodeIndex.registry.get(node_index.fingerprint)
+        if shared_node_index is not None and shared_node_index.node_ids == node_index.node_ids:
+            return shared_node_index
+        NodeIndex.registry[node_index.fingerprint] = node_index
+        return node_index
+
+    @staticmethod
+    def get_registered(fingerprint):
+        node_index = NodeIndex.registry.get(fingerprint)
+        if node_index is None:
+            raise KeyError("No node list with fingerprint {:016x} is shared in this process!".format(fingerprint))
+        return node_index
+
+    def __len__(self):
+        return len(self.node_ids)
+
+
+def _restore_indexed_vector_timestamp(fingerprint, counts, other_counts):
+    return IndexedVectorTimestamp.from_counts(NodeIndex.get_registered(fingerprint), counts, other_counts)
+
+
+# vector clock stored as a numpy array of counts indexed by a shared NodeIndex, plus a dict for
+# node_ids outside the node list (e.g. the simulation runner); merging two clocks built on the same
+# node list is an element-wise numpy.maximum over the arrays.  Changes are numbered like
+# VectorTimestamp's, but a merge does not work out which entries it changed:  when a delta encoder
+# asks, once per send, the entries that differ from the counts at the previous fold are stamped with
+# the current change_count
+class IndexedVectorTimestamp:
+
+    def __init__(self, node_index):
+        self.node_index = node_index
+        self.counts = numpy.zeros(len(node_index), dtype=COUNT_DTYPE)
+        self.other_counts = {}
+        self.reset_changes()
+
+    def reset_changes(self):
+        self.change_count = 0
+        self.other_changes = {}
+        # created by the first fold, so clocks that are only received or merged never need them
+        self.folded_counts = None
+        self.changed_at = None
+        self.folded_change_count = 0
+
+    # stamp the entries changed since the last fold with the current change_count
+    def fold_changes(self):
+        if self.changed_at is None:
+            self.folded_counts = numpy.zeros_like(self.counts)
+            self.changed_at = numpy.zeros(len(self.counts), dtype=numpy.uint64)
+        elif self.folded_change_count == self.change_count:
+            return
+        changed = self.counts != self.folded_counts
+        self.changed_at[changed] = self.change_count
+        numpy.copyto(self.folded_counts, self.counts)
+        self.folded_change_count = self.change_count
+
+    # counts is the bytes of a counts array, as sent by __reduce__
+    @staticmethod
+    def from_counts(node_index, counts, other_counts=None):
+        vector_timestamp = IndexedVectorTimestamp.__new__(IndexedVectorTimestamp)
+        vector_timestamp.node_index = node_index
+        vector_timestamp.counts = numpy.frombuffer(counts, dtype=COUNT_DTYPE).copy()
+        if len(vector_timestamp.counts) != len(node_index):
+            raise ValueError("Expected {} counts but received {}!".format(len(node_index),
+                                                                          len(vector_timestamp.counts)))
+        vector_timestamp.other_counts = dict(other_counts) if other_counts else {}
+        vector_timestamp.reset_changes()
+        return vector_timestamp
+
+    def increment_count(self, node_id, amount=1):
+        self.change_count = self.change_count + 1
+        index = self.node_index.indexes.get(node_id)
+        if index is None:
+            self.other_counts[node_id] = self.other_counts.get(node_id, 0) + amount
+            self.other_changes[node_id] = self.change_count
+        else:
+            self.counts[index] += amount
+
+    def update_from_other(self, other_vector_timestamp):
+        if isinstance(other_vector_timestamp, IndexedVectorTimestamp) \
+                and other_vector_timestamp.node_index.fingerprint == self.node_index.fingerprint:
+            numpy.maximum(self.counts, other_vector_timestamp.counts, out=self.counts)
+            self.change_count = self.change_count + 1
+            other_entries = other_vector_timestamp.other_counts.items()
+        else:
+            # different node lists:  merge entry by entry
+            other_entries = other_vector_timestamp.items()
+        indexes = self.node_index.indexes
+        for node_id, other_count in other_entries:
+            index = indexes.get(node_id)
+            if index is None:
+                if other_count > self.other_counts.get(node_id, 0):
+                    self.change_count = self.change_count + 1
+                    self.other_counts[node_id] = other_count
+                    self.other_changes[node_id] = self.change_count
+            elif other_count > self.counts[index]:
+                self.change_count = self.change_count + 1
+                self.counts[index] = other_count
+
+    def items(self):
+        node_ids = self.node_index.node_ids
+        entries = [(node_ids[index], int(self.counts[index])) for index in numpy.flatnonzero(self.counts)]
+        entries.extend(self.other_counts.items())
+        return entries
+
+    def get_change_count(self):
+        self.fold_changes()
+        return self.change_count
+
+    # the entries that changed after change_count
+    def changed_since(self, change_count):
+        self.fold_changes()
+        node_ids = self.node_index.node_ids
+        entries = {node_ids[index]: int(self.counts[index])
+                   for index in numpy.flatnonzero(self.changed_at > change_count)}
+        for node_id, changed_at in self.other_changes.items():
+            if changed_at > change_count:
+                entries[node_id] = self.other_counts[node_id]
+        return entries
+
+    def copy(self):
+        vector_timestamp = IndexedVectorTimestamp.__new__(IndexedVectorTimestamp)
+        vector_timestamp.node_index = self.node_index
+        vector_timestamp.counts = self.counts.copy()
+        vector_timestamp.other_counts = dict(self.other_counts)
+        vector_timestamp.reset_changes()
+        return vector_timestamp
+
+    # only the node list's fingerprint travels with the counts; the receiver shares the same node list
+    def __reduce__(self):
+        return _restore_indexed_vector_timestamp, (self.node_index.fingerprint, self.counts.tobytes(),
+                                                   self.other_counts or None)
+
+    def __repr__(self):
+        return str(dict(self.items()))
@@ -0,0 +1,70 @@
+# per-link delta encoding of vector timestamps
+#
+# instead of the whole vector_timestamp, a sender transmits only the entries whose counts
+# changed since the last message it sent on the same link, plus a full snapshot every
+# full_snapshot_interval messages so that late subscribers and receivers that missed
+# messages can resynchronize.  Entries carry absolute counts, so merging a delta into a
+# vector_timestamp is always safe, even after a gap.
+import logging
+
+
+class VectorTimestampDelta:
+
+    def __init__(self, sequence_number, is_full_snapshot, entries):
+        self.sequence_number = sequence_number
+        self.is_full_snapshot = is_full_snapshot
+        self.entries = entries
+
+    def items(self):
+        return self.entries.items()
+
+    def __repr__(self):
+        return "{}{} {}".format("full#" if self.is_full_snapshot else "delta#", self.sequence_number, self.entries)
+
+
+class VectorTimestampDeltaEncoder:
+
+    def __init__(self, full_snapshot_interval):
+        self.full_snapshot_interval = full_snapshot_interval
+        self.next_sequence_number = 0
+        # the clock of the last message and its change_count then:  a delta is the entries it changed since
+        self.last_vector_timestamp = None
+        self.last_change_count = 0
+
+    def encode(self, vector_timestamp):
+        sequence_number = self.next_sequence_number
+        self.next_sequence_number = self.next_sequence_number + 1
+        # a node that replaces its clock (e.g. with an indexed one) starts over with a full snapshot
+        is_full_snapshot = (sequence_number % self.full_snapshot_interval) == 0 \
+            or vector_timestamp is not self.last_vector_timestamp
+        if is_full_snapshot:
+            entries = dict(vector_timestamp.items())
+        else:
+            entries = vector_timestamp.changed_since(self.last_change_count)
+        self.last_vector_timestamp = vector_timestamp
+        self.last_change_count = vector_timestamp.get_change_count()
+        return VectorTimestampDelta(sequence_number, is_full_snapshot, entries)
+
+
+class VectorTimestampDeltaDecoder:
+
+    def __init__(self, link_id):
+        self.link_id = link_id
+        self.expected_sequence_number = None
+        self.synchronized = False
+        self.gap_count = 0
+
+    # merge the delta into vector_timestamp; only the changed entries are visited
+    def apply(self, delta, vector_timestamp):
+        if delta.is_full_snapshot:
+            self.synchronized = True
+        else:
+            if delta.sequence_number != self.expected_sequence_number:
+                if self.synchronized:
+                    self.gap_count = self.gap_count + 1
+                    logging.warning("vector_timestamp delta gap on link {}: expected #{} but received #{}; "
+                                    "waiting for the next full snapshot"
+                                    .format(self.link_id, self.expected_sequence_number, delta.sequence_number))
+                self.synchronized = False
+        self.expected_sequence_number = delta.sequence_number + 1
+        vector_timestamp.update_from_other(delta)
@@ -0,0 +1,325 @@
+# compact, versioned binary encoding for the messages exchanged between simulation nodes
+#
+# every message starts with a fixed header:
+#   magic (2 bytes) | version (1 byte) | message type id (1 byte) | flags (1 byte)
+# followed by a body whose layout is fixed per message type.  Diseases are sent as their
+# index in the config's disease list, node_ids as length-prefixed UTF-8 strings, datetimes
+# as float64 POSIX timestamps, and counters as unsigned 32-bit integers (network byte order).
+# The body ends with either the full vector_timestamp or a per-link vector_timestamp delta.  An
+# IndexedVectorTimestamp is sent as its node list's fingerprint and its array of counts.
+import struct
+from datetime import datetime
+
+from shared.constants import *
+from shared.vector_timestamp import COUNT_DTYPE, IndexedVectorTimestamp, NodeIndex, VectorTimestamp
+from shared.vector_timestamp_delta import VectorTimestampDelta
+
+MAGIC = b'SD'
+VERSION = 1
+
+# message type ids
+MESSAGE_TYPE_IDS = {
+    DISEASE_NOTIFICATION: 1,
+    DISEASE_NOTIFICATION_BATCH: 2,
+    DISEASE_NOTIFICATION_REPLY: 3,
+    OUTBREAK_QUERY: 4,
+    OUTBREAK_QUERY_REPLY: 5,
+    DAILY_DISEASE_COUNT: 6,
+    DISEASE_OUTBREAK_ALERT: 7,
+    DAILY_DISEASE_COUNT_DELTA: 8,
+}
+MESSAGE_TYPES = {message_type_id: message_type for message_type, message_type_id in MESSAGE_TYPE_IDS.items()}
+
+# header flags for optional fields
+HAS_SEQUENCE_NUMBER = 0x01
+HAS_START_TIMESTAMP = 0x02
+HAS_END_TIMESTAMP = 0x04
+HAS_VECTOR_TIMESTAMP_DELTA = 0x08
+IS_FULL_SNAPSHOT = 0x10
+# a daily disease count that carries the count of one disease only (disease_topics publishing)
+HAS_SINGLE_DISEASE = 0x20
+# a daily disease count delta that holds every count rather than only the changed ones
+IS_FULL_COUNT_SNAPSHOT = 0x40
+# the vector_timestamp is an IndexedVectorTimestamp:  fingerprint, counts array, then the other entries
+HAS_INDEXED_VECTOR_TIMESTAMP = 0x80
+
+HEADER = struct.Struct('!2sBBB')
+UINT16 = struct.Struct('!H')
+UINT32 = struct.Struct('!I')
+UINT64 = struct.Struct('!Q')
+FLOAT64 = struct.Struct('!d')
+DISEASE_COUNT = struct.Struct('!HI')
+
+
+class _Writer:
+
+    def __init__(self):
+        self.parts = []
+
+    def uint16(self, value):
+        self.parts.append(UINT16.pack(value))
+
+    def uint32(self, value):
+        self.parts.append(UINT32.pack(value))
+
+    def timestamp(self, value):
+        self.parts.append(FLOAT64.pack(value.timestamp()))
+
+    def string(self, value):
+        encoded = value.encode()
+        self.parts.append(UINT16.pack(len(encoded)))
+        self.parts.append(encoded)
+
+    def vector_timestamp(self, vector_timestamp):
+        entries = list(vector_timestamp.items())
+        self.uint16(len(entries))
+        for node_id, count in entries:
+            self.string(node_id)
+            self.uint32(count)
+
+    def vector_timestamp_delta(self, vector_timestamp_delta):
+        self.uint32(vector_timestamp_delta.sequence_number)
+        self.vector_timestamp(vector_timestamp_delta)
+
+    # the counts array is sent as is (little-endian)
+    def indexed_vector_timestamp(self, vector_timestamp):
+        self.parts.append(UINT64.pack(vector_timestamp.node_index.fingerprint))
+        self.uint32(len(vector_timestamp.counts))
+        self.parts.append(vector_timestamp.counts.tobytes())
+        self.uint16(len(vector_timestamp.other_counts))
+        for node_id, count in vector_timestamp.other_counts.items():
+            self.string(node_id)
+            self.uint32(count)
+
+    def getvalue(self):
+        return b''.join(self.parts)
+
+
+class _Reader:
+
+    def __init__(self, data, offset):
+        self.data = data
+        self.length = len(data)
+        self.offset = offset
+
+    # a truncated message raises ValueError, like a bad header, rather than struct.error; the checks
+    # stay off the per-field path, since vector_timestamp entries are read one field at a time
+    def truncated(self):
+        raise ValueError("Message of {} bytes is truncated at offset {}!".format(self.length, self.offset))
+
+    def unpack(self, layout):
+        try:
+            values = layout.unpack_from(self.data, self.offset)
+        except struct.error:
+            self.truncated()
+        self.offset = self.offset + layout.size
+        return values
+
+    def uint16(self):
+        return self.unpack(UINT16)[0]
+
+    def uint32(self):
+        return self.unpack(UINT32)[0]
+
+    def timestamp(self):
+        return datetime.fromtimestamp(self.unpack(FLOAT64)[0])
+
+    def string(self):
+        length = self.uint16()
+        end = self.offset + length
+        if end > self.length:
+            self.truncated()
+        value = bytes(self.data[self.offset:end]).decode()
+        self.offset = end
+        return value
+
+    def entries(self):
+        entries = {}
+        for _ in range(self.uint16()):
+            node_id = self.string()
+            entries[node_id] = self.uint32()
+        return entries
+
+    def vector_timestamp(self):
+        vector_timestamp = VectorTimestamp()
+        vector_timestamp.vector_timestamp = self.entries()
+        return vector_timestamp
+
+    def vector_timestamp_delta(self, is_full_snapshot):
+        sequence_number = self.uint32()
+        return VectorTimestampDelta(sequence_number, is_full_snapshot, self.entries())
+
+    def indexed_vector_timestamp(self):
+        node_index = NodeIndex.get_registered(self.unpack(UINT64)[0])
+        length = self.uint32() * COUNT_DTYPE.itemsize
+        end = self.offset + length
+        if end > self.length:
+            self.truncated()
+        counts = self.data[self.offset:end]
+        self.offset = end
+        return IndexedVectorTimestamp.from_counts(node_index, counts, self.entries())
+
+
+class WireCodec:
+
+    def __init__(self, diseases):
+        self.diseases = list(diseases)
+        self.disease_ids = {disease: disease_id for disease_id, disease in enumerate(self.diseases)}
+
+    def get_disease(self, disease_id):
+        if disease_id >= len(self.diseases):
+            raise ValueError("Unknown disease id {}! Cannot decode message!".format(disease_id))
+        return self.diseases[disease_id]
+
+    def encode(self, message):
+        message_type = message[MESSAGE_TYPE]
+        if message_type not in MESSAGE_TYPE_IDS:
+            raise TypeError("Unknown message_type {}! Cannot encode message!".format(message_type))
+        flags = 0
+        if SEQUENCE_NUMBER in message:
+            flags = flags | HAS_SEQUENCE_NUMBER
+        if message.get(START_TIMESTAMP) is not None:
+            flags = flags | HAS_START_TIMESTAMP
+        if message.get(END_TIMESTAMP) is not None:
+            flags = flags | HAS_END_TIMESTAMP
+        if VECTOR_TIMESTAMP_DELTA in message:
+            flags = flags | HAS_VECTOR_TIMESTAMP_DELTA
+            if message[VECTOR_TIMESTAMP_DELTA].is_full_snapshot:
+                flags = flags | IS_FULL_SNAPSHOT
+        elif isinstance(message[VECTOR_TIMESTAMP], IndexedVectorTimestamp):
+            flags = flags | HAS_INDEXED_VECTOR_TIMESTAMP
+        if message_type == DAILY_DISEASE_COUNT and DISEASE in message:
+            flags = flags | HAS_SINGLE_DISEASE
+        if message_type == DAILY_DISEASE_COUNT_DELTA and message[FULL_SNAPSHOT]:
+            flags = flags | IS_FULL_COUNT_SNAPSHOT
+
+        writer = _Writer()
+        writer.parts.append(HEADER.pack(MAGIC, VERSION, MESSAGE_TYPE_IDS[message_type], flags))
+        if flags & HAS_SEQUENCE_NUMBER:
+            writer.uint32(message[SEQUENCE_NUMBER])
+
+        if message_type == DISEASE_NOTIFICATION:
+            writer.string(message[ELECTRONIC_MEDICAL_RECORD_ID])
+            writer.uint16(self.disease_ids[message[DISEASE]])
+            writer.timestamp(message[LOCAL_TIMESTAMP])
+        elif message_type == DISEASE_NOTIFICATION_BATCH:
+            writer.string(message[ELECTRONIC_MEDICAL_RECORD_ID])
+            writer.timestamp(message[LOCAL_TIMESTAMP])
+            disease_counts = message[DISEASE_COUNTS]
+            writer.uint16(len(disease_counts))
+            for disease, count in disease_counts.items():
+                writer.parts.append(DISEASE_COUNT.pack(self.disease_ids[disease], count))
+        elif message_type == OUTBREAK_QUERY:
+            writer.string(message[ELECTRONIC_MEDICAL_RECORD_ID])
+        elif message_type == OUTBREAK_QUERY_REPLY:
+            outbreaks = message[OUTBREAKS]
+            writer.uint16(len(outbreaks))
+            for disease in outbreaks:
+                writer.uint16(self.disease_ids[disease])
+        elif message_type == DAILY_DISEASE_COUNT:
+            writer.string(message[HEALTH_DISTRICT_SYSTEM_ID])
+            if flags & HAS_SINGLE_DISEASE:
+                writer.uint16(self.disease_ids[message[DISEASE]])
+                writer.uint32(message[message[DISEASE]])
+            else:
+                # counts for every configured disease, in config order
+                for disease in self.diseases:
+                    writer.uint32(message[disease])
+            if flags & HAS_START_TIMESTAMP:
+                writer.timestamp(message[START_TIMESTAMP])
+            if flags & HAS_END_TIMESTAMP:
+                writer.timestamp(message[END_TIMESTAMP])
+        elif message_type == DISEASE_OUTBREAK_ALERT:
+            writer.uint16(self.disease_ids[message[DISEASE]])
+        elif message_type == DAILY_DISEASE_COUNT_DELTA:
+            writer.string(message[HEALTH_DISTRICT_SYSTEM_ID])
+            disease_counts = message[DISEASE_COUNTS]
+            writer.uint16(len(disease_counts))
+            for disease, count in disease_counts.items():
+                writer.parts.append(DISEASE_COUNT.pack(self.disease_ids[disease], count))
+            if flags & HAS_START_TIMESTAMP:
+                writer.timestamp(message[START_TIMESTAMP])
+            if flags & HAS_END_TIMESTAMP:
+                writer.timestamp(message[END_TIMESTAMP])
+        # DISEASE_NOTIFICATION_REPLY has no body besides the vector_timestamp
+
+        if flags & HAS_VECTOR_TIMESTAMP_DELTA:
+            writer.vector_timestamp_delta(message[VECTOR_TIMESTAMP_DELTA])
+        elif flags & HAS_INDEXED_VECTOR_TIMESTAMP:
+            writer.indexed_vector_timestamp(message[VECTOR_TIMESTAMP])
+        else:
+            writer.vector_timestamp(message[VECTOR_TIMESTAMP])
+        return writer.getvalue()
+
+    def decode(self, data):
+        if len(data) < HEADER.size:
+            raise ValueError("Message of {} bytes is too short for a header!".format(len(data)))
+        magic, version, message_type_id, flags = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError("Message does not start with the wire protocol magic bytes!")
+        if version != VERSION:
+            raise ValueError("Unsupported wire protocol version {}!".format(version))
+        if message_type_id not in MESSAGE_TYPES:
+            raise TypeError("Unknown message type id {}! Cannot decode message!".format(message_type_id))
+        message_type = MESSAGE_TYPES[message_type_id]
+
+        reader = _Reader(data, HEADER.size)
+        message = {MESSAGE_TYPE: message_type}
+        if flags & HAS_SEQUENCE_NUMBER:
+            message[SEQUENCE_NUMBER] = reader.uint32()
+
+        if message_type == DISEASE_NOTIFICATION:
+            message[ELECTRONIC_MEDICAL_RECORD_ID] = reader.string()
+            message[DISEASE] = self.get_disease(reader.uint16())
+            message[LOCAL_TIMESTAMP] = reader.timestamp()
+        elif message_type == DISEASE_NOTIFICATION_BATCH:
+            message[ELECTRONIC_MEDICAL_RECORD_ID] = reader.string()
+            message[LOCAL_TIMESTAMP] = reader.timestamp()
+            disease_counts = {}
+            for _ in range(reader.uint16()):
+                disease_id, count = reader.unpack(DISEASE_COUNT)
+                disease_counts[self.get_disease(disease_id)] = count
+            message[DISEASE_COUNTS] = disease_counts
+        elif message_type == DISEASE_NOTIFICATION_REPLY:
+            message[STATUS] = RECEIVED
+        elif message_type == OUTBREAK_QUERY:
+            message[ELECTRONIC_MEDICAL_RECORD_ID] = reader.string()
+        elif message_type == OUTBREAK_QUERY_REPLY:
+            message[OUTBREAKS] = {self.get_disease(reader.uint16()) for _ in range(reader.uint16())}
+        elif message_type == DAILY_DISEASE_COUNT:
+            message[HEALTH_DISTRICT_SYSTEM_ID] = reader.string()
+            if flags & HAS_SINGLE_DISEASE:
+                disease = self.get_disease(reader.uint16())
+                message[DISEASE] = disease
+                message[disease] = reader.uint32()
+            else:
+                for disease in self.diseases:
+                    message[disease] = reader.uint32()
+            if flags & HAS_START_TIMESTAMP:
+                message[START_TIMESTAMP] = reader.timestamp()
+            if flags & HAS_END_TIMESTAMP:
+                message[END_TIMESTAMP] = reader.timestamp()
+        elif message_type == DISEASE_OUTBREAK_ALERT:
+            message[DISEASE] = self.get_disease(reader.uint16())
+        elif message_type == DAILY_DISEASE_COUNT_DELTA:
+            message[HEALTH_DISTRICT_SYSTEM_ID] = reader.string()
+            message[FULL_SNAPSHOT] = bool(flags & IS_FULL_COUNT_SNAPSHOT)
+            disease_counts = {}
+            for _ in range(reader.uint16()):
+                disease_id, count = reader.unpack(DISEASE_COUNT)
+                disease_counts[self.get_disease(disease_id)] = count
+            message[DISEASE_COUNTS] = disease_counts
+            if flags & HAS_START_TIMESTAMP:
+                message[START_TIMESTAMP] = reader.timestamp()
+            if flags & HAS_END_TIMESTAMP:
+                message[END_TIMESTAMP] = reader.timestamp()
+
+        if flags & HAS_VECTOR_TIMESTAMP_DELTA:
+            message[VECTOR_TIMESTAMP_DELTA] = reader.vector_timestamp_delta(bool(flags & IS_FULL_SNAPSHOT))
+        elif flags & HAS_INDEXED_VECTOR_TIMESTAMP:
+            message[VECTOR_TIMESTAMP] = reader.indexed_vector_timestamp()
+        else:
+            message[VECTOR_TIMESTAMP] = reader.vector_timestamp()
+        if reader.offset != len(data):
+            raise ValueError("Message has {} bytes after its last field!".format(len(data) - reader.offset))
+        return message
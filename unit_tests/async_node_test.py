@@ -0,0 +1,84 @@
+# unit tests for async_node
+
+import asyncio
+import unittest
+from datetime import timedelta
+
+import zmq
+
+from shared.async_node import AsyncNode
+from shared.constants import *
+
+
+class AsyncNodeTest(unittest.TestCase):
+
+    def get_node_config(self):
+        return {
+            OVERSEER_HOST: '127.0.0.1',
+            OVERSEER_REPLY_PORT: 9001,
+            OVERSEER_PUBLISH_PORT: 9091,
+            TIME_SCALING_FACTOR: 1800,
+            DISEASES: ['cooties'],
+            NODE_ID: "Node_A",
+            ROLE: HEALTH_DISTRICT_SYSTEM,
+            ROLE_PARAMETERS: {}}
+
+    def test_get_seconds_for_hours(self):
+        node = AsyncNode(self.get_node_config())
+        self.assertEqual(node.get_seconds_for_hours(2), 4.0)
+        node.shutdown_zmq()
+
+    def test_get_seconds_until_day(self):
+        node = AsyncNode(self.get_node_config())
+        node.record_start_time()
+        # half a simulated day at 1800x is 24 real seconds
+        node.simulation_start_time = node.simulation_start_time - timedelta(seconds=SECONDS_PER_DAY / 2 / 1800)
+        self.assertAlmostEqual(node.get_seconds_until_day(1), 24.0, places=1)
+        self.assertEqual(node.get_seconds_until_day(0), 0.0)
+        node.shutdown_zmq()
+
+    def test_stopped_within(self):
+        node = AsyncNode(self.get_node_config())
+
+        async def check_stop():
+            node.stop_event = asyncio.Event()
+            self.assertFalse(await node.stopped_within(0.01))
+            node.stop_event.set()
+            self.assertTrue(await node.stopped_within(10))
+
+        asyncio.run(check_stop())
+        node.shutdown_zmq()
+
+    def test_requested_metrics_are_logged_once(self):
+        node = AsyncNode(self.get_node_config())
+        node.request_metrics(None, None)
+        self.assertTrue(node.metrics_requested)
+        with self.assertLogs(level='INFO'):
+            node.log_metrics_if_requested()
+        self.assertFalse(node.metrics_requested)
+        with self.assertNoLogs(level='INFO'):
+            node.log_metrics_if_requested()
+        node.shutdown_zmq()
+
+    def test_send_frames_are_flushed(self):
+        node = AsyncNode(self.get_node_config())
+
+        async def send_and_receive():
+            receiver = node.context.socket(zmq.PULL)
+            receiver.bind('inproc://send_frames')
+            sender = node.context.socket(zmq.PUSH)
+            sender.connect('inproc://send_frames')
+            # a synchronous helper's send:  nothing to await, but the future is kept until it is done
+            node.send_frames(sender, [b'topic', b'payload'])
+            await node.flush_sends()
+            self.assertEqual(node.pending_sends, set())
+            self.assertEqual(await receiver.recv_multipart(), [b'topic', b'payload'])
+            sender.close(linger=0)
+            receiver.close(linger=0)
+
+        asyncio.run(send_and_receive())
+        node.shutdown_zmq()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+# unit tests for the bounded daily count history
+
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from shared.constants import *
+from shared.daily_count_history import DailyCountHistory
+
+START = datetime(2018, 3, 1)
+
+
+class DailyCountHistoryTest(unittest.TestCase):
+
+    def append_days(self, history, day_count):
+        for day in range(day_count):
+            start = START + timedelta(days=day)
+            history.append_day({'cooties': day, 'flu': 2 * day}, start, start + timedelta(days=1))
+
+    def get_spill_file(self):
+        folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, folder)
+        return os.path.join(folder, 'history.ndjson')
+
+    def test_keeps_only_the_retention_window_in_memory(self):
+        history = DailyCountHistory(retention_days=7)
+        self.append_days(history, 30)
+        self.assertEqual(history.get_day_count(), 30)
+        self.assertEqual(len(history.columns['cooties']), 7)
+        self.assertEqual(len(history.start_timestamps), 7)
+        self.assertEqual(list(history.get_recent_counts('cooties', 3)), [27, 28, 29])
+        self.assertEqual(list(history.get_recent_counts('flu', 100)), [46, 48, 50, 52, 54, 56, 58])
+        with self.assertRaises(KeyError):
+            history.get_counts('cooties', 0, 30)
+
+    def test_series_added_later_count_zero_before(self):
+        history = DailyCountHistory()
+        self.append_days(history, 2)
+        history.append_day({'measles': 5}, START, START)
+        self.assertEqual(list(history.get_counts('measles', 0, 3)), [0, 0, 5])
+        self.assertEqual(list(history.get_counts('cooties', 0, 3)), [0, 1, 0])
+        self.assertEqual(list(history.get_counts('unknown', 1, 3)), [0, 0])
+
+    def test_spilled_days_are_read_back(self):
+        history = DailyCountHistory(retention_days=5, spill_file=self.get_spill_file())
+        self.append_days(history, 12)
+        self.assertEqual(len(history.columns['cooties']), 5)
+        self.assertEqual(list(history.get_counts('cooties', 0, 12)), list(range(12)))
+        self.assertEqual(history.get_total('flu', 5, 9), 2 * (5 + 6 + 7 + 8))
+        day = history.get_day(3)
+        self.assertEqual(day[COUNTS], {'cooties': 3, 'flu': 6})
+        self.assertEqual(day[START_TIMESTAMP], START + timedelta(days=3))
+        self.assertEqual(history.get_day(10)[END_TIMESTAMP], START + timedelta(days=11))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+# unit tests for deploying to EC2 instances, with stand-ins for the instances' SSH connections
+import threading
+import time
+import unittest
+
+from aws.deployment import RemoteProcess, deploy_to_instances, wait_until_ssh_ready
+from shared.constants import *
+
+
+class FakeEc2Instance:
+
+    # counts the commands running on all fake instances at once
+    lock = threading.Lock()
+    running = 0
+    most_running = 0
+
+    def __init__(self, instance_id, refused_connections=0, exit_status=0, duration=0.05):
+        self.instance_id = instance_id
+        self.refused_connections = refused_connections
+        self.exit_status = exit_status
+        self.duration = duration
+        self.commands = []
+        self.closed = threading.Event()
+
+    def ssh_connect(self):
+        if self.refused_connections > 0:
+            self.refused_connections = self.refused_connections - 1
+            return False
+        return True
+
+    def ssh_close(self):
+        self.closed.set()
+
+    def run_command_for_exit_status(self, command):
+        self.commands.append(command)
+        with FakeEc2Instance.lock:
+            FakeEc2Instance.running = FakeEc2Instance.running + 1
+            FakeEc2Instance.most_running = max(FakeEc2Instance.most_running, FakeEc2Instance.running)
+        # a closed connection ends the command early, like a lost SSH connection
+        lost_connection = self.closed.wait(self.duration)
+        with FakeEc2Instance.lock:
+            FakeEc2Instance.running = FakeEc2Instance.running - 1
+        return None if lost_connection else self.exit_status
+
+
+class DeploymentTest(unittest.TestCase):
+
+    def setUp(self):
+        FakeEc2Instance.most_running = 0
+
+    def test_deploys_in_parallel_up_to_max_workers(self):
+        ec2_instances = [FakeEc2Instance('i-{}'.format(index)) for index in range(8)]
+        start = time.perf_counter()
+        deploy_to_instances(ec2_instances, 4)
+        self.assertLess(time.perf_counter() - start, 8 * 0.05)
+        self.assertEqual(FakeEc2Instance.most_running, 4)
+        for ec2_instance in ec2_instances:
+            self.assertEqual(ec2_instance.commands, [GIT_CLONE_COMMAND])
+
+    def test_failed_deployment_is_raised(self):
+        ec2_instances = [FakeEc2Instance('i-0'), FakeEc2Instance('i-1', exit_status=128)]
+        with self.assertRaisesRegex(RuntimeError, 'git clone failed on i-1'):
+            deploy_to_instances(ec2_instances, 2)
+
+    def test_wait_until_ssh_ready(self):
+        ec2_instance = FakeEc2Instance('i-0', refused_connections=2)
+        wait_until_ssh_ready(ec2_instance, retry_interval=0)
+        self.assertEqual(ec2_instance.refused_connections, 0)
+        with self.assertRaisesRegex(RuntimeError, 'i-1 did not accept SSH connections'):
+            wait_until_ssh_ready(FakeEc2Instance('i-1', refused_connections=1000), timeout=0.01, retry_interval=0)
+
+    def test_remote_process(self):
+        remote_process = RemoteProcess(FakeEc2Instance('i-0', exit_status=3), 'python3 overseer.py')
+        self.assertIsNone(remote_process.poll())
+        self.assertEqual(remote_process.wait(), 3)
+        remote_process = RemoteProcess(FakeEc2Instance('i-1', duration=60), 'python3 overseer.py')
+        remote_process.terminate()
+        self.assertEqual(remote_process.wait(), -1)
+
+
+if __name__ == '__main__':
+    unittest.main()
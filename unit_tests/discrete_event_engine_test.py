@@ -0,0 +1,103 @@
+# unit tests for the discrete event engine and for running a whole simulation in virtual time
+import unittest
+from datetime import timedelta
+
+from config.json_config_extractor import extract_in_process_config
+from run_discrete_event import RunDiscreteEvent
+from shared.constants import *
+from shared.discrete_event_engine import DEFAULT_START_TIME, DiscreteEventEngine
+
+JSON_CONFIG = {
+    OVERSEER: {HOST: '127.0.0.1', REPLY_PORT: 9000, PUBLISH_PORT: 9090},
+    TIME_SCALING_FACTOR: 1800,
+    DISEASES: ['influenza', 'measles'],
+    NODES: {
+        'EMR': {ROLE: ELECTRONIC_MEDICAL_RECORD,
+                ROLE_PARAMETERS: {OUTBREAK_DAILY_QUERY_FREQUENCY: 4,
+                                  DISEASE_GENERATION: RANDOM,
+                                  DISEASE_GENERATION_PARAMETERS: {PROBABILITY: 0.5}},
+                CONNECTIONS: ['HDS']},
+        'HDS': {ROLE: HEALTH_DISTRICT_SYSTEM,
+                ROLE_PARAMETERS: {DAILY_COUNT_SEND_FREQUENCY: 2},
+                CONNECTIONS: ['DOA']},
+        'DOA': {ROLE: DISEASE_OUTBREAK_ANALYZER,
+                ROLE_PARAMETERS: {DISEASE: 'influenza', DAILY_OUTBREAK_THRESHOLD: 20},
+                CONNECTIONS: ['HDS']},
+    }
+}
+
+
+class DiscreteEventEngineTest(unittest.TestCase):
+
+    def test_events_run_in_time_order(self):
+        engine = DiscreteEventEngine(1, 0.001)
+        events = []
+        for seconds, name in [(3, 'c'), (1, 'a'), (2, 'b1'), (2, 'b2')]:
+            engine.schedule_after(timedelta(seconds=seconds), lambda name=name: events.append((name, engine.now())))
+        engine.run_until(DEFAULT_START_TIME + timedelta(seconds=10))
+        # events at the same time run in the order they were scheduled
+        self.assertEqual([name for name, _ in events], ['a', 'b1', 'b2', 'c'])
+        self.assertEqual([time for _, time in events],
+                         [DEFAULT_START_TIME + timedelta(seconds=seconds) for seconds in (1, 2, 2, 3)])
+        self.assertEqual(engine.events_processed, 4)
+
+    def test_periodic_events_step_by_interval(self):
+        engine = DiscreteEventEngine(1, 0.001)
+        tick_interval = timedelta(seconds=0.7)
+        ticks = []
+
+        def tick():
+            ticks.append(engine.now())
+            return len(ticks) < 5
+
+        engine.schedule_periodic(tick_interval, tick)
+        engine.run_until(DEFAULT_START_TIME + timedelta(seconds=60))
+        # the fifth tick returns False, so no sixth tick is scheduled
+        self.assertEqual(ticks, [DEFAULT_START_TIME + tick_interval * count for count in range(1, 6)])
+        self.assertEqual(engine.events, [])
+
+    def test_run_until_stops_at_end_time(self):
+        engine = DiscreteEventEngine(1, 0.001)
+        ticks = []
+        engine.schedule_periodic(timedelta(seconds=1), lambda: ticks.append(engine.now()))
+        end_time = DEFAULT_START_TIME + timedelta(seconds=3.5)
+        engine.run_until(end_time)
+        self.assertEqual(len(ticks), 3)
+        self.assertEqual(engine.now(), end_time)
+        # the next tick stays scheduled, and runs when the simulation is continued
+        self.assertEqual(engine.events[0][0], DEFAULT_START_TIME + timedelta(seconds=4))
+        engine.run_until(DEFAULT_START_TIME + timedelta(seconds=4))
+        self.assertEqual(len(ticks), 4)
+
+    @staticmethod
+    def run_simulation(seed):
+        config = extract_in_process_config({}, JSON_CONFIG)
+        config[ROLE] = RUN_DISCRETE_EVENT
+        config[DAYS] = 3
+        config[SEED] = seed
+        config[TICK_INTERVAL] = DEFAULT_TICK_INTERVAL
+        config[NETWORK_LATENCY] = DEFAULT_NETWORK_LATENCY
+        run_discrete_event = RunDiscreteEvent(config)
+        run_discrete_event.create_overseer()
+        run_discrete_event.create_nodes()
+        run_discrete_event.start_nodes()
+        run_discrete_event.schedule_periodic_tasks()
+        run_discrete_event.engine.run_until(run_discrete_event.get_end_time())
+        health_district_system = run_discrete_event.nodes['HDS']
+        history = health_district_system.daily_count_history
+        daily_counts = [history.get_day(day)[COUNTS] for day in range(history.get_day_count())]
+        run_discrete_event.stop_nodes()
+        return run_discrete_event.engine.events_processed, daily_counts
+
+    def test_same_seed_gives_same_simulation(self):
+        events_processed, daily_counts = self.run_simulation(7)
+        self.assertGreater(events_processed, 0)
+        # the last day is archived by the first count sent after the simulation's end
+        self.assertEqual(len(daily_counts), 2)
+        self.assertGreater(sum(counts['influenza'] for counts in daily_counts), 0)
+        self.assertEqual(self.run_simulation(7), (events_processed, daily_counts))
+        self.assertNotEqual(self.run_simulation(8)[1], daily_counts)
+
+
+if __name__ == '__main__':
+    unittest.main()
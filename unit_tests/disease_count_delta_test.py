@@ -0,0 +1,46 @@
+# unit tests for change-only publishing of daily disease counts
+
+import unittest
+
+from shared.disease_count_delta import DiseaseCountDeltaDecoder, DiseaseCountDeltaEncoder
+
+
+class DiseaseCountDeltaTest(unittest.TestCase):
+
+    def test_encoder_sends_only_changes(self):
+        encoder = DiseaseCountDeltaEncoder(4)
+        self.assertEqual(encoder.encode({'cooties': 0, 'measles': 0}), (0, True, {'cooties': 0, 'measles': 0}))
+        # nothing changed:  nothing to publish, and no sequence number is used
+        self.assertIsNone(encoder.encode({'cooties': 0, 'measles': 0}))
+        self.assertEqual(encoder.encode({'cooties': 2, 'measles': 0}), (1, False, {'cooties': 2}))
+        self.assertIsNone(encoder.encode({'cooties': 2, 'measles': 0}))
+        # every 4th send opportunity is a full snapshot, changed or not
+        self.assertEqual(encoder.encode({'cooties': 2, 'measles': 0}), (2, True, {'cooties': 2, 'measles': 0}))
+
+    def test_forced_full_snapshot(self):
+        encoder = DiseaseCountDeltaEncoder(4)
+        encoder.encode({'cooties': 2})
+        self.assertIsNone(encoder.encode({'cooties': 2}))
+        encoder.force_full_snapshot()
+        self.assertEqual(encoder.encode({'cooties': 2}), (1, True, {'cooties': 2}))
+        self.assertIsNone(encoder.encode({'cooties': 2}))
+
+    def test_decoder_detects_gaps_until_snapshot(self):
+        decoder = DiseaseCountDeltaDecoder('HDS')
+        # joined late:  unsynchronized, but that is not a gap
+        self.assertFalse(decoder.apply(5, False))
+        self.assertFalse(decoder.synchronized)
+        self.assertFalse(decoder.apply(6, True))
+        self.assertTrue(decoder.synchronized)
+        self.assertFalse(decoder.apply(7, False))
+        self.assertTrue(decoder.apply(9, False))
+        self.assertFalse(decoder.synchronized)
+        self.assertEqual(decoder.gap_count, 1)
+        # further gaps are not counted again until the next full snapshot
+        self.assertFalse(decoder.apply(11, False))
+        self.assertFalse(decoder.apply(12, True))
+        self.assertTrue(decoder.synchronized)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+# unit tests for disease_generator
+
+import unittest
+from datetime import datetime
+
+from shared.constants import *
+from shared.disease_generator import VectorizedDiseaseGenerator
+
+
+class VectorizedDiseaseGeneratorTest(unittest.TestCase):
+
+    def test_random_with_disease_probabilities(self):
+        parameters = {PROBABILITY: 0.0,
+                      DISEASE_PROBABILITIES: {'measles': 1.0}}
+        generator = VectorizedDiseaseGenerator(['cooties', 'measles', 'mumps'], RANDOM, parameters, seed=1)
+        times = [datetime(2018, 1, 1, 0, 0, second) for second in range(10)]
+        self.assertEqual(generator.generate(times), {'measles': 10})
+        self.assertEqual(list(generator.generate_counts(times[:1])), [0, 1, 0])
+
+    def test_sine_follows_the_second_of_the_minute(self):
+        parameters = {MIN_PROBABILITY: 0.0, MAX_PROBABILITY: 1.0}
+        generator = VectorizedDiseaseGenerator(['cooties'], SINE, parameters, seed=1)
+        # sin(0) = 0 at the top of the minute, |sin(pi / 2)| = 1 at 15 seconds
+        self.assertEqual(generator.generate([datetime(2018, 1, 1, 0, 0, 0)] * 100), {})
+        self.assertEqual(generator.generate([datetime(2018, 1, 1, 0, 0, 15)] * 100), {'cooties': 100})
+
+    def test_same_seed_gives_same_counts(self):
+        parameters = {PROBABILITY: 0.3}
+        times = [datetime(2018, 1, 1)] * 60
+        first = VectorizedDiseaseGenerator(['cooties', 'measles'], RANDOM, parameters, seed=7)
+        second = VectorizedDiseaseGenerator(['cooties', 'measles'], RANDOM, parameters, seed=7, block_size=5)
+        # drawing tick by tick from small blocks consumes the same random stream as one large draw
+        tick_by_tick = sum(second.generate_counts([time]) for time in times)
+        self.assertEqual(list(first.generate_counts(times)), list(tick_by_tick))
+
+    def test_rejects_probability_out_of_range(self):
+        with self.assertRaises(TypeError):
+            VectorizedDiseaseGenerator(['cooties'], RANDOM, {PROBABILITY: 1.5})
+        with self.assertRaises(ValueError):
+            VectorizedDiseaseGenerator(['cooties'], 'uniform', {PROBABILITY: 0.5})
+
+
+if __name__ == '__main__':
+    unittest.main()
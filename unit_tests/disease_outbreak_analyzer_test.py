@@ -6,7 +6,7 @@ from datetime import datetime
 from disease_outbreak_analyzer import DiseaseOutbreakAnalyzer
 from overseer import Overseer
 from shared.constants import *
-from shared.node import Node, VectorTimestamp
+from shared.node import VectorTimestamp
 
 
 class DiseaseOutbreakAnalyzerTest(unittest.TestCase):
@@ -14,7 +14,7 @@ class DiseaseOutbreakAnalyzerTest(unittest.TestCase):
     def get_basic_config(self):
         # populate the config map
         return {
-            OVERSEER_HOST: str(Node.get_ip_address()),
+            OVERSEER_HOST: '127.0.0.1',
             OVERSEER_REPLY_PORT: 9001,
             OVERSEER_PUBLISH_PORT: 9091,
             TIME_SCALING_FACTOR: 1800,
@@ -49,6 +49,34 @@ class DiseaseOutbreakAnalyzerTest(unittest.TestCase):
         disease_outbreak_analzyer.handle_daily_disease_count_message(message)
         self.assertEqual(disease_outbreak_analzyer.current_daily_disease_counts[TOTAL], 5)
 
+    def test_handle_daily_disease_count_deltas(self):
+        overseer = Overseer(self.get_basic_config())
+        disease_outbreak_analzyer = DiseaseOutbreakAnalyzer(self.get_node_config())
+        disease_outbreak_analzyer.simulation_start_time = datetime.now()
+        deltas = [(0, True, {'cooties': 4, 'measles': 1}),
+                  (1, False, {'measles': 2}),
+                  (3, False, {'cooties': 6})]
+        for sequence_number, is_full_snapshot, disease_counts in deltas:
+            message = {MESSAGE_TYPE: DAILY_DISEASE_COUNT_DELTA,
+                       HEALTH_DISTRICT_SYSTEM_ID: "Mock_HDS",
+                       SEQUENCE_NUMBER: sequence_number,
+                       FULL_SNAPSHOT: is_full_snapshot,
+                       DISEASE_COUNTS: disease_counts,
+                       VECTOR_TIMESTAMP: VectorTimestamp()}
+            disease_outbreak_analzyer.handle_daily_disease_count_message(message)
+        self.assertEqual(disease_outbreak_analzyer.current_daily_disease_counts[TOTAL], 6)
+        # sequence number 2 was missed
+        self.assertEqual(disease_outbreak_analzyer.get_metrics()[COUNTERS][DISEASE_COUNT_GAPS], 1)
+
+    def test_update_daily_disease_counts(self):
+        overseer = Overseer(self.get_basic_config())
+        disease_outbreak_analzyer = DiseaseOutbreakAnalyzer(self.get_node_config())
+        disease_outbreak_analzyer.update_daily_disease_counts("Mock_HDS_1", 5)
+        disease_outbreak_analzyer.update_daily_disease_counts("Mock_HDS_2", 2)
+        disease_outbreak_analzyer.update_daily_disease_counts("Mock_HDS_1", 6)
+        self.assertEqual(disease_outbreak_analzyer.current_daily_disease_counts[TOTAL], 8)
+        self.assertEqual(disease_outbreak_analzyer.current_daily_disease_counts[HEALTH_DISTRICT_COUNTS]["Mock_HDS_1"], 6)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,79 @@
+# unit tests for electronic_medical_record_host
+# the host only connects to the overseer, so it can be created without an overseer running
+
+import unittest
+
+from electronic_medical_record_host import ElectronicMedicalRecordHost
+from shared.constants import *
+
+
+class ElectronicMedicalRecordHostTest(unittest.TestCase):
+
+    def get_node_config(self, node_id):
+        return {
+            NODE_ID: node_id,
+            ROLE: ELECTRONIC_MEDICAL_RECORD,
+            ROLE_PARAMETERS: {OUTBREAK_DAILY_QUERY_FREQUENCY: 1},
+            CONNECTIONS: ['HDS'],
+            TIME_SCALING_FACTOR: 1800,
+            DISEASES: ['cooties']}
+
+    def get_host_config(self):
+        return {
+            OVERSEER_HOST: '127.0.0.1',
+            OVERSEER_REPLY_PORT: 9001,
+            OVERSEER_PUBLISH_PORT: 9091,
+            NODE_CONFIGS: {node_id: self.get_node_config(node_id) for node_id in ['EMR_A', 'EMR_B']}}
+
+    def setUp(self):
+        self.host = ElectronicMedicalRecordHost(self.get_host_config())
+
+    def tearDown(self):
+        self.host.overseer_request_socket.close(linger=0)
+        self.host.overseer_subscribe_socket.close(linger=0)
+        self.host.context.term()
+
+    def test_hosted_records_pipeline_without_own_overseer_sockets(self):
+        for electronic_medical_record in self.host.electronic_medical_records.values():
+            self.assertTrue(electronic_medical_record.is_pipelined())
+            self.assertIsNone(electronic_medical_record.overseer_request_socket)
+
+    def test_sequence_numbers_are_unique_across_hosted_records(self):
+        emr_a = self.host.electronic_medical_records['EMR_A']
+        emr_b = self.host.electronic_medical_records['EMR_B']
+        sequence_numbers = [emr_a.get_next_sequence_number(), emr_b.get_next_sequence_number(),
+                            emr_a.get_next_sequence_number()]
+        self.assertEqual(sequence_numbers, [0, 1, 2])
+        self.assertIs(self.host.sequence_number_owners[1], emr_b)
+
+    def test_dispatch_reply_to_sender(self):
+        emr_a = self.host.electronic_medical_records['EMR_A']
+        emr_b = self.host.electronic_medical_records['EMR_B']
+        emr_a.pending_disease_counts = {'cooties': 2}
+        message = emr_a.new_disease_notification_batch(emr_a.pending_disease_counts, None)
+        sequence_number = message[SEQUENCE_NUMBER]
+        emr_a.requests_in_flight[sequence_number] = DISEASE_NOTIFICATION_BATCH
+        self.host.dispatch_reply({MESSAGE_TYPE: DISEASE_NOTIFICATION_REPLY,
+                                  SEQUENCE_NUMBER: sequence_number,
+                                  VECTOR_TIMESTAMP: {'HDS': 3}})
+        self.assertEqual(emr_a.requests_in_flight, {})
+        self.assertEqual(dict(emr_a.vector_timestamp.items()), {'HDS': 3})
+        self.assertNotIn(sequence_number, self.host.sequence_number_owners)
+        self.assertEqual(dict(emr_b.vector_timestamp.items()), {})
+
+        # a reply nobody is waiting for is logged and dropped
+        with self.assertLogs(level='WARNING'):
+            self.host.dispatch_reply({MESSAGE_TYPE: DISEASE_NOTIFICATION_REPLY, SEQUENCE_NUMBER: 99,
+                                      VECTOR_TIMESTAMP: {'HDS': 4}})
+
+    def test_requested_metrics_are_logged_for_every_hosted_record(self):
+        self.host.request_metrics(None, None)
+        with self.assertLogs(level='INFO') as logs:
+            self.host.log_metrics_if_requested()
+        self.assertEqual([line.split(':')[2] for line in logs.output],
+                         ['metrics for EMR_A', 'metrics for EMR_B'])
+        self.assertFalse(self.host.metrics_requested)
+
+
+if __name__ == '__main__':
+    unittest.main()
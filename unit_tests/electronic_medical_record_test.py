@@ -3,10 +3,11 @@
 
 import unittest
 
+import zmq
+
 from electronic_medical_record import ElectronicMedicalRecord
 from overseer import Overseer
 from shared.constants import *
-from shared.node import Node
 
 
 class ElectronicMedicalRecordTest(unittest.TestCase):
@@ -14,7 +15,7 @@ class ElectronicMedicalRecordTest(unittest.TestCase):
     def get_basic_config(self):
         # populate the config map
         return {
-            OVERSEER_HOST: str(Node.get_ip_address()),
+            OVERSEER_HOST: '127.0.0.1',
             OVERSEER_REPLY_PORT: 9001,
             OVERSEER_PUBLISH_PORT: 9091,
             TIME_SCALING_FACTOR: 1800,
@@ -49,6 +50,36 @@ class ElectronicMedicalRecordTest(unittest.TestCase):
         with self.assertRaises(TypeError):
             result_should_also_be_type_error = emr.generate_disease_random(2)
 
+    def test_pipelined_outbreak_query_respects_window(self):
+        overseer = Overseer(self.get_basic_config())
+        node_config = self.get_node_config()
+        node_config[ROLE_PARAMETERS][NOTIFICATION_MODE] = PIPELINED
+        node_config[ROLE_PARAMETERS][MAX_NOTIFICATIONS_IN_FLIGHT] = 2
+        emr = ElectronicMedicalRecord(node_config)
+        # close the sockets left open by a failed assertion, which would otherwise block context.term
+        self.addCleanup(overseer.context.destroy, 0)
+        self.addCleanup(emr.context.destroy, 0)
+        emr.health_district_system_id = 'HDS'
+        router_socket = emr.context.socket(zmq.ROUTER)
+        router_socket.bind('inproc://outbreak_query_window')
+        emr.health_district_system_socket = emr.context.socket(zmq.DEALER)
+        emr.health_district_system_socket.connect('inproc://outbreak_query_window')
+
+        emr.requests_in_flight[99] = DISEASE_NOTIFICATION_BATCH
+        emr.send_outbreak_query()
+        self.assertTrue(router_socket.poll(1000))
+        router_socket.recv_multipart()
+        self.assertEqual(list(emr.requests_in_flight.values()), [DISEASE_NOTIFICATION_BATCH, OUTBREAK_QUERY])
+        # the window is full, so the query is skipped rather than queued behind the unanswered requests
+        emr.send_outbreak_query()
+        self.assertEqual(len(emr.requests_in_flight), 2)
+        self.assertFalse(router_socket.poll(100))
+
+        router_socket.close(linger=0)
+        emr.health_district_system_socket.close(linger=0)
+        emr.shutdown_zmq()
+        overseer.shutdown_zmq()
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,94 @@
+# unit tests for the off-thread event log
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+
+from shared.constants import *
+from shared.event_log import EventLog, LogWriter, format_event
+from shared.metrics import NodeMetrics
+from shared.vector_timestamp import IndexedVectorTimestamp, NodeIndex, VectorTimestamp
+
+
+class EventLogTest(unittest.TestCase):
+
+    def test_format_matches_log_line(self):
+        vector_timestamp = VectorTimestamp()
+        vector_timestamp.increment_count('EMR')
+        fields = {SIM_TIME: datetime(2018, 3, 1, 12), DISEASE: 'cooties', VECTOR_TIMESTAMP: vector_timestamp}
+        self.assertEqual(format_event(DISEASE_OCCURRED, fields),
+                         "[2018-03-01 12:00:00] Disease occurred: cooties  vector_timestamp: {'EMR': 1}")
+
+    def test_sampling_keeps_one_of_every_n(self):
+        metrics = NodeMetrics()
+        event_log = EventLog('EMR', metrics, {SAMPLE_RATES: {DISEASE_OCCURRED: 0.25}})
+        admitted = [event_log.is_admitted(DISEASE_OCCURRED) for _ in range(8)]
+        self.assertEqual(admitted, [True, False, False, False, True, False, False, False])
+        # other events are not sampled
+        self.assertTrue(all(event_log.is_admitted(OUTBREAK_REPORTED) for _ in range(8)))
+
+    def test_rate_limit(self):
+        event_log = EventLog('EMR', NodeMetrics(), {RATE_LIMITS: {DISEASE_OCCURRED: 2}})
+        self.assertEqual([event_log.is_admitted(DISEASE_OCCURRED) for _ in range(3)], [True, True, False])
+        # a second later the bucket is full again
+        event_log.last_refill[DISEASE_OCCURRED] = event_log.last_refill[DISEASE_OCCURRED] - 1
+        self.assertEqual([event_log.is_admitted(DISEASE_OCCURRED) for _ in range(3)], [True, True, False])
+
+    def test_dropped_events_are_counted(self):
+        metrics = NodeMetrics()
+        event_log = EventLog('EMR', metrics, {SAMPLE_RATES: {DISEASE_OCCURRED: 0.5}})
+        for _ in range(4):
+            event_log.log(DISEASE_OCCURRED, datetime(2018, 3, 1), VectorTimestamp(), disease='cooties')
+        self.assertEqual(metrics.get_snapshot()[COUNTERS], {EVENTS_DROPPED_PREFIX + DISEASE_OCCURRED: 2})
+
+    def test_copies_are_independent(self):
+        for vector_timestamp in (VectorTimestamp(), IndexedVectorTimestamp(NodeIndex(['A', 'B']))):
+            vector_timestamp.increment_count('A')
+            copy = vector_timestamp.copy()
+            vector_timestamp.increment_count('A')
+            self.assertEqual(dict(copy.items()), {'A': 1})
+            self.assertEqual(dict(vector_timestamp.items()), {'A': 2})
+
+
+class LogWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder)
+
+    def test_writes_records_and_events_in_order(self):
+        log_file = os.path.join(self.folder, 'node.log')
+        json_log_file = os.path.join(self.folder, 'node.ndjson')
+        log_writer = LogWriter(log_file, json_log_file)
+        log_writer.start()
+        vector_timestamp = VectorTimestamp()
+        vector_timestamp.increment_count('HDS')
+        log_writer.queue_handler.handle(logging.makeLogRecord({'msg': "Starting %s", 'args': ('simulation',),
+                                                                'levelno': logging.INFO, 'levelname': 'INFO'}))
+        log_writer.put_event('HDS', DISEASE_COUNTS_SENT, {SIM_TIME: datetime(2018, 3, 1),
+                                                          DISEASE_COUNTS: {'cooties': 3},
+                                                          VECTOR_TIMESTAMP: vector_timestamp.copy()})
+        vector_timestamp.increment_count('HDS')
+        log_writer.stop()
+        log_writer.handler.close()
+
+        with open(log_file) as file:
+            self.assertEqual(file.read().splitlines(),
+                             ["Starting simulation",
+                              "[2018-03-01 00:00:00] Sending disease counts: {'cooties': 3}  "
+                              "vector_timestamp: {'HDS': 1}"])
+        with open(json_log_file) as file:
+            records = [json.loads(line) for line in file]
+        self.assertEqual(records[0][MESSAGE], "Starting simulation")
+        self.assertEqual(records[1][EVENT], DISEASE_COUNTS_SENT)
+        self.assertEqual(records[1][NODE_ID], 'HDS')
+        self.assertEqual(records[1][VECTOR_TIMESTAMP], {'HDS': 1})
+        self.assertEqual(records[1][DISEASE_COUNTS], {'cooties': 3})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+# unit tests for health_district_counts
+
+import unittest
+
+from shared.health_district_counts import HealthDistrictCounts
+
+
+class HealthDistrictCountsTest(unittest.TestCase):
+
+    def test_update_keeps_running_total(self):
+        health_district_counts = HealthDistrictCounts()
+        self.assertEqual(health_district_counts.update("HDS_A", 5), 5)
+        self.assertEqual(health_district_counts.update("HDS_B", 3), 8)
+        self.assertEqual(health_district_counts.update("HDS_A", 7), 10)
+        self.assertEqual(health_district_counts["HDS_A"], 7)
+        self.assertEqual(dict(health_district_counts.items()), {'HDS_A': 7, 'HDS_B': 3})
+        # a district that reports again is still counted once
+        self.assertEqual(len(health_district_counts), 2)
+
+    def test_slots_are_shared_between_days(self):
+        slots = {}
+        first_day = HealthDistrictCounts(slots)
+        first_day.update("HDS_A", 5)
+        first_day.update("HDS_B", 3)
+        second_day = HealthDistrictCounts(slots)
+        second_day.update("HDS_B", 1)
+        self.assertEqual(second_day.total, 1)
+        self.assertEqual(len(second_day), 1)
+        self.assertEqual(str(second_day), "{'HDS_B': 1}")
+        with self.assertRaises(KeyError):
+            second_day["HDS_A"]
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,9 +2,13 @@
 # note that most of health district system's functionality involves network communication, so unit tests are limited
 
 import unittest
+from datetime import datetime, timedelta
+
+import zmq
 
 from health_district_system import HealthDistrictSystem
 from overseer import Overseer
+from shared.clock import VirtualClock
 from shared.constants import *
 from shared.node import Node
 from shared.vector_timestamp import VectorTimestamp
@@ -15,7 +19,7 @@ class HealthDistrictSystemTest(unittest.TestCase):
     def get_basic_config(self):
         # populate the config map
         return {
-            OVERSEER_HOST: str(Node.get_ip_address()),
+            OVERSEER_HOST: '127.0.0.1',
             OVERSEER_REPLY_PORT: 9001,
             OVERSEER_PUBLISH_PORT: 9091,
             TIME_SCALING_FACTOR: 1800,
@@ -49,6 +53,243 @@ class HealthDistrictSystemTest(unittest.TestCase):
         health_district_system.handle_disease_notification(message)
         self.assertEqual(health_district_system.current_daily_disease_counts['cooties'], 1)
 
+    def test_handle_disease_notification_batch(self):
+        overseer = Overseer(self.get_basic_config())
+        health_district_system = HealthDistrictSystem(self.get_node_config())
+        vector_timestamp = VectorTimestamp()
+        vector_timestamp.increment_count("Mock_EMR")
+        message = {MESSAGE_TYPE: DISEASE_NOTIFICATION_BATCH,
+                   ELECTRONIC_MEDICAL_RECORD_ID: "Mock_EMR",
+                   SEQUENCE_NUMBER: 0,
+                   DISEASE_COUNTS: {"cooties": 3},
+                   LOCAL_TIMESTAMP: "Sometime",
+                   VECTOR_TIMESTAMP: vector_timestamp}
+        health_district_system.handle_disease_notification_batch(message)
+        self.assertEqual(health_district_system.current_daily_disease_counts['cooties'], 3)
+
+    def test_process_outbreak_query(self):
+        overseer = Overseer(self.get_basic_config())
+        health_district_system = HealthDistrictSystem(self.get_node_config())
+        health_district_system.outbreaks.add('cooties')
+        vector_timestamp = VectorTimestamp()
+        vector_timestamp.increment_count("Mock_EMR")
+        message = {MESSAGE_TYPE: OUTBREAK_QUERY,
+                   ELECTRONIC_MEDICAL_RECORD_ID: "Mock_EMR",
+                   SEQUENCE_NUMBER: 7,
+                   VECTOR_TIMESTAMP: vector_timestamp}
+        reply = health_district_system.process_electronic_medical_record_message(message)
+        self.assertEqual(reply[MESSAGE_TYPE], OUTBREAK_QUERY_REPLY)
+        self.assertEqual(reply[SEQUENCE_NUMBER], 7)
+        self.assertEqual(reply[OUTBREAKS], {'cooties'})
+
+    def test_setup_listeners_inproc(self):
+        context = zmq.Context()
+        overseer_config = self.get_basic_config()
+        overseer_config[TRANSPORT] = INPROC
+        overseer = Overseer(overseer_config, context)
+        node_config = self.get_node_config()
+        node_config[TRANSPORT] = INPROC
+        health_district_system = HealthDistrictSystem(node_config, context)
+        health_district_system.setup_listeners()
+        address_map = health_district_system.config[ADDRESS_MAP]
+        self.assertEqual(address_map[ELECTRONIC_MEDICAL_RECORD_ADDRESS],
+                         "inproc://Node_A/" + ELECTRONIC_MEDICAL_RECORD_ADDRESS)
+        self.assertEqual(address_map[DISEASE_OUTBREAK_ANALYZER_ADDRESS],
+                         "inproc://Node_A/" + DISEASE_OUTBREAK_ANALYZER_ADDRESS)
+        health_district_system.shutdown_listeners()
+        health_district_system.shutdown_zmq()
+        overseer.shutdown_zmq()
+        context.term()
+
+    def test_router_front_end_replies_to_each_sender(self):
+        context = zmq.Context()
+        # closes the sockets left open by a failed assertion, which would otherwise block context.term
+        self.addCleanup(context.destroy, 0)
+        overseer_config = self.get_basic_config()
+        overseer_config[TRANSPORT] = INPROC
+        overseer = Overseer(overseer_config, context)
+        node_config = self.get_node_config()
+        node_config[TRANSPORT] = INPROC
+        node_config[ROLE_PARAMETERS][REQUEST_HANDLING] = ROUTER
+        node_config[ROLE_PARAMETERS][MAX_REQUESTS_PER_POLL] = 3
+        health_district_system = HealthDistrictSystem(node_config, context)
+        health_district_system.record_start_time()
+        health_district_system.setup_listeners()
+        address = health_district_system.config[ADDRESS_MAP][ELECTRONIC_MEDICAL_RECORD_ADDRESS]
+        dealer_sockets = {}
+        for electronic_medical_record_id in ['EMR_A', 'EMR_B']:
+            dealer_sockets[electronic_medical_record_id] = context.socket(zmq.DEALER)
+            dealer_sockets[electronic_medical_record_id].connect(address)
+
+        def send_request(electronic_medical_record_id, sequence_number, message_type):
+            message = {MESSAGE_TYPE: message_type,
+                       ELECTRONIC_MEDICAL_RECORD_ID: electronic_medical_record_id,
+                       SEQUENCE_NUMBER: sequence_number,
+                       VECTOR_TIMESTAMP: VectorTimestamp()}
+            if message_type == DISEASE_NOTIFICATION_BATCH:
+                message[DISEASE_COUNTS] = {'cooties': 1}
+                message[LOCAL_TIMESTAMP] = "Sometime"
+            data = health_district_system.encode_message(message)
+            dealer_sockets[electronic_medical_record_id].send_multipart([b'', data])
+
+        def receive_replies(electronic_medical_record_id):
+            replies = {}
+            while dealer_sockets[electronic_medical_record_id].poll(100):
+                [delimiter, data] = dealer_sockets[electronic_medical_record_id].recv_multipart()
+                self.assertEqual(delimiter, b'')
+                reply = health_district_system.decode_message(data)
+                replies[reply[SEQUENCE_NUMBER]] = reply[MESSAGE_TYPE]
+            return replies
+
+        # both electronic_medical_records pipeline their requests, interleaved, before any reply
+        send_request('EMR_A', 10, DISEASE_NOTIFICATION_BATCH)
+        send_request('EMR_B', 20, OUTBREAK_QUERY)
+        send_request('EMR_A', 11, OUTBREAK_QUERY)
+        send_request('EMR_B', 21, DISEASE_NOTIFICATION_BATCH)
+        send_request('EMR_A', 12, DISEASE_NOTIFICATION_BATCH)
+        self.assertTrue(health_district_system.electronic_medical_record_socket.poll(1000))
+
+        # one call drains at most max_requests_per_poll requests
+        health_district_system.handle_electronic_medical_record_requests()
+        replies = {electronic_medical_record_id: receive_replies(electronic_medical_record_id)
+                   for electronic_medical_record_id in dealer_sockets}
+        self.assertEqual(sum(len(sender_replies) for sender_replies in replies.values()), 3)
+        health_district_system.handle_electronic_medical_record_requests()
+        for electronic_medical_record_id in dealer_sockets:
+            replies[electronic_medical_record_id].update(receive_replies(electronic_medical_record_id))
+
+        # every reply reaches the DEALER that sent its request
+        self.assertEqual(replies['EMR_A'], {10: DISEASE_NOTIFICATION_REPLY, 11: OUTBREAK_QUERY_REPLY,
+                                            12: DISEASE_NOTIFICATION_REPLY})
+        self.assertEqual(replies['EMR_B'], {20: OUTBREAK_QUERY_REPLY, 21: DISEASE_NOTIFICATION_REPLY})
+        self.assertEqual(health_district_system.current_daily_disease_counts['cooties'], 3)
+
+        for dealer_socket in dealer_sockets.values():
+            dealer_socket.close(linger=0)
+        health_district_system.shutdown_listeners()
+        health_district_system.shutdown_zmq()
+        overseer.shutdown_zmq()
+        context.term()
+
+    @unittest.skipUnless(zmq.has(IPC), "libzmq has no ipc transport on this platform")
+    def test_same_host_peers_connect_over_ipc(self):
+        context = zmq.Context()
+        node_config = self.get_node_config()
+        node_config[PUBLIC_IP_ADDRESS] = '127.0.0.1'
+        health_district_system = HealthDistrictSystem(node_config, context)
+        health_district_system.setup_listeners()
+        address_map = health_district_system.get_registered_address_map()
+        tcp_address = address_map[ELECTRONIC_MEDICAL_RECORD_ADDRESS]
+        ipc_address = address_map[IPC_ADDRESSES][ELECTRONIC_MEDICAL_RECORD_ADDRESS]
+        self.assertTrue(tcp_address.startswith(TCP_PREFIX + '127.0.0.1:'))
+        self.assertTrue(ipc_address.startswith(IPC_PREFIX))
+
+        peer_config = self.get_node_config()
+        peer_config[NODE_ID] = 'Node_B'
+        peer_config[PUBLIC_IP_ADDRESS] = '127.0.0.1'
+        peer = HealthDistrictSystem(peer_config, context)
+        peer.set_node_addresses({'Node_A': address_map})
+        self.assertEqual(peer.get_peer_address('Node_A', ELECTRONIC_MEDICAL_RECORD_ADDRESS), ipc_address)
+        # peers on other hosts, and peers configured to use tcp, connect over tcp
+        peer.config[PUBLIC_IP_ADDRESS] = '10.0.0.2'
+        self.assertEqual(peer.get_peer_address('Node_A', ELECTRONIC_MEDICAL_RECORD_ADDRESS), tcp_address)
+        peer.config[PUBLIC_IP_ADDRESS] = '127.0.0.1'
+        peer.same_host_transport = TCP
+        self.assertEqual(peer.get_peer_address('Node_A', ELECTRONIC_MEDICAL_RECORD_ADDRESS), tcp_address)
+
+        request_socket = context.socket(zmq.REQ)
+        request_socket.connect(ipc_address)
+        request_socket.send(b'notification')
+        self.assertTrue(health_district_system.electronic_medical_record_socket.poll(1000))
+        self.assertEqual(health_district_system.electronic_medical_record_socket.recv_multipart()[-1], b'notification')
+
+        request_socket.close(linger=0)
+        health_district_system.shutdown_listeners()
+        health_district_system.shutdown_zmq()
+        peer.shutdown_zmq()
+        context.term()
+
+    def test_send_disease_count_topics(self):
+        context = zmq.Context()
+        overseer_config = self.get_basic_config()
+        overseer_config[TRANSPORT] = INPROC
+        overseer = Overseer(overseer_config, context)
+        node_config = self.get_node_config()
+        node_config[TRANSPORT] = INPROC
+        node_config[DISEASES] = ['cooties', 'cooties_b']
+        node_config[DISEASE_COUNT_PUBLISHING] = DISEASE_TOPICS
+        health_district_system = HealthDistrictSystem(node_config, context)
+        health_district_system.setup_listeners()
+        health_district_system.current_daily_disease_counts['cooties'] = 3
+        health_district_system.current_daily_disease_counts['cooties_b'] = 4
+        subscription_socket = context.socket(zmq.SUB)
+        subscription_socket.connect(health_district_system.config[ADDRESS_MAP][DISEASE_OUTBREAK_ANALYZER_ADDRESS])
+        subscription_socket.setsockopt(zmq.SUBSCRIBE, Node.get_disease_topic('cooties'))
+        # publish until the subscription has reached the publisher
+        for attempt in range(100):
+            health_district_system.send_disease_count_topics()
+            if subscription_socket.poll(20):
+                break
+        [topic, data] = subscription_socket.recv_multipart()
+        message = health_district_system.decode_message(data)
+        self.assertEqual(topic, Node.get_disease_topic('cooties'))
+        self.assertEqual(message[DISEASE], 'cooties')
+        self.assertEqual(message['cooties'], 3)
+        self.assertNotIn('cooties_b', message)
+        # the cooties_b topic is filtered out by the subscription
+        while subscription_socket.poll(100):
+            [topic, data] = subscription_socket.recv_multipart()
+            self.assertEqual(topic, Node.get_disease_topic('cooties'))
+
+        subscription_socket.close(linger=0)
+        health_district_system.shutdown_listeners()
+        health_district_system.shutdown_zmq()
+        overseer.shutdown_zmq()
+        context.term()
+
+    def test_disease_count_deltas_across_day_boundary(self):
+        context = zmq.Context()
+        overseer_config = self.get_basic_config()
+        overseer_config[TRANSPORT] = INPROC
+        overseer = Overseer(overseer_config, context)
+        node_config = self.get_node_config()
+        node_config[TRANSPORT] = INPROC
+        node_config[DISEASE_COUNT_ENCODING] = DELTA
+        health_district_system = HealthDistrictSystem(node_config, context)
+        health_district_system.clock = VirtualClock(datetime(2018, 1, 1))
+        health_district_system.setup_listeners()
+        health_district_system.prepare_simulation()
+        subscription_socket = context.socket(zmq.SUB)
+        subscription_socket.connect(health_district_system.config[ADDRESS_MAP][DISEASE_OUTBREAK_ANALYZER_ADDRESS])
+        subscription_socket.setsockopt_string(zmq.SUBSCRIBE, '')
+
+        def receive_counts():
+            self.assertTrue(subscription_socket.poll(1000))
+            return health_district_system.decode_message(subscription_socket.recv())
+
+        health_district_system.current_daily_disease_counts['cooties'] = 2
+        health_district_system.send_daily_disease_counts()
+        self.assertEqual(receive_counts()[DISEASE_COUNTS], {'cooties': 2})
+        # the end-of-day publication has nothing new, so nothing is sent
+        seconds_per_simulated_day = SECONDS_PER_DAY / health_district_system.time_scaling_factor
+        next_day = datetime(2018, 1, 1) + timedelta(seconds=seconds_per_simulated_day + 1)
+        health_district_system.clock.advance_to(next_day)
+        health_district_system.send_daily_disease_counts()
+        self.assertEqual(health_district_system.current_daily_disease_counts['cooties'], 0)
+        self.assertFalse(subscription_socket.poll(100))
+        # the new day's count equals the last published one, but it is a new count to the analyzers
+        health_district_system.current_daily_disease_counts['cooties'] = 2
+        health_district_system.send_daily_disease_counts()
+        message = receive_counts()
+        self.assertTrue(message[FULL_SNAPSHOT])
+        self.assertEqual(message[DISEASE_COUNTS], {'cooties': 2})
+
+        subscription_socket.close(linger=0)
+        health_district_system.shutdown_listeners()
+        health_district_system.shutdown_zmq()
+        overseer.shutdown_zmq()
+        context.term()
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,91 @@
+# unit tests for the load generator
+# running a load test starts a node process, so only the measurement logic is tested here
+
+import shutil
+import unittest
+from argparse import Namespace
+
+from benchmarks.load_generator import ElectronicMedicalRecordLoad, HealthDistrictSystemLoad, get_percentile
+from shared.constants import *
+
+
+class LoadGeneratorTest(unittest.TestCase):
+
+    def get_json_config(self):
+        return {
+            TIME_SCALING_FACTOR: 1800,
+            DISEASES: ['cooties'],
+            NODES: {
+                'HDS': {ROLE: HEALTH_DISTRICT_SYSTEM,
+                        ROLE_PARAMETERS: {DAILY_COUNT_SEND_FREQUENCY: 2},
+                        CONNECTIONS: ['DOA']},
+                'DOA': {ROLE: DISEASE_OUTBREAK_ANALYZER,
+                        ROLE_PARAMETERS: {DISEASE: 'cooties', DAILY_OUTBREAK_THRESHOLD: 20},
+                        CONNECTIONS: ['HDS']}}}
+
+    def get_args(self):
+        return Namespace(clients=3, start_rate=100, ramp_factor=2, max_rate=1000, step_duration=2, drain_time=1)
+
+    def create_load_generator(self, load_generator_class, node_id):
+        load_generator = load_generator_class(self.get_json_config(), node_id, self.get_args())
+        self.addCleanup(shutil.rmtree, load_generator.work_folder)
+        self.addCleanup(load_generator.context.term)
+        return load_generator
+
+    def test_get_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(get_percentile(values, 50), 50)
+        self.assertEqual(get_percentile(values, 99), 99)
+        self.assertEqual(get_percentile(values, 100), 100)
+        self.assertEqual(get_percentile([7], 50), 7)
+        self.assertIsNone(get_percentile([], 50))
+
+    def test_step_result_saturation(self):
+        load_generator = self.create_load_generator(ElectronicMedicalRecordLoad, 'HDS')
+        result = load_generator.get_step_result(100, 200, 0, (200, 200, 2), 0, [0.001, 0.002])
+        self.assertEqual(result[ACHIEVED_RATE], 100)
+        self.assertEqual(result[LATENCY_MAX_MS], 2)
+        self.assertFalse(result[SATURATED])
+        # fewer than 90% handled during the step
+        self.assertTrue(load_generator.get_step_result(100, 200, 0, (170, 200, 2), 0, [])[SATURATED])
+        # more than 1% still unanswered after the drain
+        self.assertTrue(load_generator.get_step_result(100, 200, 0, (200, 200, 2), 3, [])[SATURATED])
+        # the target pushed back on a send
+        self.assertTrue(load_generator.get_step_result(100, 200, 1, (200, 200, 2), 0, [])[SATURATED])
+
+    def test_probe_measurement(self):
+        load_generator = self.create_load_generator(HealthDistrictSystemLoad, 'DOA')
+        load_generator.step_start = (10.0, 50, 60)
+        # no alert during the step:  nothing is known to be handled
+        self.assertEqual(load_generator.get_measurement(200), (0, 200, 2))
+        # the last alert came 1.9 seconds into the step; only the counts sent by then are measured
+        load_generator.last_probe = (11.9, 240, 250)
+        completed, measured_sent, measured_seconds = load_generator.get_measurement(200)
+        self.assertEqual((completed, measured_sent), (190, 190))
+        self.assertAlmostEqual(measured_seconds, 1.9)
+        self.assertFalse(load_generator.get_step_result(100, 200, 0, (completed, measured_sent, measured_seconds),
+                                                        0, [])[SATURATED])
+
+    def test_drain_probes_are_not_outstanding(self):
+        load_generator = self.create_load_generator(HealthDistrictSystemLoad, 'DOA')
+        client_id = load_generator.client_ids[0]
+        load_generator.begin_step()
+        load_generator.send_times[client_id] = [1.0, 1.1, 1.2]
+        load_generator.get_measurement(3)
+        self.assertEqual(load_generator.get_outstanding(), 3)
+        # a drain probe, and then an alert that shows it handled
+        load_generator.send_times[client_id].append(1.3)
+        load_generator.handled[client_id] = 4
+        self.assertEqual(load_generator.get_outstanding(), 0)
+
+    def test_disease_outbreak_analyzer_target_config(self):
+        load_generator = self.create_load_generator(HealthDistrictSystemLoad, 'DOA')
+        node = load_generator.json_config[NODES]['DOA']
+        self.assertEqual(node[CONNECTIONS], load_generator.client_ids)
+        self.assertEqual(len(node[CONNECTIONS]), 3)
+        self.assertEqual(node[ROLE_PARAMETERS][DAILY_OUTBREAK_THRESHOLD], 0)
+        self.assertEqual(node[ROLE_PARAMETERS][OUTBREAK_DETECTION], THRESHOLD)
+
+
+if __name__ == '__main__':
+    unittest.main()
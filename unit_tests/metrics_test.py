@@ -0,0 +1,80 @@
+# unit tests for metrics
+
+import unittest
+
+from shared.constants import *
+from shared.metrics import LatencyHistogram, NodeMetrics, get_bucket_index, get_bucket_value, get_message_type_metric, \
+    timed
+
+
+class LatencyHistogramTest(unittest.TestCase):
+
+    def test_bucket_value_is_within_three_percent(self):
+        for value in list(range(200)) + [999, 1000, 12345, 10 ** 6, 10 ** 9 + 7, 2 ** 40 + 1]:
+            bucket_value = get_bucket_value(get_bucket_index(value))
+            self.assertLessEqual(bucket_value, value)
+            self.assertLessEqual(value - bucket_value, value * 0.032)
+
+    def test_bucket_indexes_are_contiguous(self):
+        indexes = [get_bucket_index(value) for value in range(5000)]
+        self.assertEqual(sorted(set(indexes)), list(range(indexes[-1] + 1)))
+
+    def test_percentiles(self):
+        histogram = LatencyHistogram()
+        for value in range(1, 10001):
+            histogram.record(value * 1000)
+        snapshot = histogram.get_snapshot()
+        self.assertEqual(snapshot[COUNT], 10000)
+        self.assertEqual(snapshot[MIN_US], 1)
+        self.assertEqual(snapshot[MAX_US], 10000)
+        self.assertAlmostEqual(snapshot[MEAN_US], 5000.5)
+        self.assertAlmostEqual(snapshot[P50_US], 5000, delta=5000 * 0.032)
+        self.assertAlmostEqual(snapshot[P99_US], 9900, delta=9900 * 0.032)
+        self.assertLessEqual(snapshot[P999_US], 10000)
+
+    def test_empty_histogram(self):
+        snapshot = LatencyHistogram().get_snapshot()
+        self.assertEqual(snapshot[COUNT], 0)
+        self.assertEqual(snapshot[P99_US], 0)
+
+
+class NodeMetricsTest(unittest.TestCase):
+
+    class TimedNode:
+
+        def __init__(self):
+            self.metrics = NodeMetrics()
+
+        @timed(HANDLE_PIPELINED_REPLY)
+        def handle(self, value):
+            if value is None:
+                raise ValueError("no value!")
+            return value * 2
+
+    def test_counters_and_histograms(self):
+        metrics = NodeMetrics()
+        metrics.increment(BYTES_SENT, 10)
+        metrics.increment(BYTES_SENT, 5)
+        metrics.record(POLL_WAIT, 2000)
+        snapshot = metrics.get_snapshot()
+        self.assertEqual(snapshot[COUNTERS], {BYTES_SENT: 15})
+        self.assertEqual(snapshot[HISTOGRAMS][POLL_WAIT][COUNT], 1)
+
+    def test_unknown_message_types_share_one_metric(self):
+        self.assertEqual(get_message_type_metric(MESSAGES_SENT_PREFIX, OUTBREAK_QUERY),
+                         MESSAGES_SENT_PREFIX + OUTBREAK_QUERY)
+        self.assertEqual(get_message_type_metric(MESSAGES_SENT_PREFIX, 'made_up'),
+                         MESSAGES_SENT_PREFIX + OTHER_MESSAGE_TYPE)
+        self.assertEqual(get_message_type_metric(MESSAGES_SENT_PREFIX, 'also_made_up'),
+                         MESSAGES_SENT_PREFIX + OTHER_MESSAGE_TYPE)
+
+    def test_timed_records_returns_and_exceptions(self):
+        node = self.TimedNode()
+        self.assertEqual(node.handle(2), 4)
+        with self.assertRaises(ValueError):
+            node.handle(None)
+        self.assertEqual(node.metrics.get_snapshot()[HISTOGRAMS][HANDLE_PIPELINED_REPLY][COUNT], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+# unit tests for the micro-benchmark suite
+
+import unittest
+
+from benchmarks.micro_benchmarks import MicroBenchmarks, get_result_key, get_sample_messages
+from shared.constants import *
+from shared.wire_codec import MESSAGE_TYPE_IDS
+
+
+class MicroBenchmarksTest(unittest.TestCase):
+
+    def test_sample_messages_cover_every_message_type(self):
+        self.assertEqual(set(get_sample_messages()), set(MESSAGE_TYPE_IDS))
+
+    def test_filtered_run_reports_only_matching_benchmarks(self):
+        results = MicroBenchmarks(1, 'overseer').run_all()
+        self.assertEqual({result[BENCHMARK] for result in results[RESULTS]}, {'overseer.handle_heartbeat'})
+        for result in results[RESULTS]:
+            self.assertGreater(result[CALLS_PER_RUN], 0)
+            self.assertLessEqual(result[BEST_SECONDS], result[MEDIAN_SECONDS])
+
+    def test_result_key_ignores_encoded_bytes(self):
+        result = {BENCHMARK: 'message.encode',
+                  PARAMETERS: {WIRE_PROTOCOL: PICKLE, MESSAGE_TYPE: OUTBREAK_QUERY, ENCODED_BYTES: 100}}
+        self.assertEqual(get_result_key(result), 'message.encode[message_type=outbreak_query,wire_protocol=pickle]')
+        self.assertEqual(get_result_key({BENCHMARK: 'overseer.handle_heartbeat', PARAMETERS: {}}),
+                         'overseer.handle_heartbeat')
+
+
+if __name__ == '__main__':
+    unittest.main()
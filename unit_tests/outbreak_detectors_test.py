@@ -0,0 +1,106 @@
+# unit tests for the outbreak detectors
+
+import unittest
+from datetime import datetime, timedelta
+
+from shared.constants import *
+from shared.daily_count_history import DailyCountHistory
+from shared.outbreak_detectors import DEFAULT_SEASON_DAYS, DEFAULT_WINDOW_HALF_WIDTH, CusumDetector, EwmaDetector, \
+    FarringtonDetector, ThresholdDetector, create_outbreak_detector
+
+START = datetime(2018, 3, 1)
+
+
+class OutbreakDetectorsTest(unittest.TestCase):
+
+    # archive a day with the given total and let the detector set the next day's threshold
+    def archive_days(self, detector, history, totals):
+        for total in totals:
+            start = START + timedelta(days=history.get_day_count())
+            history.append_day({TOTAL: total}, start, start + timedelta(days=1))
+            detector.start_day(history)
+
+    def test_threshold_detector_is_fixed(self):
+        detector = create_outbreak_detector(THRESHOLD, {}, 10)
+        self.assertIsInstance(detector, ThresholdDetector)
+        self.archive_days(detector, DailyCountHistory(), [100] * 10)
+        self.assertFalse(detector.is_outbreak(9))
+        self.assertTrue(detector.is_outbreak(10))
+
+    def test_unknown_detector(self):
+        with self.assertRaises(ValueError):
+            create_outbreak_detector('crystal_ball', {}, 10)
+
+    def test_ewma_uses_fixed_threshold_until_warm(self):
+        detector = EwmaDetector({WARMUP_DAYS: 5}, 50)
+        history = DailyCountHistory()
+        self.archive_days(detector, history, [10, 12, 9, 11])
+        self.assertEqual(detector.get_threshold(), 50)
+        self.archive_days(detector, history, [10])
+        self.assertLess(detector.get_threshold(), 50)
+        self.assertGreater(detector.get_threshold(), 10)
+
+    def test_ewma_follows_the_baseline(self):
+        detector = EwmaDetector({WARMUP_DAYS: 3, SMOOTHING: 0.5, CONTROL_LIMIT: 2}, 1000)
+        history = DailyCountHistory()
+        self.archive_days(detector, history, [20] * 10)
+        # flat baseline:  mean 20, standard deviation raised to 1
+        self.assertEqual(detector.get_threshold(), 23)
+        self.assertFalse(detector.is_outbreak(22))
+        self.assertTrue(detector.is_outbreak(23))
+        self.archive_days(detector, history, [100] * 10)
+        self.assertGreater(detector.get_threshold(), 90)
+
+    def test_cusum_accumulates_small_shifts(self):
+        detector = CusumDetector({WARMUP_DAYS: 3, BASELINE_DAYS: 5}, 1000)
+        history = DailyCountHistory()
+        self.archive_days(detector, history, [10] * 5)
+        first_threshold = detector.get_threshold()
+        # mean 10, standard deviation 1:  threshold above 10 + 4.5
+        self.assertEqual(first_threshold, 15)
+        # a day above the reference value lowers the next day's threshold
+        self.archive_days(detector, history, [13])
+        self.assertGreater(detector.cumulative_sum, 0)
+        self.assertLess(detector.get_threshold() - detector.get_baseline()[0], first_threshold - 10)
+
+    def test_cusum_baseline_sums_stay_within_window(self):
+        detector = CusumDetector({BASELINE_DAYS: 3}, 1000)
+        self.archive_days(detector, DailyCountHistory(), [1, 2, 3, 4, 5])
+        self.assertEqual(list(detector.baseline), [3, 4, 5])
+        self.assertEqual(detector.baseline_sum, 12)
+        self.assertEqual(detector.baseline_sum_of_squares, 50)
+
+    def test_farrington_uses_previous_seasons(self):
+        parameters = {SEASON_DAYS: 7, SEASONS: 2, WINDOW_HALF_WIDTH: 1}
+        detector = FarringtonDetector(parameters, 1000)
+        history = DailyCountHistory()
+        # a weekly pattern:  busy on the first day of every week
+        week = [50, 5, 5, 5, 5, 5, 5]
+        self.archive_days(detector, history, week)
+        # not warm until a whole window one season back is archived
+        self.assertEqual(detector.get_threshold(), 1000)
+        self.archive_days(detector, history, week + week)
+        # today is the first day of the fourth week; reference days are days 6-8 and 13-15
+        self.assertEqual(history.get_day_count(), 21)
+        self.assertEqual(sorted(detector.get_reference_totals(history)), [5, 5, 5, 5, 50, 50])
+        self.assertFalse(detector.is_outbreak(40))
+        self.archive_days(detector, history, [50, 5, 5])
+        # reference days are now days 9-11 and 16-18, all quiet days
+        self.assertTrue(detector.is_outbreak(20))
+
+    def test_farrington_needs_history_of_previous_seasons(self):
+        detector = FarringtonDetector({}, 1000)
+        # the defaults keep 90 days, but the reference days are 362 to 368 days ago
+        with self.assertRaises(ValueError):
+            detector.check_history(DailyCountHistory())
+        detector.check_history(DailyCountHistory(retention_days=DEFAULT_SEASON_DAYS + DEFAULT_WINDOW_HALF_WIDTH))
+        detector.check_history(DailyCountHistory(spill_file='unused' + NDJSON_EXTENSION))
+
+    def test_minimum_count(self):
+        detector = EwmaDetector({WARMUP_DAYS: 1, MINIMUM_COUNT: 5}, 1000)
+        self.archive_days(detector, DailyCountHistory(), [0] * 3)
+        self.assertEqual(detector.get_threshold(), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,13 @@
 # unit tests for overseer
 # note that most of overseer's functionality involves network communication, so unit tests are limited
 import unittest
+from datetime import datetime, timedelta
+
+import zmq
 
 from overseer import Overseer
+from shared.clock import VirtualClock
 from shared.constants import *
-from shared.node import Node
 
 
 class OverseerTest(unittest.TestCase):
@@ -12,7 +15,7 @@ class OverseerTest(unittest.TestCase):
     def get_basic_config(self):
         # populate the config map
         return {
-            OVERSEER_HOST: str(Node.get_ip_address()),
+            OVERSEER_HOST: '127.0.0.1',
             OVERSEER_REPLY_PORT: 9001,
             OVERSEER_PUBLISH_PORT: 9091,
             TIME_SCALING_FACTOR: 1800,
@@ -24,6 +27,77 @@ class OverseerTest(unittest.TestCase):
         self.assertFalse(overseer.all_registrations_completed())
         overseer.shutdown_zmq()
 
+    def get_inproc_overseer(self, context):
+        overseer = Overseer({TRANSPORT: INPROC}, context)
+        overseer.clock = VirtualClock(datetime(2018, 3, 1))
+        return overseer
+
+    def test_missed_heartbeats_are_reported_on_time(self):
+        context = zmq.Context()
+        overseer = self.get_inproc_overseer(context)
+        overseer.track_node_heartbeats(['EMR', 'HDS'])
+        self.assertEqual(overseer.get_poll_timeout(), SECONDS_WITHOUT_HEARTBEAT * 1000 + 1)
+        overseer.clock.advance_to(overseer.clock.now() + timedelta(seconds=SECONDS_WITHOUT_HEARTBEAT - 1))
+        overseer.record_heartbeat('EMR')
+        overseer.clock.advance_to(overseer.clock.now() + timedelta(seconds=2))
+        with self.assertLogs(level='ERROR') as logs:
+            overseer.check_node_heartbeats()
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('No heartbeats from HDS', logs.output[0])
+        # one heap entry per node:  EMR's entry moved to its new deadline, HDS's to its next report
+        self.assertEqual(sorted(node_id for _, node_id in overseer.heartbeat_deadlines), ['EMR', 'HDS'])
+        self.assertEqual(overseer.get_poll_timeout(), (SECONDS_WITHOUT_HEARTBEAT - 2) * 1000 + 1)
+        overseer.shutdown_zmq()
+        context.term()
+
+    def test_startup_handshake(self):
+        context = zmq.Context()
+        overseer = self.get_inproc_overseer(context)
+        overseer.config[NODES] = ['HDS']
+        request_socket = context.socket(zmq.REQ)
+        request_socket.connect(INPROC_OVERSEER_REPLY_ADDRESS)
+        subscribe_socket = context.socket(zmq.SUB)
+        subscribe_socket.connect(INPROC_OVERSEER_PUBLISH_ADDRESS)
+        subscribe_socket.setsockopt_string(zmq.SUBSCRIBE, '')
+
+        def request(message):
+            request_socket.send_multipart([b'HDS', message.encode()])
+            overseer.handle_startup_request()
+            return request_socket.recv_multipart()[1].decode()
+
+        request('{"role": "health_district_system"}')
+        self.assertFalse(overseer.all_subscriptions_confirmed())
+        self.assertEqual(subscribe_socket.recv_string(), SUBSCRIPTION_CHECK)
+        request(SUBSCRIBED)
+        self.assertTrue(overseer.all_registrations_completed() and overseer.all_subscriptions_confirmed())
+        # a node that missed the node_addresses broadcast asks for them
+        self.assertEqual(request(GET_NODE_ADDRESSES), NODE_ADDRESSES_NOT_PUBLISHED)
+        overseer.publish_node_addresses()
+        self.assertEqual(request(GET_NODE_ADDRESSES), subscribe_socket.recv_string())
+        request(READY_TO_START)
+        self.assertTrue(overseer.all_nodes_ready())
+        request_socket.close()
+        subscribe_socket.close()
+        overseer.shutdown_zmq()
+        context.term()
+
+    def test_replies_are_routed_to_the_requesting_node(self):
+        context = zmq.Context()
+        overseer = self.get_inproc_overseer(context)
+        request_sockets = {}
+        for node_id in ['EMR', 'HDS']:
+            request_sockets[node_id] = context.socket(zmq.REQ)
+            request_sockets[node_id].connect(INPROC_OVERSEER_REPLY_ADDRESS)
+            request_sockets[node_id].send_multipart([node_id.encode(), HEARTBEAT.encode()])
+        overseer.track_node_heartbeats(request_sockets)
+        for _ in request_sockets:
+            self.assertTrue(overseer.handle_supervision_request())
+        for node_id, request_socket in request_sockets.items():
+            self.assertEqual(request_socket.recv_multipart(), [node_id.encode(), HEARTBEAT_RECEIVED.encode()])
+            request_socket.close()
+        overseer.shutdown_zmq()
+        context.term()
+
 
 if __name__ == '__main__':
     unittest.main()
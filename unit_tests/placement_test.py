@@ -0,0 +1,51 @@
+# unit tests for placing simulation nodes onto EC2 instances
+import unittest
+
+from aws.placement import get_resource_units, group_nodes, plan_placement
+from shared.constants import *
+
+
+def get_node_config(node_id, role, connections, role_parameters=None):
+    return {NODE_ID: node_id, ROLE: role, CONNECTIONS: connections, ROLE_PARAMETERS: role_parameters or {}}
+
+
+class PlacementTest(unittest.TestCase):
+
+    def setUp(self):
+        self.node_configs = {
+            'EMR1': get_node_config('EMR1', ELECTRONIC_MEDICAL_RECORD, ['HDS1']),
+            'EMR2': get_node_config('EMR2', ELECTRONIC_MEDICAL_RECORD, ['HDS2']),
+            'EMR3': get_node_config('EMR3', ELECTRONIC_MEDICAL_RECORD, ['HDS1']),
+            'HDS1': get_node_config('HDS1', HEALTH_DISTRICT_SYSTEM, ['DOA1']),
+            'HDS2': get_node_config('HDS2', HEALTH_DISTRICT_SYSTEM, ['DOA1']),
+            'DOA1': get_node_config('DOA1', DISEASE_OUTBREAK_ANALYZER, ['HDS1', 'HDS2']),
+        }
+
+    def test_electronic_medical_records_are_grouped_with_their_health_district_system(self):
+        self.assertEqual(group_nodes(self.node_configs), [['HDS1', 'EMR1', 'EMR3'], ['HDS2', 'EMR2'], ['DOA1']])
+
+    def test_nodes_are_packed_largest_group_first(self):
+        # groups of 6, 5, and 2 resource units
+        self.assertEqual(plan_placement(self.node_configs, 8), [['HDS1', 'EMR1', 'EMR3', 'DOA1'], ['HDS2', 'EMR2']])
+        self.assertEqual(plan_placement(self.node_configs, 16), [['HDS1', 'EMR1', 'EMR3', 'HDS2', 'EMR2', 'DOA1']])
+
+    def test_oversized_group_gets_an_instance_of_its_own(self):
+        self.assertEqual(plan_placement(self.node_configs, 4), [['HDS1', 'EMR1', 'EMR3'], ['HDS2', 'EMR2'], ['DOA1']])
+
+    def test_declared_resource_units_override_role_weight(self):
+        self.node_configs['DOA1'][ROLE_PARAMETERS][RESOURCE_UNITS] = 8
+        self.assertEqual(get_resource_units(self.node_configs['DOA1']), 8)
+        self.assertEqual(plan_placement(self.node_configs, 8),
+                         [['DOA1'], ['HDS1', 'EMR1', 'EMR3'], ['HDS2', 'EMR2']])
+        self.node_configs['DOA1'][ROLE_PARAMETERS][RESOURCE_UNITS] = 0
+        with self.assertRaises(ValueError):
+            get_resource_units(self.node_configs['DOA1'])
+
+    def test_unknown_health_district_system(self):
+        self.node_configs['EMR2'][CONNECTIONS] = ['HDS9']
+        with self.assertRaises(KeyError):
+            group_nodes(self.node_configs)
+
+
+if __name__ == '__main__':
+    unittest.main()
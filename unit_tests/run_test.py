@@ -0,0 +1,57 @@
+# unit tests for launching simulation node processes
+import subprocess
+import sys
+import threading
+import unittest
+
+import zmq
+
+from overseer import Overseer
+from shared.constants import *
+from shared.run import Run
+
+REPLY_PORT = 9013
+PUBLISH_PORT = 9093
+
+
+class RunTest(unittest.TestCase):
+
+    def setUp(self):
+        self.overseer = Overseer({OVERSEER_REPLY_PORT: REPLY_PORT, OVERSEER_PUBLISH_PORT: PUBLISH_PORT,
+                                  NODES: ['EMR', 'HDS']})
+        self.serving = True
+        self.overseer_thread = threading.Thread(target=self.serve_startup_requests)
+        self.overseer_thread.start()
+        self.run = Run({OVERSEER_HOST: '127.0.0.1', OVERSEER_REPLY_PORT: REPLY_PORT})
+        self.run.connect_to_overseer()
+        # stands in for the overseer process
+        self.run.processes[OVERSEER] = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])
+
+    def tearDown(self):
+        self.serving = False
+        self.overseer_thread.join()
+        self.overseer.shutdown_zmq()
+        self.run.terminate_processes()
+
+    def serve_startup_requests(self):
+        while self.serving:
+            if self.overseer.reply_socket.poll(50, zmq.POLLIN):
+                self.overseer.handle_startup_request()
+
+    @staticmethod
+    def get_command_line(code):
+        return "{} -c {}".format(sys.executable, code)
+
+    def test_launch_reports_startup_latency(self):
+        # registrations are simulated, so the node processes have nothing to do
+        self.overseer.node_addresses = {'EMR': {}, 'HDS': {}}
+        self.run.launch_nodes({'EMR': self.get_command_line('pass'), 'HDS': self.get_command_line('pass')}, 1)
+        self.assertEqual(set(self.run.startup_latencies), {'EMR', 'HDS'})
+
+    def test_failed_node_is_reported(self):
+        with self.assertRaisesRegex(RuntimeError, 'HDS exited with code 3 before registering'):
+            self.run.launch_nodes({'HDS': self.get_command_line('exit(3)')}, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+# unit tests for vector_timestamp_delta
+
+import unittest
+
+from shared.vector_timestamp import IndexedVectorTimestamp, NodeIndex, VectorTimestamp
+from shared.vector_timestamp_delta import VectorTimestampDeltaDecoder, VectorTimestampDeltaEncoder
+
+
+class VectorTimestampDeltaTest(unittest.TestCase):
+
+    def test_only_changed_entries_are_sent(self):
+        sender = VectorTimestamp()
+        sender.increment_count("A")
+        sender.increment_count("B")
+        encoder = VectorTimestampDeltaEncoder(full_snapshot_interval=4)
+        first = encoder.encode(sender)
+        self.assertTrue(first.is_full_snapshot)
+        self.assertEqual(first.entries, {'A': 1, 'B': 1})
+        sender.increment_count("B")
+        second = encoder.encode(sender)
+        self.assertFalse(second.is_full_snapshot)
+        self.assertEqual(second.entries, {'B': 2})
+
+    def test_receiver_reconstructs_and_merges(self):
+        sender = VectorTimestamp()
+        encoder = VectorTimestampDeltaEncoder(full_snapshot_interval=4)
+        decoder = VectorTimestampDeltaDecoder("A")
+        receiver = VectorTimestamp()
+        receiver.increment_count("R")
+        for _ in range(5):
+            sender.increment_count("A")
+            decoder.apply(encoder.encode(sender), receiver)
+        self.assertEqual(receiver.vector_timestamp, {'A': 5, 'R': 1})
+        self.assertTrue(decoder.synchronized)
+
+    def test_gap_waits_for_full_snapshot(self):
+        sender = VectorTimestamp()
+        encoder = VectorTimestampDeltaEncoder(full_snapshot_interval=3)
+        decoder = VectorTimestampDeltaDecoder("A")
+        receiver = VectorTimestamp()
+        sender.increment_count("A")
+        decoder.apply(encoder.encode(sender), receiver)  # full snapshot #0
+        sender.increment_count("B")
+        encoder.encode(sender)  # delta #1 is lost
+        sender.increment_count("A")
+        decoder.apply(encoder.encode(sender), receiver)  # delta #2
+        self.assertFalse(decoder.synchronized)
+        self.assertEqual(decoder.gap_count, 1)
+        decoder.apply(encoder.encode(sender), receiver)  # full snapshot #3
+        self.assertTrue(decoder.synchronized)
+        self.assertEqual(receiver.vector_timestamp, {'A': 2, 'B': 1})
+
+    def test_indexed_vector_timestamp_deltas(self):
+        sender = IndexedVectorTimestamp(NodeIndex.get_shared(['A', 'B', 'C']))
+        encoder = VectorTimestampDeltaEncoder(full_snapshot_interval=4)
+        sender.increment_count('A')
+        self.assertEqual(encoder.encode(sender).entries, {'A': 1})
+        sender.increment_count('runner')
+        other = IndexedVectorTimestamp(sender.node_index)
+        other.increment_count('C')
+        other.increment_count('C')
+        sender.update_from_other(other)
+        # merging a clock that is behind changes nothing
+        sender.update_from_other(IndexedVectorTimestamp(sender.node_index))
+        self.assertEqual(encoder.encode(sender).entries, {'C': 2, 'runner': 1})
+        self.assertEqual(encoder.encode(sender).entries, {})
+
+    def test_replaced_clock_gets_full_snapshot(self):
+        sender = VectorTimestamp()
+        sender.increment_count('A')
+        encoder = VectorTimestampDeltaEncoder(full_snapshot_interval=10)
+        encoder.encode(sender)
+        replacement = IndexedVectorTimestamp(NodeIndex.get_shared(['A', 'B']))
+        replacement.update_from_other(sender)
+        delta = encoder.encode(replacement)
+        self.assertTrue(delta.is_full_snapshot)
+        self.assertEqual(delta.entries, {'A': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,9 @@
 # unit tests for vector_timestamp
 
+import pickle
 import unittest
 
-from shared.vector_timestamp import VectorTimestamp
+from shared.vector_timestamp import IndexedVectorTimestamp, NodeIndex, VectorTimestamp
 
 
 class VectorTimestampTest(unittest.TestCase):
@@ -20,6 +21,17 @@ class VectorTimestampTest(unittest.TestCase):
         self.assertIsNotNone(vector_timestamp)
         self.assertTrue(vector_timestamp.vector_timestamp == expected)
 
+    def test_increment_count_by_amount(self):
+        vector_timestamp = VectorTimestamp()
+        vector_timestamp.increment_count("A", 3)
+        vector_timestamp.increment_count("A")
+        self.assertEqual(vector_timestamp.vector_timestamp, {'A': 4})
+        indexed_vector_timestamp = IndexedVectorTimestamp(NodeIndex(["A", "B"]))
+        indexed_vector_timestamp.increment_count("B", 3)
+        indexed_vector_timestamp.increment_count("C", 2)
+        indexed_vector_timestamp.increment_count("C")
+        self.assertEqual(dict(indexed_vector_timestamp.items()), {'B': 3, 'C': 3})
+
     def test_update_from_other(self):
         vector_timestamp = VectorTimestamp()
         vector_timestamp.increment_count("A")
@@ -43,6 +55,85 @@ class VectorTimestampTest(unittest.TestCase):
         print(vector_timestamp)
         self.assertTrue(vector_timestamp.vector_timestamp == expected)
 
+    def test_indexed_update_from_other(self):
+        node_index = NodeIndex(['A', 'B', 'C'])
+        vector_timestamp = IndexedVectorTimestamp(node_index)
+        vector_timestamp.increment_count("A")
+        vector_timestamp.increment_count("A")
+        vector_timestamp.increment_count("B")
+        other = IndexedVectorTimestamp(node_index)
+        other.increment_count("A")
+        other.increment_count("C")
+        other.increment_count("C")
+        vector_timestamp.update_from_other(other)
+        self.assertEqual(dict(vector_timestamp.items()), {'A': 2, 'B': 1, 'C': 2})
+
+    def test_indexed_update_from_dict_vector_timestamp(self):
+        vector_timestamp = IndexedVectorTimestamp(NodeIndex(['A', 'B']))
+        vector_timestamp.increment_count("B")
+        other = VectorTimestamp()
+        other.increment_count("A")
+        other.increment_count("D")
+        vector_timestamp.update_from_other(other)
+        self.assertEqual(dict(vector_timestamp.items()), {'A': 1, 'B': 1, 'D': 1})
+
+    def test_changed_since(self):
+        vector_timestamp = VectorTimestamp()
+        vector_timestamp.increment_count("A")
+        vector_timestamp.increment_count("B")
+        change_count = vector_timestamp.change_count
+        other = VectorTimestamp()
+        other.increment_count("A")
+        other.increment_count("C")
+        vector_timestamp.update_from_other(other)
+        vector_timestamp.increment_count("B")
+        # A is not ahead in other, so it did not change
+        self.assertEqual(vector_timestamp.changed_since(change_count), {'B': 2, 'C': 1})
+        self.assertEqual(vector_timestamp.changed_since(vector_timestamp.change_count), {})
+
+    def test_pickle_sends_only_counts(self):
+        vector_timestamp = VectorTimestamp()
+        vector_timestamp.increment_count("A")
+        restored = pickle.loads(pickle.dumps(vector_timestamp))
+        self.assertEqual(restored.vector_timestamp, {'A': 1})
+        self.assertEqual((restored.changes, restored.change_count), ({}, 0))
+
+    def test_indexed_pickle_round_trip(self):
+        node_index = NodeIndex.get_shared(['A', 'B', 'C'])
+        vector_timestamp = IndexedVectorTimestamp(node_index)
+        vector_timestamp.increment_count("C")
+        vector_timestamp.increment_count("C")
+        vector_timestamp.increment_count("runner")
+        data = pickle.dumps(vector_timestamp)
+        # only the node list's fingerprint is sent, not its node_ids
+        self.assertNotIn(b'B', data)
+        restored = pickle.loads(data)
+        self.assertIs(restored.node_index, node_index)
+        self.assertEqual(dict(restored.items()), {'C': 2, 'runner': 1})
+
+    def test_indexed_unknown_node_id_keeps_node_index(self):
+        node_index = NodeIndex.get_shared(['A', 'B'])
+        fingerprint = node_index.fingerprint
+        vector_timestamp = IndexedVectorTimestamp(node_index)
+        vector_timestamp.increment_count("runner")
+        other = IndexedVectorTimestamp(node_index)
+        other.increment_count("A")
+        other.increment_count("runner")
+        other.increment_count("runner")
+        vector_timestamp.update_from_other(other)
+        self.assertEqual(node_index.fingerprint, fingerprint)
+        self.assertEqual(len(node_index), 2)
+        self.assertEqual(dict(vector_timestamp.items()), {'A': 1, 'runner': 2})
+
+    def test_node_index_fingerprint_depends_on_node_list(self):
+        self.assertEqual(NodeIndex(['A', 'B']).fingerprint, NodeIndex(['A', 'B']).fingerprint)
+        self.assertNotEqual(NodeIndex(['A', 'B']).fingerprint, NodeIndex(['B', 'A']).fingerprint)
+        self.assertIs(NodeIndex.get_shared(['X', 'Y']), NodeIndex.get_shared(('X', 'Y')))
+
+    def test_indexed_unpickle_needs_shared_node_list(self):
+        vector_timestamp = IndexedVectorTimestamp(NodeIndex(['not', 'shared']))
+        with self.assertRaises(KeyError):
+            pickle.loads(pickle.dumps(vector_timestamp))
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,153 @@
+# unit tests for wire_codec
+
+import unittest
+from datetime import datetime
+
+from shared.constants import *
+from shared.vector_timestamp import IndexedVectorTimestamp, NodeIndex, VectorTimestamp
+from shared.vector_timestamp_delta import VectorTimestampDelta
+from shared.wire_codec import HEADER, UINT16, WireCodec
+
+
+class WireCodecTest(unittest.TestCase):
+
+    def get_vector_timestamp(self):
+        vector_timestamp = VectorTimestamp()
+        vector_timestamp.increment_count("Mock_EMR")
+        vector_timestamp.increment_count("Mock_EMR")
+        vector_timestamp.increment_count("Mock_HDS")
+        return vector_timestamp
+
+    def test_disease_notification_batch_round_trip(self):
+        codec = WireCodec(['cooties', 'measles'])
+        local_timestamp = datetime(2018, 3, 1, 12, 30)
+        message = {MESSAGE_TYPE: DISEASE_NOTIFICATION_BATCH,
+                   ELECTRONIC_MEDICAL_RECORD_ID: "Mock_EMR",
+                   SEQUENCE_NUMBER: 42,
+                   DISEASE_COUNTS: {'measles': 2, 'cooties': 1},
+                   LOCAL_TIMESTAMP: local_timestamp,
+                   VECTOR_TIMESTAMP: self.get_vector_timestamp()}
+        decoded = codec.decode(codec.encode(message))
+        self.assertEqual(decoded[MESSAGE_TYPE], DISEASE_NOTIFICATION_BATCH)
+        self.assertEqual(decoded[ELECTRONIC_MEDICAL_RECORD_ID], "Mock_EMR")
+        self.assertEqual(decoded[SEQUENCE_NUMBER], 42)
+        self.assertEqual(decoded[DISEASE_COUNTS], {'measles': 2, 'cooties': 1})
+        self.assertEqual(decoded[LOCAL_TIMESTAMP], local_timestamp)
+        self.assertEqual(decoded[VECTOR_TIMESTAMP].vector_timestamp, {'Mock_EMR': 2, 'Mock_HDS': 1})
+
+    def test_daily_disease_count_round_trip(self):
+        codec = WireCodec(['cooties', 'measles'])
+        start_timestamp = datetime(2018, 3, 1)
+        message = {MESSAGE_TYPE: DAILY_DISEASE_COUNT,
+                   HEALTH_DISTRICT_SYSTEM_ID: "Mock_HDS",
+                   'cooties': 5,
+                   'measles': 0,
+                   START_TIMESTAMP: start_timestamp,
+                   VECTOR_TIMESTAMP: self.get_vector_timestamp()}
+        decoded = codec.decode(codec.encode(message))
+        self.assertEqual(decoded[HEALTH_DISTRICT_SYSTEM_ID], "Mock_HDS")
+        self.assertEqual(decoded['cooties'], 5)
+        self.assertEqual(decoded['measles'], 0)
+        self.assertEqual(decoded[START_TIMESTAMP], start_timestamp)
+        self.assertNotIn(END_TIMESTAMP, decoded)
+
+    def test_single_disease_daily_disease_count_round_trip(self):
+        codec = WireCodec(['cooties', 'measles'])
+        message = {MESSAGE_TYPE: DAILY_DISEASE_COUNT,
+                   HEALTH_DISTRICT_SYSTEM_ID: "Mock_HDS",
+                   DISEASE: 'measles',
+                   'measles': 7,
+                   VECTOR_TIMESTAMP: self.get_vector_timestamp()}
+        decoded = codec.decode(codec.encode(message))
+        self.assertEqual(decoded[DISEASE], 'measles')
+        self.assertEqual(decoded['measles'], 7)
+        self.assertNotIn('cooties', decoded)
+
+    def test_daily_disease_count_delta_round_trip(self):
+        codec = WireCodec(['cooties', 'measles'])
+        for is_full_snapshot in (False, True):
+            message = {MESSAGE_TYPE: DAILY_DISEASE_COUNT_DELTA,
+                       HEALTH_DISTRICT_SYSTEM_ID: "Mock_HDS",
+                       SEQUENCE_NUMBER: 4,
+                       FULL_SNAPSHOT: is_full_snapshot,
+                       DISEASE_COUNTS: {'measles': 3},
+                       VECTOR_TIMESTAMP: self.get_vector_timestamp()}
+            decoded = codec.decode(codec.encode(message))
+            self.assertEqual(decoded[SEQUENCE_NUMBER], 4)
+            self.assertEqual(decoded[FULL_SNAPSHOT], is_full_snapshot)
+            self.assertEqual(decoded[DISEASE_COUNTS], {'measles': 3})
+            self.assertNotIn(START_TIMESTAMP, decoded)
+
+    def test_outbreak_query_reply_round_trip(self):
+        codec = WireCodec(['cooties', 'measles'])
+        message = {MESSAGE_TYPE: OUTBREAK_QUERY_REPLY,
+                   OUTBREAKS: {'measles'},
+                   VECTOR_TIMESTAMP: self.get_vector_timestamp()}
+        decoded = codec.decode(codec.encode(message))
+        self.assertEqual(decoded[OUTBREAKS], {'measles'})
+        self.assertNotIn(SEQUENCE_NUMBER, decoded)
+
+    def test_vector_timestamp_delta_round_trip(self):
+        codec = WireCodec(['cooties'])
+        message = {MESSAGE_TYPE: DISEASE_NOTIFICATION_REPLY,
+                   STATUS: RECEIVED,
+                   VECTOR_TIMESTAMP_DELTA: VectorTimestampDelta(9, False, {'Mock_HDS': 4})}
+        decoded = codec.decode(codec.encode(message))
+        self.assertNotIn(VECTOR_TIMESTAMP, decoded)
+        delta = decoded[VECTOR_TIMESTAMP_DELTA]
+        self.assertEqual(delta.sequence_number, 9)
+        self.assertFalse(delta.is_full_snapshot)
+        self.assertEqual(delta.entries, {'Mock_HDS': 4})
+
+    def test_indexed_vector_timestamp_round_trip(self):
+        codec = WireCodec(['cooties'])
+        node_index = NodeIndex.get_shared(['Mock_EMR', 'Mock_HDS'])
+        vector_timestamp = IndexedVectorTimestamp(node_index)
+        vector_timestamp.increment_count("Mock_HDS")
+        vector_timestamp.increment_count("Mock_runner")
+        message = {MESSAGE_TYPE: DISEASE_OUTBREAK_ALERT,
+                   DISEASE: 'cooties',
+                   VECTOR_TIMESTAMP: vector_timestamp}
+        decoded = codec.decode(codec.encode(message))
+        self.assertIsInstance(decoded[VECTOR_TIMESTAMP], IndexedVectorTimestamp)
+        self.assertIs(decoded[VECTOR_TIMESTAMP].node_index, node_index)
+        self.assertEqual(dict(decoded[VECTOR_TIMESTAMP].items()), {'Mock_HDS': 1, 'Mock_runner': 1})
+
+    def test_rejects_unknown_version(self):
+        codec = WireCodec(['cooties'])
+        message = {MESSAGE_TYPE: DISEASE_OUTBREAK_ALERT,
+                   DISEASE: 'cooties',
+                   VECTOR_TIMESTAMP: self.get_vector_timestamp()}
+        data = bytearray(codec.encode(message))
+        data[2] = 99
+        with self.assertRaises(ValueError):
+            codec.decode(bytes(data))
+
+    def test_rejects_malformed_frames(self):
+        codec = WireCodec(['cooties', 'measles'])
+        alert = codec.encode({MESSAGE_TYPE: DISEASE_OUTBREAK_ALERT,
+                              DISEASE: 'measles',
+                              VECTOR_TIMESTAMP: self.get_vector_timestamp()})
+        batch = codec.encode({MESSAGE_TYPE: DISEASE_NOTIFICATION_BATCH,
+                              ELECTRONIC_MEDICAL_RECORD_ID: "Mock_EMR",
+                              SEQUENCE_NUMBER: 42,
+                              DISEASE_COUNTS: {'measles': 2, 'cooties': 1},
+                              LOCAL_TIMESTAMP: datetime(2018, 3, 1, 12, 30),
+                              VECTOR_TIMESTAMP: self.get_vector_timestamp()})
+        # every truncation of a body, including inside strings and disease counts
+        for data in (alert, batch):
+            for length in range(len(data)):
+                with self.assertRaises(ValueError):
+                    codec.decode(data[:length])
+        # the alert's disease id follows the header
+        data = bytearray(alert)
+        data[HEADER.size:HEADER.size + UINT16.size] = UINT16.pack(2)
+        with self.assertRaises(ValueError):
+            codec.decode(bytes(data))
+        with self.assertRaises(ValueError):
+            codec.decode(alert + b'\x00')
+        self.assertEqual(codec.decode(alert)[DISEASE], 'measles')
+
+
+if __name__ == '__main__':
+    unittest.main()